@@ -2,9 +2,10 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from .models import User, CustomerProfile, ModeratorProfile, WarehouseManagerProfile
+from apps.common.serializers import DynamicFieldsMixin
 
 
-class UserRegistrationSerializer(serializers.ModelSerializer):
+class UserRegistrationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password])
     password_confirm = serializers.CharField(write_only=True)
 
@@ -53,7 +54,7 @@ class UserLoginSerializer(serializers.Serializer):
         return attrs
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 
@@ -64,25 +65,22 @@ class UserProfileSerializer(serializers.ModelSerializer):
                            'date_joined', 'last_login')
 
 
-class CustomerProfileSerializer(serializers.ModelSerializer):
-    user = UserProfileSerializer(read_only=True)
-
+class CustomerProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomerProfile
         fields = '__all__'
+        expandable_fields = {'user': (UserProfileSerializer, {})}
 
 
-class ModeratorProfileSerializer(serializers.ModelSerializer):
-    user = UserProfileSerializer(read_only=True)
-
+class ModeratorProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ModeratorProfile
         fields = '__all__'
+        expandable_fields = {'user': (UserProfileSerializer, {})}
 
 
-class WarehouseManagerProfileSerializer(serializers.ModelSerializer):
-    user = UserProfileSerializer(read_only=True)
-
+class WarehouseManagerProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = WarehouseManagerProfile
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        expandable_fields = {'user': (UserProfileSerializer, {})}
\ No newline at end of file
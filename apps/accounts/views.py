@@ -3,6 +3,8 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from apps.common.views import ShapedQuerysetMixin
+from apps.orders.cart_store import merge_guest_cart
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer,
     CustomerProfileSerializer, ModeratorProfileSerializer, WarehouseManagerProfileSerializer
@@ -21,6 +23,7 @@ class RegisterView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
+        merge_guest_cart(request, user)
         
         # Generate tokens
         refresh = RefreshToken.for_user(user)
@@ -40,6 +43,7 @@ class LoginView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
+        merge_guest_cart(request, user)
         
         # Generate tokens
         refresh = RefreshToken.for_user(user)
@@ -80,10 +84,11 @@ class CustomerProfileView(generics.RetrieveUpdateAPIView):
         return profile
 
 
-class ModeratorListView(generics.ListCreateAPIView):
+class ModeratorListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
     queryset = ModeratorProfile.objects.all()
     serializer_class = ModeratorProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
+    expand_select_related = {'user': ['user']}
 
     def get_queryset(self):
         if self.request.user.is_admin:
@@ -91,10 +96,11 @@ class ModeratorListView(generics.ListCreateAPIView):
         return ModeratorProfile.objects.none()
 
 
-class WarehouseManagerListView(generics.ListCreateAPIView):
+class WarehouseManagerListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
     queryset = WarehouseManagerProfile.objects.all()
     serializer_class = WarehouseManagerProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
+    expand_select_related = {'user': ['user']}
 
     def get_queryset(self):
         if self.request.user.is_admin:
@@ -0,0 +1,83 @@
+"""
+Short-lived cached snapshots with request coalescing.
+
+``cached_snapshot`` serves the result of ``build`` for ``timeout`` seconds,
+stamped with ``generated_at``. When it has expired, only the caller that wins
+a ``cache.add`` lock recomputes it; concurrent callers poll the cache for that
+result instead of each running the query themselves.
+
+``cache_lock`` is the same ``cache.add`` lock as a context manager, for
+read-modify-write updates of a cache entry. It never runs the body without
+the lock: a holder that died releases it when the lock times out, and a
+caller that cannot get it in time gets ``CacheLockTimeout``.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 5)
+SNAPSHOT_LOCK_TIMEOUT = getattr(settings, 'SNAPSHOT_LOCK_TIMEOUT', 10)
+SNAPSHOT_WAIT_TIMEOUT = getattr(settings, 'SNAPSHOT_WAIT_TIMEOUT', 5)
+SNAPSHOT_POLL_INTERVAL = getattr(settings, 'SNAPSHOT_POLL_INTERVAL', 0.02)
+
+
+class CacheLockTimeout(Exception):
+    pass
+
+
+@contextmanager
+def cache_lock(key, backend=cache, timeout=SNAPSHOT_LOCK_TIMEOUT, wait=None):
+    """Hold ``<key>:lock`` in the ``backend`` cache for the body of the ``with`` block.
+
+    Waits up to ``wait`` seconds (default: ``timeout``, long enough for the
+    lock of a holder that died to expire), then raises ``CacheLockTimeout``.
+    """
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + (timeout if wait is None else wait)
+    while not backend.add(lock_key, 1, timeout):
+        if time.monotonic() >= deadline:
+            raise CacheLockTimeout(key)
+        time.sleep(SNAPSHOT_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        backend.delete(lock_key)
+
+
+def _build_snapshot(key, build, timeout):
+    snapshot = dict(build(), generated_at=timezone.now().isoformat())
+    cache.set(key, snapshot, timeout)
+    return snapshot
+
+
+def cached_snapshot(key, build, timeout):
+    """The cached ``dict`` under ``key``, rebuilt by a single caller on expiry.
+
+    A caller that waits longer than ``SNAPSHOT_WAIT_TIMEOUT`` for the lock
+    holder (which may have died) builds the snapshot itself.
+    """
+    snapshot = cache.get(key)
+    if snapshot is not None:
+        return snapshot
+
+    lock_key = f'{key}:lock'
+    deadline = time.monotonic() + SNAPSHOT_WAIT_TIMEOUT
+    while not cache.add(lock_key, 1, SNAPSHOT_LOCK_TIMEOUT):
+        time.sleep(SNAPSHOT_POLL_INTERVAL)
+        snapshot = cache.get(key)
+        if snapshot is not None:
+            return snapshot
+        if time.monotonic() >= deadline:
+            return _build_snapshot(key, build, timeout)
+
+    try:
+        # Another caller may have finished between our miss and the lock.
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = _build_snapshot(key, build, timeout)
+        return snapshot
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,105 @@
+"""
+Sparse fieldsets and opt-in nesting for serializers.
+
+On read requests ``?fields=id,status,order.order_number`` limits a response
+to the named fields and ``?expand=order,order.items`` renders the relations a
+serializer lists in ``Meta.expandable_fields`` as nested objects. Relations
+that are not expanded render as a primary key (forward relations) or are
+left out (reverse relations). Dotted paths reach nested serializers.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_paths(value):
+    """``'a,b.c,b.d'`` -> ``{'a': {}, 'b': {'c': {}, 'd': {}}}``."""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def flatten_paths(tree, prefix=''):
+    for name, subtree in tree.items():
+        path = f'{prefix}{name}'
+        yield path
+        yield from flatten_paths(subtree, f'{path}.')
+
+
+def requested_shape(request):
+    """``(fields, expand)`` trees asked for by a read request.
+
+    ``fields`` is ``None`` when every field is wanted. Writes always get the
+    default shape, so a sparse response can never hide a writable field.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, {}
+    params = request.query_params
+    fields = parse_paths(params[FIELDS_PARAM]) if params.get(FIELDS_PARAM) else None
+    return fields, parse_paths(params.get(EXPAND_PARAM, ''))
+
+
+def _is_forward_relation(model, name):
+    try:
+        field = model._meta.get_field(name)
+    except (AttributeError, FieldDoesNotExist):
+        return False
+    return field.is_relation and field.concrete and not field.many_to_many
+
+
+class DynamicFieldsMixin:
+    """Serializer mixin honouring ``?fields=`` and ``?expand=``.
+
+    ``Meta.expandable_fields`` maps a field name to ``(serializer, options)``;
+    the serializer may be given as a dotted path to avoid circular imports.
+    The shape can also be passed explicitly with the ``fields`` and
+    ``expand`` keyword arguments (as parsed trees).
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._shape = None if fields is None and expand is None else (fields, expand or {})
+
+    def get_shape(self):
+        if self._shape is None:
+            root = self.root
+            is_root = root is self or (isinstance(root, serializers.ListSerializer) and root.child is self)
+            self._shape = requested_shape(self.context.get('request')) if is_root else (None, {})
+        return self._shape
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = self.get_shape()
+        meta = getattr(self, 'Meta', None)
+        model = getattr(meta, 'model', None)
+
+        for name, (serializer_class, options) in getattr(meta, 'expandable_fields', {}).items():
+            options = dict(options)
+            if name in expand:
+                if isinstance(serializer_class, str):
+                    serializer_class = import_string(serializer_class)
+                fields[name] = serializer_class(read_only=True, **options)
+            elif _is_forward_relation(model, options.get('source', name)):
+                if 'source' in options and options['source'] != name:
+                    fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, source=options['source'])
+                else:
+                    fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+            else:
+                fields.pop(name, None)
+
+        if requested is not None:
+            fields = {name: field for name, field in fields.items() if name in requested or name in expand}
+
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, DynamicFieldsMixin):
+                nested._shape = ((requested or {}).get(name) or None, expand.get(name, {}))
+        return fields
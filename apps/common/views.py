@@ -0,0 +1,58 @@
+from django.core.exceptions import FieldDoesNotExist
+
+from .serializers import flatten_paths, requested_shape
+
+
+class ShapedQuerysetMixin:
+    """Generic view mixin fitting the queryset to ``?fields=`` and ``?expand=``.
+
+    ``expand_select_related`` and ``expand_prefetch_related`` map an expand
+    path (``'order'``, ``'order.items'``) to the lookups it needs, so nested
+    data is only joined or prefetched when it is rendered. When every
+    requested field is backed by a model column the query is narrowed with
+    ``only()``.
+    """
+    expand_select_related = {}
+    expand_prefetch_related = {}
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return self.shape_queryset(queryset)
+
+    def shape_queryset(self, queryset):
+        fields, expand = requested_shape(self.request)
+        paths = set(flatten_paths(expand))
+        for path, lookups in self.expand_select_related.items():
+            if path in paths:
+                queryset = queryset.select_related(*lookups)
+        for path, lookups in self.expand_prefetch_related.items():
+            if path in paths:
+                queryset = queryset.prefetch_related(*lookups)
+        if fields is not None:
+            columns = self.get_only_fields(queryset, set(fields) | set(expand))
+            if columns is not None:
+                queryset = queryset.only(*columns)
+        return queryset
+
+    def get_only_fields(self, queryset, names):
+        """Model fields to load for ``names``, or ``None`` when one cannot be mapped."""
+        serializer_fields = self.get_serializer().fields
+        opts = queryset.model._meta
+        columns = {opts.pk.name}
+        for name in names:
+            field = serializer_fields.get(name)
+            if field is None:
+                continue
+            try:
+                model_field = opts.get_field(field.source_attrs[0])
+            except (IndexError, FieldDoesNotExist):
+                # A method field or property; the attributes it reads are unknown.
+                return None
+            if model_field.concrete and not model_field.many_to_many:
+                columns.add(model_field.name)
+        select_related = queryset.query.select_related
+        if select_related is True:
+            return None
+        if select_related:
+            columns.update(select_related)
+        return columns
@@ -1,5 +1,8 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.urls import path, reverse
 from django.utils.html import format_html
+from .delivery import deliver_notifications
 from .models import (
     Notification, ChatMessage, CustomerSupportTicket, 
     TicketMessage, EmailTemplate
@@ -14,7 +17,9 @@ class NotificationAdmin(admin.ModelAdmin):
                   'send_sms', 'send_push', 'created_at')
     search_fields = ('recipient__username', 'title', 'message')
     list_editable = ('is_read', 'is_sent')
-    readonly_fields = ('created_at', 'sent_at', 'read_at')
+    readonly_fields = ('created_at', 'sent_at', 'read_at', 'channels_sent', 'attempts', 'next_attempt_at',
+                       'last_error')
+    actions = ['send_now']
     
     fieldsets = (
         ('Notification Details', {
@@ -29,17 +34,46 @@ class NotificationAdmin(admin.ModelAdmin):
         ('Status', {
             'fields': ('is_read', 'is_sent')
         }),
+        ('Delivery', {
+            'fields': ('channels_sent', 'attempts', 'next_attempt_at', 'last_error'),
+            'classes': ('collapse',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'sent_at', 'read_at'),
             'classes': ('collapse',)
         })
     )
-    
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/send/', self.admin_site.admin_view(self.send_view), name='notifications_notification_send'),
+        ] + super().get_urls()
+
+    def send_view(self, request, pk):
+        self.deliver(request, self.get_queryset(request).filter(pk=pk))
+        return redirect(request.META.get('HTTP_REFERER') or reverse('admin:notifications_notification_changelist'))
+
+    @admin.action(description='Send selected notifications now')
+    def send_now(self, request, queryset):
+        self.deliver(request, queryset)
+
+    def deliver(self, request, queryset):
+        # Sends now, whatever the retry schedule; leased ones are being sent by a worker.
+        result = deliver_notifications(notifications=queryset)
+        if result['delivered']:
+            self.message_user(request, f"{result['delivered']} notifications sent.")
+        if result['failed']:
+            self.message_user(request, f"{result['failed']} notifications failed and will be retried.",
+                              level=messages.WARNING)
+        if not (result['delivered'] or result['failed']):
+            self.message_user(request, 'Nothing to send: already sent or being sent by a worker.',
+                              level=messages.WARNING)
+
     def notification_actions(self, obj):
         actions = []
         if not obj.is_sent:
             actions.append('<a class="button" href="{}">Send Now</a>'.format(
-                f'/admin/notifications/notification/{obj.pk}/change/?action=send'
+                reverse('admin:notifications_notification_send', args=[obj.pk])
             ))
         if not obj.is_read:
             actions.append('<a class="button" href="{}">Mark Read</a>'.format(
@@ -0,0 +1,238 @@
+"""
+Notification delivery: an outbox worker over unsent ``Notification`` rows.
+
+``claim_notifications`` leases a batch of due notifications to one worker:
+it stamps ``leased_until`` and a per-claim ``lease_token`` on rows whose
+lease is free and then reads back only the rows carrying its token, so two
+workers (threads, processes or hosts, on any backend) never deliver the
+same batch. A worker that dies leaves its rows to be claimed again once the
+lease runs out. Each channel of each notification in the batch is sent
+concurrently in a thread pool through the backend configured for it in
+``NOTIFICATION_BACKENDS``. Results are written back with one
+``bulk_update`` of the rows still carrying the worker's lease token:
+delivered notifications are marked sent, failed ones keep the channels that
+did go out in ``channels_sent`` and are retried after an exponential
+backoff until ``NOTIFICATION_MAX_ATTEMPTS``.
+
+A backend has a ``send(notification)`` method that raises on failure. The
+SMS and push backends are local stand-ins that record messages in
+``local_outbox``; real gateways plug in through the same method.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ('email', 'sms', 'push')
+NOTIFICATION_BACKENDS = {
+    'email': 'apps.notifications.delivery.EmailBackend',
+    'sms': 'apps.notifications.delivery.LocalSMSBackend',
+    'push': 'apps.notifications.delivery.LocalPushBackend',
+    **getattr(settings, 'NOTIFICATION_BACKENDS', {}),
+}
+NOTIFICATION_BATCH_SIZE = getattr(settings, 'NOTIFICATION_BATCH_SIZE', 100)
+NOTIFICATION_DELIVERY_THREADS = getattr(settings, 'NOTIFICATION_DELIVERY_THREADS', 8)
+NOTIFICATION_LEASE = timedelta(seconds=getattr(settings, 'NOTIFICATION_LEASE_SECONDS', 300))
+NOTIFICATION_MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 5)
+NOTIFICATION_RETRY_DELAY = getattr(settings, 'NOTIFICATION_RETRY_DELAY_SECONDS', 60)
+NOTIFICATION_RETRY_MAX_DELAY = getattr(settings, 'NOTIFICATION_RETRY_MAX_DELAY_SECONDS', 6 * 3600)
+# Simulated gateway round trip of the local SMS and push backends.
+NOTIFICATION_LOCAL_LATENCY = getattr(settings, 'NOTIFICATION_LOCAL_LATENCY_SECONDS', 0)
+
+local_outbox = []
+_outbox_lock = threading.Lock()
+
+
+class EmailBackend:
+    """Sends through Django's ``EMAIL_BACKEND``."""
+
+    def send(self, notification):
+        recipient = notification.recipient
+        # A recipient without an address has nothing to retry on this channel.
+        if not recipient.email:
+            return
+        send_mail(notification.title, notification.message, settings.DEFAULT_FROM_EMAIL, [recipient.email])
+
+
+class LocalBackend(ABC):
+    """Records messages in ``local_outbox`` instead of calling a gateway."""
+    channel = None
+
+    def __init__(self, latency=None):
+        self.latency = NOTIFICATION_LOCAL_LATENCY if latency is None else latency
+
+    @abstractmethod
+    def address(self, notification):
+        """Where the channel sends ``notification``; empty to skip it."""
+
+    def send(self, notification):
+        address = self.address(notification)
+        if not address:
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        with _outbox_lock:
+            local_outbox.append((self.channel, address, notification.title, notification.message))
+        logger.info('%s to %s: %s', self.channel, address, notification.title)
+
+
+class LocalSMSBackend(LocalBackend):
+    channel = 'sms'
+
+    def address(self, notification):
+        return notification.recipient.phone_number
+
+
+class LocalPushBackend(LocalBackend):
+    channel = 'push'
+
+    def address(self, notification):
+        return f'user:{notification.recipient_id}'
+
+
+@lru_cache(maxsize=None)
+def get_backend(channel):
+    return import_string(NOTIFICATION_BACKENDS[channel])()
+
+
+def pending_channels(notification):
+    sent = set(filter(None, notification.channels_sent.split(',')))
+    return [channel for channel in CHANNELS if getattr(notification, f'send_{channel}') and channel not in sent]
+
+
+def claimable_notifications(now=None):
+    """Unsent notifications that no worker holds a lease on."""
+    return Notification.objects.filter(
+        Q(leased_until__isnull=True) | Q(leased_until__lt=now or timezone.now()), is_sent=False,
+    )
+
+
+def due_notifications(now=None):
+    now = now or timezone.now()
+    return claimable_notifications(now).filter(next_attempt_at__lte=now, attempts__lt=NOTIFICATION_MAX_ATTEMPTS)
+
+
+def claim_notifications(batch_size=NOTIFICATION_BATCH_SIZE, lease=NOTIFICATION_LEASE, notifications=None,
+                        exclude=()):
+    """Lease up to ``batch_size`` due notifications to the caller.
+
+    ``notifications`` claims from that queryset instead, whether their retry
+    is due or not (but not past ``NOTIFICATION_MAX_ATTEMPTS``); ``exclude``
+    leaves out ids already tried by the caller.
+    """
+    now = timezone.now()
+    if notifications is None:
+        candidates = due_notifications(now)
+    else:
+        candidates = claimable_notifications(now).filter(
+            pk__in=notifications.values('pk'), attempts__lt=NOTIFICATION_MAX_ATTEMPTS,
+        )
+    if exclude:
+        candidates = candidates.exclude(pk__in=exclude)
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        ids = list(
+            candidates.order_by('next_attempt_at', 'id').select_for_update(skip_locked=True)
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        # Re-checked in the UPDATE, so rows another worker leased meanwhile are left to it.
+        claimable_notifications(now).filter(pk__in=ids).update(leased_until=now + lease, lease_token=token)
+    return list(Notification.objects.filter(pk__in=ids, lease_token=token).select_related('recipient').order_by('pk'))
+
+
+def _send(notification, channel):
+    try:
+        get_backend(channel).send(notification)
+    except Exception as exc:
+        return f'{channel}: {exc}'
+    return None
+
+
+def retry_delay(attempts):
+    """Seconds before attempt ``attempts + 1``: exponential, capped, with jitter."""
+    delay = min(NOTIFICATION_RETRY_MAX_DELAY, NOTIFICATION_RETRY_DELAY * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def deliver_batch(notifications, pool):
+    """Send every pending channel of ``notifications`` through ``pool`` and store the results."""
+    tasks = [
+        (notification, channel, pool.submit(_send, notification, channel))
+        for notification in notifications
+        for channel in pending_channels(notification)
+    ]
+    errors = {notification.pk: [] for notification in notifications}
+    for notification, channel, future in tasks:
+        error = future.result()
+        if error:
+            errors[notification.pk].append(error)
+        else:
+            notification.channels_sent = ','.join(filter(None, [notification.channels_sent, channel]))
+
+    now = timezone.now()
+    failed = 0
+    tokens = {notification.lease_token for notification in notifications}
+    for notification in notifications:
+        notification.leased_until = None
+        notification.lease_token = ''
+        if errors[notification.pk]:
+            failed += 1
+            notification.attempts += 1
+            notification.last_error = '; '.join(errors[notification.pk])
+            notification.next_attempt_at = now + timedelta(seconds=retry_delay(notification.attempts))
+        else:
+            notification.is_sent = True
+            notification.sent_at = now
+            notification.last_error = ''
+    # Only rows still leased to this worker: if a send outlasted the lease,
+    # the worker that took them over records its own results.
+    stored = Notification.objects.filter(lease_token__in=tokens).bulk_update(notifications, [
+        'channels_sent', 'attempts', 'next_attempt_at', 'leased_until', 'lease_token', 'last_error',
+        'is_sent', 'sent_at',
+    ])
+    if stored < len(notifications):
+        logger.warning('%d notifications were leased to another worker before their results were stored',
+                       len(notifications) - stored)
+    return {'delivered': len(notifications) - failed, 'failed': failed, 'messages': len(tasks)}
+
+
+def deliver_notifications(batch_size=NOTIFICATION_BATCH_SIZE, threads=NOTIFICATION_DELIVERY_THREADS,
+                          lease=NOTIFICATION_LEASE, notifications=None, limit=None):
+    """Claim and deliver due notifications in batches until none are left (or ``limit`` is reached).
+
+    ``notifications`` restricts delivery to a queryset, e.g. for "Send Now";
+    each of them is then tried at most once per call, as a failure releases
+    it straight away. Returns counts of delivered and failed notifications and of channel
+    messages, and the seconds spent.
+    """
+    result = {'delivered': 0, 'failed': 0, 'messages': 0}
+    tried = set()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while limit is None or result['delivered'] + result['failed'] < limit:
+            size = batch_size if limit is None else min(batch_size, limit - result['delivered'] - result['failed'])
+            batch = claim_notifications(size, lease, notifications, exclude=tried)
+            if not batch:
+                break
+            if notifications is not None:
+                tried.update(notification.pk for notification in batch)
+            for key, value in deliver_batch(batch, pool).items():
+                result[key] += value
+    result['seconds'] = time.perf_counter() - started
+    return result
@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.notifications.delivery import NOTIFICATION_BATCH_SIZE, deliver_notifications, get_backend
+from apps.notifications.models import Notification
+
+USERNAME = 'delivery-benchmark'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure notification deliveries/sec for growing thread counts against slow local SMS/push backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notifications', type=int, default=2000)
+        parser.add_argument('--threads', default='1,2,4,8,16', help='Comma separated thread counts to compare')
+        parser.add_argument('--latency', type=float, default=0.02, help='Simulated gateway round trip in seconds')
+        parser.add_argument('--batch-size', type=int, default=NOTIFICATION_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for channel in ('sms', 'push'):
+            get_backend(channel).latency = options['latency']
+        try:
+            # Everything is written inside a transaction that is always
+            # rolled back; the delivery threads never touch the database.
+            with transaction.atomic():
+                User = get_user_model()
+                recipients = User.objects.bulk_create([
+                    User(username=f'{USERNAME}-{i}', phone_number=f'+9477{i:07d}') for i in range(100)
+                ])
+                Notification.objects.bulk_create([
+                    Notification(
+                        recipient=recipients[i % len(recipients)], notification_type='system',
+                        title='Delivery benchmark', message='-', send_email=False, send_sms=True, send_push=True,
+                    )
+                    for i in range(options['notifications'])
+                ])
+                notifications = Notification.objects.filter(recipient__in=recipients)
+                baseline = None
+                for threads in (int(count) for count in options['threads'].split(',')):
+                    notifications.update(is_sent=False, sent_at=None, channels_sent='')
+                    result = deliver_notifications(batch_size=options['batch_size'], threads=threads)
+                    rate = result['delivered'] / result['seconds']
+                    baseline = baseline or rate
+                    self.stdout.write(
+                        f"{threads:>3} threads: {rate:7.0f} notifications/sec "
+                        f"({result['messages']} messages, x{rate / baseline:.1f})"
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            get_backend.cache_clear()
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.notifications.delivery import (
+    NOTIFICATION_BATCH_SIZE, NOTIFICATION_DELIVERY_THREADS, NOTIFICATION_LEASE, deliver_notifications,
+)
+
+
+class Command(BaseCommand):
+    help = 'Deliver due notifications by email, SMS and push; several workers can run at once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=NOTIFICATION_BATCH_SIZE)
+        parser.add_argument('--threads', type=int, default=NOTIFICATION_DELIVERY_THREADS,
+                            help='Channel messages sent concurrently')
+        parser.add_argument('--lease', type=int, default=int(NOTIFICATION_LEASE.total_seconds()),
+                            help='Seconds a claimed batch is reserved for this worker')
+        parser.add_argument('--limit', type=int, help='Deliver at most this many notifications')
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when idle')
+        parser.add_argument('--poll-interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            result = deliver_notifications(
+                batch_size=options['batch_size'], threads=options['threads'],
+                lease=timedelta(seconds=options['lease']), limit=options['limit'],
+            )
+            done = result['delivered'] + result['failed']
+            if done or not options['loop']:
+                rate = done / result['seconds'] if result['seconds'] else 0
+                self.stdout.write(self.style.SUCCESS(
+                    f"Delivered {result['delivered']} notifications ({result['messages']} channel messages), "
+                    f"{result['failed']} failed, in {result['seconds']:.2f}s ({rate:.0f} notifications/sec)"
+                ))
+            if not options['loop']:
+                break
+            if not done:
+                time.sleep(options['poll_interval'])
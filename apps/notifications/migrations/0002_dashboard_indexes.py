@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['is_read'], name='chat_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customersupportticket',
+            index=models.Index(fields=['status', 'priority'], name='ticket_status_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customersupportticket',
+            index=models.Index(fields=['priority'], name='ticket_priority_idx'),
+        ),
+    ]
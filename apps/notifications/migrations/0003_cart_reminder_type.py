@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_dashboard_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('order_confirmed', 'Order Confirmed'), ('order_shipped', 'Order Shipped'), ('order_delivered', 'Order Delivered'), ('order_cancelled', 'Order Cancelled'), ('cart_reminder', 'Cart Reminder'), ('low_stock', 'Low Stock Alert'), ('restock', 'Product Restocked'), ('new_message', 'New Message'), ('promotional', 'Promotional Offer'), ('system', 'System Notification')], max_length=20),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -10,6 +11,7 @@ class Notification(models.Model):
         ('order_shipped', 'Order Shipped'),
         ('order_delivered', 'Order Delivered'),
         ('order_cancelled', 'Order Cancelled'),
+        ('cart_reminder', 'Cart Reminder'),
         ('low_stock', 'Low Stock Alert'),
         ('restock', 'Product Restocked'),
         ('new_message', 'New Message'),
@@ -37,8 +39,20 @@ class Notification(models.Model):
     sent_at = models.DateTimeField(null=True, blank=True)
     read_at = models.DateTimeField(null=True, blank=True)
 
+    # Delivery state, see delivery.py
+    channels_sent = models.CharField(max_length=20, blank=True, editable=False)
+    attempts = models.PositiveSmallIntegerField(default=0, editable=False)
+    next_attempt_at = models.DateTimeField(default=timezone.now, editable=False)
+    leased_until = models.DateTimeField(null=True, blank=True, editable=False)
+    lease_token = models.CharField(max_length=32, blank=True, editable=False)
+    last_error = models.TextField(blank=True, editable=False)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['next_attempt_at', 'id'], condition=models.Q(is_sent=False),
+                         name='notification_outbox_idx'),
+        ]
 
     def __str__(self):
         return f"Notification for {self.recipient.username}: {self.title}"
@@ -68,6 +82,9 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_read'], condition=models.Q(is_read=False), name='chat_unread_idx'),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} to {self.recipient.username}"
@@ -107,6 +124,10 @@ class CustomerSupportTicket(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'priority'], name='ticket_status_priority_idx'),
+            models.Index(fields=['priority'], name='ticket_priority_idx'),
+        ]
 
     def __str__(self):
         return f"Ticket {self.ticket_number} - {self.subject}"
@@ -117,10 +138,8 @@ class CustomerSupportTicket(models.Model):
         super().save(*args, **kwargs)
 
     def generate_ticket_number(self):
-        import datetime
-        import uuid
-        now = datetime.datetime.now()
-        return f"TKT{now.strftime('%Y%m%d')}{str(uuid.uuid4())[:6].upper()}"
+        from apps.orders.numbering import next_number
+        return next_number('ticket', 'TKT', 6)
 
 
 class TicketMessage(models.Model):
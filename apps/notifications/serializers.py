@@ -1,15 +1,17 @@
 from rest_framework import serializers
 from .models import Notification, ChatMessage, CustomerSupportTicket, TicketMessage, EmailTemplate
+from apps.common.serializers import DynamicFieldsMixin
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = '__all__'
+        # The delivery worker's columns (attempts, lease, last_error) stay internal.
+        exclude = ('channels_sent', 'attempts', 'next_attempt_at', 'leased_until', 'lease_token', 'last_error')
         read_only_fields = ('recipient', 'is_sent', 'sent_at')
 
 
-class ChatMessageSerializer(serializers.ModelSerializer):
+class ChatMessageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     sender_name = serializers.CharField(source='sender.username', read_only=True)
     recipient_name = serializers.CharField(source='recipient.username', read_only=True)
 
@@ -19,7 +21,7 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         read_only_fields = ('sender',)
 
 
-class TicketMessageSerializer(serializers.ModelSerializer):
+class TicketMessageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     sender_name = serializers.CharField(source='sender.username', read_only=True)
 
     class Meta:
@@ -28,8 +30,7 @@ class TicketMessageSerializer(serializers.ModelSerializer):
         read_only_fields = ('sender',)
 
 
-class CustomerSupportTicketSerializer(serializers.ModelSerializer):
-    messages = TicketMessageSerializer(many=True, read_only=True)
+class CustomerSupportTicketSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     customer_name = serializers.CharField(source='customer.username', read_only=True)
     assigned_to_name = serializers.CharField(source='assigned_to.username', read_only=True)
 
@@ -37,9 +38,10 @@ class CustomerSupportTicketSerializer(serializers.ModelSerializer):
         model = CustomerSupportTicket
         fields = '__all__'
         read_only_fields = ('customer', 'ticket_number')
+        expandable_fields = {'messages': (TicketMessageSerializer, {'many': True})}
 
 
-class EmailTemplateSerializer(serializers.ModelSerializer):
+class EmailTemplateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = EmailTemplate
         fields = '__all__'
\ No newline at end of file
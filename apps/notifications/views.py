@@ -1,7 +1,10 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from django.db.models import Count, Prefetch, Q
 from django_filters.rest_framework import DjangoFilterBackend
+from apps.common.cache import DASHBOARD_CACHE_TIMEOUT, cached_snapshot
+from apps.common.views import ShapedQuerysetMixin
 from .models import Notification, ChatMessage, CustomerSupportTicket, TicketMessage, EmailTemplate
 from .serializers import (
     NotificationSerializer, ChatMessageSerializer, CustomerSupportTicketSerializer,
@@ -9,7 +12,7 @@ from .serializers import (
 )
 
 
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(ShapedQuerysetMixin, generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
@@ -55,42 +58,51 @@ class ChatMessageListView(generics.ListCreateAPIView):
         serializer.save(sender=self.request.user)
 
 
-class CustomerSupportTicketListView(generics.ListCreateAPIView):
+TICKET_MESSAGES_PREFETCH = {
+    'messages': [Prefetch('messages', queryset=TicketMessage.objects.select_related('sender'))],
+}
+
+
+class CustomerSupportTicketListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = CustomerSupportTicketSerializer
     permission_classes = [permissions.IsAuthenticated]
+    expand_prefetch_related = TICKET_MESSAGES_PREFETCH
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'priority']
     ordering = ['-created_at']
 
     def get_queryset(self):
+        tickets = CustomerSupportTicket.objects.select_related('customer', 'assigned_to')
         if self.request.user.is_admin or self.request.user.is_moderator:
-            return CustomerSupportTicket.objects.all()
+            return tickets
         else:
-            return CustomerSupportTicket.objects.filter(customer=self.request.user)
+            return tickets.filter(customer=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(customer=self.request.user)
 
 
-class CustomerSupportTicketDetailView(generics.RetrieveUpdateAPIView):
+class CustomerSupportTicketDetailView(ShapedQuerysetMixin, generics.RetrieveUpdateAPIView):
     serializer_class = CustomerSupportTicketSerializer
     permission_classes = [permissions.IsAuthenticated]
+    expand_prefetch_related = TICKET_MESSAGES_PREFETCH
 
     def get_queryset(self):
+        tickets = CustomerSupportTicket.objects.select_related('customer', 'assigned_to')
         if self.request.user.is_admin or self.request.user.is_moderator:
-            return CustomerSupportTicket.objects.all()
+            return tickets
         else:
-            return CustomerSupportTicket.objects.filter(customer=self.request.user)
+            return tickets.filter(customer=self.request.user)
 
 
-class TicketMessageListView(generics.ListCreateAPIView):
+class TicketMessageListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = TicketMessageSerializer
     permission_classes = [permissions.IsAuthenticated]
     ordering = ['created_at']
 
     def get_queryset(self):
         ticket_id = self.kwargs['ticket_id']
-        return TicketMessage.objects.filter(ticket_id=ticket_id)
+        return TicketMessage.objects.filter(ticket_id=ticket_id).select_related('sender')
 
     def perform_create(self, serializer):
         ticket_id = self.kwargs['ticket_id']
@@ -108,20 +120,24 @@ class EmailTemplateListView(generics.ListCreateAPIView):
         return EmailTemplate.objects.filter(is_active=True)
 
 
+def support_dashboard_stats():
+    """Ticket counts in one aggregate query plus the unread chat message count."""
+    stats = CustomerSupportTicket.objects.filter(
+        Q(status__in=('open', 'in_progress')) | Q(priority='urgent')
+    ).aggregate(
+        open_tickets=Count('id', filter=Q(status='open')),
+        in_progress_tickets=Count('id', filter=Q(status='in_progress')),
+        urgent_tickets=Count('id', filter=Q(priority='urgent')),
+    )
+    stats['unread_messages'] = ChatMessage.objects.filter(is_read=False).count()
+    return stats
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def notification_dashboard(request):
     """Dashboard for moderators and admins"""
     if not (request.user.is_admin or request.user.is_moderator):
         return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
-    
-    from django.db.models import Count
-    
-    stats = {
-        'open_tickets': CustomerSupportTicket.objects.filter(status='open').count(),
-        'in_progress_tickets': CustomerSupportTicket.objects.filter(status='in_progress').count(),
-        'urgent_tickets': CustomerSupportTicket.objects.filter(priority='urgent').count(),
-        'unread_messages': ChatMessage.objects.filter(is_read=False).count(),
-    }
-    
-    return Response(stats)
\ No newline at end of file
+
+    return Response(cached_snapshot('dashboard:support', support_dashboard_stats, DASHBOARD_CACHE_TIMEOUT))
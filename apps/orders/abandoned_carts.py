@@ -0,0 +1,108 @@
+"""
+Reminders for abandoned carts and the purge of stale ones.
+
+Both walk ``Cart`` by its indexed ``updated_at`` in ``(updated_at, id)``
+keyset batches, each in its own short transaction, optionally sleeping
+between batches so the job never holds locks or the database for long.
+
+A cart with items that has not changed for ``CART_REMINDER_AFTER_HOURS``
+(and at most ``CART_REMINDER_MAX_AGE_DAYS``, so a first run does not remind
+everyone about months-old carts) gets one ``cart_reminder`` notification.
+``reminder_sent_at`` is set in the same transaction, and a cart is only
+reminded again once it has changed since, so no cart is notified twice for
+the same contents. Carts idle for ``CART_RETENTION_DAYS`` are deleted with
+their items; a customer's next add creates a new one. Guest carts live in
+the cache and expire there.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from apps.notifications.models import Notification
+
+from .models import Cart, CartItem
+
+CART_REMINDER_AFTER = timedelta(hours=getattr(settings, 'CART_REMINDER_AFTER_HOURS', 24))
+CART_REMINDER_MAX_AGE = timedelta(days=getattr(settings, 'CART_REMINDER_MAX_AGE_DAYS', 7))
+CART_RETENTION_DAYS = getattr(settings, 'CART_RETENTION_DAYS', 90)
+CART_SCAN_BATCH_SIZE = getattr(settings, 'CART_SCAN_BATCH_SIZE', 500)
+CART_SCAN_SLEEP = getattr(settings, 'CART_SCAN_SLEEP_SECONDS', 0)
+
+
+def abandoned_carts(now=None):
+    """Carts due a reminder: idle, not empty, and changed since any earlier reminder."""
+    now = now or timezone.now()
+    return Cart.objects.filter(
+        Q(reminder_sent_at__isnull=True) | Q(reminder_sent_at__lt=F('updated_at')),
+        Exists(CartItem.objects.filter(cart=OuterRef('pk'))),
+        updated_at__lt=now - CART_REMINDER_AFTER,
+        updated_at__gte=now - CART_REMINDER_MAX_AGE,
+    )
+
+
+def stale_carts(retention_days=CART_RETENTION_DAYS, now=None):
+    return Cart.objects.filter(updated_at__lt=(now or timezone.now()) - timedelta(days=retention_days))
+
+
+def _in_batches(carts, handle, batch_size, sleep):
+    """Call ``handle(cart_ids)`` per keyset batch of ``carts``, each batch locked in its own transaction."""
+    result = {'carts': 0, 'batches': 0}
+    last = None
+    while True:
+        page = carts
+        if last:
+            updated_at, pk = last
+            page = page.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+        with transaction.atomic():
+            # Carts being edited right now are skipped; they are not idle.
+            rows = list(
+                page.order_by('updated_at', 'pk').select_for_update(skip_locked=True, of=('self',))
+                .values_list('updated_at', 'pk')[:batch_size]
+            )
+            if not rows:
+                break
+            handle([pk for _, pk in rows])
+        last = rows[-1]
+        result['carts'] += len(rows)
+        result['batches'] += 1
+        if sleep:
+            time.sleep(sleep)
+    return result
+
+
+def _remind(cart_ids, now):
+    carts = Cart.objects.filter(pk__in=cart_ids).with_totals().values_list('customer_id', 'items_quantity')
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=customer_id, notification_type='cart_reminder',
+            title='You left something in your cart',
+            message=f"Your cart still holds {quantity} item{'s' if quantity != 1 else ''}.",
+        )
+        for customer_id, quantity in carts
+    ])
+    Cart.objects.filter(pk__in=cart_ids).update(reminder_sent_at=now)
+
+
+def send_cart_reminders(batch_size=CART_SCAN_BATCH_SIZE, sleep=CART_SCAN_SLEEP, now=None):
+    """Create one reminder notification per abandoned cart. Returns the carts and batches done."""
+    now = now or timezone.now()
+    return _in_batches(abandoned_carts(now), lambda cart_ids: _remind(cart_ids, now), batch_size, sleep)
+
+
+def purge_stale_carts(retention_days=CART_RETENTION_DAYS, batch_size=CART_SCAN_BATCH_SIZE, sleep=CART_SCAN_SLEEP,
+                      now=None):
+    """Delete carts idle for ``retention_days`` with their items. Returns the carts, items and batches."""
+    items = 0
+
+    def purge(cart_ids):
+        nonlocal items
+        _, deleted = Cart.objects.filter(pk__in=cart_ids).delete()
+        items += deleted.get(CartItem._meta.label, 0)
+
+    result = _in_batches(stale_carts(retention_days, now), purge, batch_size, sleep)
+    result['items'] = items
+    return result
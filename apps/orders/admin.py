@@ -1,19 +1,37 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from .models import (
-    Cart, CartItem, Order, OrderItem, OrderTracking, 
+    ArchivedOrder, Cart, CartItem, Order, OrderItem, OrderTracking, 
     Invoice, PreOrder, RestockNotification
 )
+from .search import order_search_filter
+from .transitions import transition_orders
+
+
+def transition_action(target, label):
+    def action(modeladmin, request, queryset):
+        result = transition_orders(queryset.values_list('pk', flat=True), target, request.user)
+        modeladmin.message_user(request, f"{len(result['updated'])} orders marked as {target}.")
+        if result['skipped']:
+            skipped = ', '.join(f"#{row['id']} ({row['status']})" for row in result['skipped'])
+            modeladmin.message_user(request, f'Skipped orders whose status does not allow it: {skipped}',
+                                    level=messages.WARNING)
+    action.__name__ = f'mark_{target}'
+    action.short_description = label
+    return action
 
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
-    readonly_fields = ('subtotal',)
+    readonly_fields = ('subtotal', 'added_at')
     fields = ('product', 'quantity', 'subtotal', 'added_at')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
@@ -21,8 +39,20 @@ class CartAdmin(admin.ModelAdmin):
     list_filter = ('created_at', 'updated_at')
     search_fields = ('customer__username', 'customer__email')
     readonly_fields = ('total_items', 'total_amount', 'created_at', 'updated_at')
+    list_select_related = ('customer',)
     inlines = [CartItemInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
+    @admin.display(description='Total items', ordering='items_quantity')
+    def total_items(self, obj):
+        return obj.total_items
+
+    @admin.display(description='Total amount', ordering='items_amount')
+    def total_amount(self, obj):
+        return obj.total_amount
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -43,11 +73,23 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ('order_number', 'customer', 'status', 'payment_status', 
                    'total_amount', 'created_at', 'order_actions')
     list_filter = ('status', 'payment_status', 'created_at', 'confirmed_at', 'shipped_at')
-    search_fields = ('order_number', 'customer__username', 'customer__email', 'shipping_name')
-    list_editable = ('status', 'payment_status')
-    readonly_fields = ('order_number', 'created_at', 'updated_at', 'confirmed_at', 
+    # Matched by search.py against indexed columns, see get_search_results.
+    search_fields = ('order_number', 'search_email', 'search_phone')
+    search_help_text = 'Order number, customer email or phone number, or the start of one'
+    # Status changes go through the actions, which validate the transition,
+    # stamp its timestamp and write tracking rows for the whole selection.
+    list_editable = ('payment_status',)
+    readonly_fields = ('order_number', 'status', 'created_at', 'updated_at', 'confirmed_at', 
                       'shipped_at', 'delivered_at')
     inlines = [OrderItemInline, OrderTrackingInline]
+    actions = [
+        transition_action('confirmed', 'Confirm selected orders'),
+        transition_action('processing', 'Mark selected orders as processing'),
+        transition_action('shipped', 'Mark selected orders as shipped'),
+        transition_action('delivered', 'Mark selected orders as delivered'),
+        transition_action('cancelled', 'Cancel selected orders'),
+        transition_action('refunded', 'Refund selected orders'),
+    ]
     
     fieldsets = (
         ('Order Information', {
@@ -77,6 +119,12 @@ class OrderAdmin(admin.ModelAdmin):
         })
     )
     
+    def get_search_results(self, request, queryset, search_term):
+        condition = order_search_filter(search_term)
+        if condition is None:
+            return queryset, False
+        return queryset.filter(condition), False
+
     def order_actions(self, obj):
         actions = []
         if obj.status == 'pending':
@@ -132,4 +180,17 @@ class RestockNotificationAdmin(admin.ModelAdmin):
     list_filter = ('is_notified', 'created_at', 'notified_at')
     search_fields = ('customer__username', 'product__name')
     list_editable = ('is_notified',)
-    readonly_fields = ('created_at', 'notified_at')
\ No newline at end of file
+    readonly_fields = ('created_at', 'notified_at')
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ('order_number', 'customer', 'status', 'total_amount', 'created_at', 'archived_at')
+    list_filter = ('status', 'archived_at')
+    search_fields = ('order_number', 'customer__username', 'customer__email')
+    list_select_related = ('customer',)
+    readonly_fields = [field.name for field in ArchivedOrder._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
@@ -0,0 +1,232 @@
+"""
+Hot/cold archival of completed orders.
+
+``archive_orders`` moves delivered, cancelled and refunded orders older than
+``ORDER_ARCHIVE_AFTER_DAYS`` into ``ArchivedOrder``: the order, its items,
+tracking and invoice are serialized into one JSON payload per order and the
+hot rows are deleted. Work is done in keyset batches, each in its own short
+transaction, so only the rows of the current batch are ever locked.
+``restore_orders`` reverses the move.
+
+Notifications, chat messages and tickets that referenced an archived order
+are detached (their ``order`` set to null) rather than deleted; their ids are
+kept in the payload and re-attached on restore. Daily sales rollups keep
+counting archived orders (``reports.py`` reads their payloads).
+"""
+from datetime import date, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+from apps.products.models import Product
+
+from .models import ArchivedOrder, Invoice, Order, OrderItem, OrderTracking
+from .search import fill_search_fields
+from .signals import summaries_suspended
+
+User = get_user_model()
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 730)
+ARCHIVE_BATCH_SIZE = getattr(settings, 'ORDER_ARCHIVE_BATCH_SIZE', 200)
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled', 'refunded')
+
+
+def _linked_models():
+    from apps.notifications.models import ChatMessage, CustomerSupportTicket, Notification
+
+    return {'notifications': Notification, 'chat_messages': ChatMessage, 'tickets': CustomerSupportTicket}
+
+
+def dump_instance(instance):
+    """Concrete field values of ``instance`` keyed by column attribute."""
+    data = {}
+    for field in instance._meta.concrete_fields:
+        value = field.get_prep_value(field.value_from_object(instance))
+        # DjangoJSONEncoder would cut datetimes to milliseconds.
+        data[field.attname] = value.isoformat() if isinstance(value, (date, time)) else value
+    return data
+
+
+def load_instance(model, data):
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    return model(**{name: fields[name].to_python(value) for name, value in data.items() if name in fields})
+
+
+def bulk_restore(model, instances):
+    """``bulk_create`` keeping the stored values of ``auto_now``/``auto_now_add`` fields."""
+    stamped = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    stamps = [[getattr(instance, field.attname) for field in stamped] for instance in instances]
+    model.objects.bulk_create(instances)
+    if stamped and instances:
+        for instance, values in zip(instances, stamps):
+            for field, value in zip(stamped, values):
+                setattr(instance, field.attname, value)
+        model.objects.bulk_update(instances, [field.name for field in stamped])
+
+
+def archivable_orders(older_than_days=ARCHIVE_AFTER_DAYS, now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=older_than_days)
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+
+
+def _archive_batch(orders):
+    order_ids = [order.pk for order in orders]
+    links = {name: {} for name in _linked_models()}
+    for name, model in _linked_models().items():
+        for row_id, order_id in model.objects.filter(order_id__in=order_ids).values_list('id', 'order_id'):
+            links[name].setdefault(order_id, []).append(row_id)
+        model.objects.filter(order_id__in=order_ids).update(order=None)
+
+    prefetch_related_objects(orders, 'items', 'tracking')
+    invoices = {invoice.order_id: invoice for invoice in Invoice.objects.filter(order_id__in=order_ids)}
+    ArchivedOrder.objects.bulk_create([
+        ArchivedOrder(
+            id=order.pk,
+            order_number=order.order_number,
+            customer_id=order.customer_id,
+            status=order.status,
+            payment_status=order.payment_status,
+            total_amount=order.total_amount,
+            item_count=order.item_count,
+            first_item_name=order.first_item_name,
+            latest_tracking_status=order.latest_tracking_status,
+            created_at=order.created_at,
+            updated_at=order.updated_at,
+            payload={
+                'order': dump_instance(order),
+                'items': [dump_instance(item) for item in order.items.all()],
+                'tracking': [dump_instance(entry) for entry in order.tracking.all()],
+                'invoice': dump_instance(invoices[order.pk]) if order.pk in invoices else None,
+                'links': {name: rows.get(order.pk, []) for name, rows in links.items()},
+            },
+        )
+        for order in orders
+    ])
+    with summaries_suspended():
+        Order.objects.filter(pk__in=order_ids).delete()
+
+
+def archive_orders(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False, limit=None):
+    """Move completed orders older than ``older_than_days`` to the archive.
+
+    ``dry_run`` only counts what would move. Returns the numbers of orders,
+    items and tracking entries concerned and of batches run.
+    """
+    candidates = archivable_orders(older_than_days)
+    if dry_run:
+        ids = candidates.values('pk')
+        if limit:
+            ids = list(candidates.order_by('pk').values_list('pk', flat=True)[:limit])
+        return {
+            'orders': len(ids) if limit else candidates.count(),
+            'items': OrderItem.objects.filter(order_id__in=ids).count(),
+            'tracking': OrderTracking.objects.filter(order_id__in=ids).count(),
+            'batches': 0,
+        }
+
+    result = {'orders': 0, 'items': 0, 'tracking': 0, 'batches': 0}
+    last_id = 0
+    while limit is None or result['orders'] < limit:
+        size = batch_size if limit is None else min(batch_size, limit - result['orders'])
+        with transaction.atomic():
+            # Re-evaluated under the row locks, so an order reopened meanwhile stays hot.
+            orders = list(candidates.filter(pk__gt=last_id).order_by('pk').select_for_update()[:size])
+            if not orders:
+                break
+            _archive_batch(orders)
+        last_id = orders[-1].pk
+        result['orders'] += len(orders)
+        result['items'] += sum(len(order.items.all()) for order in orders)
+        result['tracking'] += sum(len(order.tracking.all()) for order in orders)
+        result['batches'] += 1
+    return result
+
+
+def _existing(model, ids):
+    ids = {pk for pk in ids if pk is not None}
+    return set(model.objects.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+
+
+def _restore_batch(archived):
+    payloads = [entry.payload for entry in archived]
+    products = _existing(Product, (item['product_id'] for payload in payloads for item in payload['items']))
+    users = _existing(User, (
+        user_id
+        for payload in payloads
+        for user_id in [payload['order']['processed_by_id'], payload['order']['warehouse_manager_id']]
+        + [entry['updated_by_id'] for entry in payload['tracking']]
+    ))
+
+    restorable = []
+    skipped = []
+    for entry in archived:
+        if all(item['product_id'] in products for item in entry.payload['items']):
+            restorable.append(entry)
+        else:
+            skipped.append(entry.order_number)
+
+    orders, items, tracking, invoices = [], [], [], []
+    links = {name: [] for name in _linked_models()}
+    for entry in restorable:
+        payload = entry.payload
+        order = load_instance(Order, payload['order'])
+        # Staff accounts deleted since archiving, as SET_NULL would have done.
+        for field in ('processed_by_id', 'warehouse_manager_id'):
+            if getattr(order, field) not in users:
+                setattr(order, field, None)
+        orders.append(order)
+        items.extend(load_instance(OrderItem, item) for item in payload['items'])
+        for data in payload['tracking']:
+            tracking_entry = load_instance(OrderTracking, data)
+            if tracking_entry.updated_by_id not in users:
+                tracking_entry.updated_by_id = None
+            tracking.append(tracking_entry)
+        if payload['invoice']:
+            invoices.append(load_instance(Invoice, payload['invoice']))
+        for name, row_ids in payload['links'].items():
+            links[name].extend((row_id, entry.pk) for row_id in row_ids)
+
+    # Orders archived before the search columns existed get them now.
+    unindexed = [order for order in orders if not order.search_email]
+    prefetch_related_objects(unindexed, 'customer')
+    for order in unindexed:
+        fill_search_fields(order)
+    # Bulk inserts skip save() and signals: numbers and summaries come back as archived.
+    bulk_restore(Order, orders)
+    bulk_restore(OrderItem, items)
+    bulk_restore(OrderTracking, tracking)
+    bulk_restore(Invoice, invoices)
+    for name, model in _linked_models().items():
+        model.objects.bulk_update([model(id=row_id, order_id=order_id) for row_id, order_id in links[name]], ['order'])
+    ArchivedOrder.objects.filter(pk__in=[entry.pk for entry in restorable]).delete()
+    return len(restorable), skipped
+
+
+def restore_orders(archived, batch_size=ARCHIVE_BATCH_SIZE, dry_run=False):
+    """Move the ``archived`` queryset of ``ArchivedOrder`` back to the hot tables.
+
+    Orders referencing a product that has since been deleted cannot be
+    restored and are reported as skipped.
+    """
+    if dry_run:
+        return {'orders': archived.count(), 'skipped': [], 'batches': 0}
+
+    result = {'orders': 0, 'skipped': [], 'batches': 0}
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(archived.filter(pk__gt=last_id).order_by('pk').select_for_update()[:batch_size])
+            if not batch:
+                break
+            restored, skipped = _restore_batch(batch)
+        last_id = batch[-1].pk
+        result['orders'] += restored
+        result['skipped'] += skipped
+        result['batches'] += 1
+    return result
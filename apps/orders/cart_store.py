@@ -0,0 +1,464 @@
+"""
+Cart storage backends.
+
+``get_cart_store`` returns the store holding the cart of a request. With
+``CART_STORE = 'db'`` (the default) customers' lines are ``CartItem`` rows as
+before. With ``'cache'`` each cart is a single entry in the
+``CART_CACHE_ALIAS`` cache: adding, changing and removing lines only rewrite
+that entry, and the lines are written to the database when the cart is
+checked out or when ``flush_dirty_carts`` runs (the ``flush_carts``
+command). A cart missing from the cache is loaded from its rows, so an
+evicted cart only loses what changed since the last flush. The cache must be
+shared by every web worker (Redis or Memcached, or the file-based cache
+locally); a per-process local-memory cache only suits a single process.
+
+``apply`` runs a batch of ``add``/``set``/``remove`` operations on a cart in
+one step: the operations are folded into one change per product first, so
+the database store needs the same few queries for one line or a hundred.
+
+Guests identify their cart with the ``X-Cart-Token`` header, issued with
+their first added item. Guest carts always live in the cache and are merged
+into the customer's cart by ``merge_guest_cart`` at login, so the
+``CART_CACHE_ALIAS`` cache must be shared by all workers whichever store is
+used; the project settings point it at the database cache.
+
+Every read-modify-write of an entry holds the entry's ``cache_lock``; a
+request that cannot get it in time fails with ``CartBusy`` (503) rather than
+writing without it.
+
+In the cache store a line is identified by its product id; ``CartItem`` ids
+are only meaningful to the database store.
+"""
+import re
+import secrets
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Prefetch, Value, When
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from rest_framework.exceptions import APIException
+
+from apps.common.cache import CacheLockTimeout, cache_lock
+from apps.products.models import Product, primary_images_prefetch
+
+from .models import Cart, CartItem, OrderItem
+
+CART_STORE = getattr(settings, 'CART_STORE', 'db')
+CART_CACHE_ALIAS = getattr(settings, 'CART_CACHE_ALIAS', 'default')
+CART_CACHE_TIMEOUT = getattr(settings, 'CART_CACHE_TIMEOUT', 30 * 24 * 3600)
+GUEST_CART_TIMEOUT = getattr(settings, 'GUEST_CART_TIMEOUT', 7 * 24 * 3600)
+CART_TOKEN_HEADER = 'X-Cart-Token'
+CART_TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+DIRTY_CARTS_KEY = 'carts:dirty'
+PRODUCT_RELATED = ('category', 'stock', 'rating_summary')
+CART_OPERATIONS = ('add', 'set', 'remove')
+CART_BATCH_MAX_OPERATIONS = getattr(settings, 'CART_BATCH_MAX_OPERATIONS', 100)
+
+
+class CartBusy(APIException):
+    status_code = 503
+    default_detail = 'The cart is being updated by another request, please try again.'
+    default_code = 'cart_busy'
+
+
+@contextmanager
+def _locked(key, cache):
+    try:
+        with cache_lock(key, cache):
+            yield
+    except CacheLockTimeout:
+        raise CartBusy()
+
+
+def fold_operations(operations):
+    """``{product_id: (absolute, quantity)}`` with the net effect of ``operations``.
+
+    ``absolute`` changes replace the line's quantity (0 removes the line);
+    the others are increments.
+    """
+    changes = {}
+    for operation in operations:
+        product_id = operation['product_id']
+        if operation['op'] == 'remove':
+            changes[product_id] = (True, 0)
+        elif operation['op'] == 'set':
+            changes[product_id] = (True, operation['quantity'])
+        else:
+            absolute, quantity = changes.get(product_id, (False, 0))
+            changes[product_id] = (absolute, quantity + operation['quantity'])
+    return changes
+
+
+def _plan(changes, existing, available):
+    """Split ``changes`` into lines to remove, update and create, and skipped products."""
+    plan = {'remove': [], 'update': {}, 'create': {}, 'skipped': []}
+    for product_id, (absolute, quantity) in changes.items():
+        if absolute and quantity == 0:
+            if product_id in existing:
+                plan['remove'].append(product_id)
+        elif product_id not in available:
+            plan['skipped'].append({'product_id': product_id, 'reason': 'unavailable'})
+        elif product_id in existing:
+            plan['update'][product_id] = (absolute, quantity)
+        else:
+            plan['create'][product_id] = quantity
+    return plan
+
+
+def _result(plan, skipped=()):
+    return {
+        'added': len(plan['create']),
+        'updated': len(plan['update']),
+        'removed': len(plan['remove']),
+        'skipped': list(skipped) + plan['skipped'],
+    }
+
+
+def _active_products(product_ids):
+    return set(Product.objects.filter(pk__in=product_ids, is_active=True).values_list('pk', flat=True))
+
+
+class DatabaseCartStore:
+    """Lines as ``CartItem`` rows of the customer's ``Cart``."""
+    token = None
+
+    def __init__(self, user):
+        self.user = user
+
+    def get_cart(self, with_items=True, expand_products=False):
+        """The ``Cart`` with SQL totals and, if asked, its lines prefetched."""
+        carts = Cart.objects.with_totals()
+        if with_items:
+            carts = carts.prefetch_related(Prefetch('items', queryset=self.items(expand_products)))
+        try:
+            return carts.get(customer=self.user)
+        except Cart.DoesNotExist:
+            Cart.objects.get_or_create(customer=self.user)
+            return carts.get(customer=self.user)
+
+    def items(self, expand_products=False):
+        items = CartItem.objects.filter(cart__customer=self.user).select_related('product').order_by('pk')
+        if expand_products:
+            items = items.select_related(*(f'product__{name}' for name in PRODUCT_RELATED)).prefetch_related(
+                primary_images_prefetch('product__images')
+            )
+        return items
+
+    def get_item(self, line_id, expand_products=False):
+        return get_object_or_404(self.items(expand_products), pk=line_id)
+
+    def add(self, product, quantity):
+        self.apply([{'op': 'add', 'product_id': product.pk, 'quantity': quantity}])
+        return self.items().get(product=product)
+
+    def apply(self, operations, skipped=()):
+        changes = fold_operations(operations)
+        with transaction.atomic():
+            cart, created = Cart.objects.get_or_create(customer=self.user)
+            # Locks the cart row, so batches on one cart run one after another.
+            Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+            lines = CartItem.objects.filter(cart=cart)
+            existing = set(lines.filter(product_id__in=changes).values_list('product_id', flat=True))
+            plan = _plan(changes, existing, _active_products(changes))
+            if plan['remove']:
+                lines.filter(product_id__in=plan['remove']).delete()
+            if plan['update']:
+                lines.filter(product_id__in=plan['update']).update(quantity=Case(
+                    *(
+                        When(product_id=product_id, then=Value(quantity) if absolute else F('quantity') + quantity)
+                        for product_id, (absolute, quantity) in plan['update'].items()
+                    ),
+                    output_field=PositiveIntegerField(),
+                ))
+            CartItem.objects.bulk_create([
+                CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                for product_id, quantity in plan['create'].items()
+            ])
+        return _result(plan, skipped)
+
+    def update(self, item, quantity):
+        item.quantity = quantity
+        item.save()
+        self._touch()
+        return item
+
+    def remove(self, item):
+        item.delete()
+        self._touch()
+
+    def clear(self):
+        CartItem.objects.filter(cart__customer=self.user).delete()
+        self._touch()
+
+    def _touch(self):
+        # Line changes do not save the cart; abandoned_carts.py goes by its updated_at.
+        Cart.objects.filter(customer=self.user).update(updated_at=timezone.now())
+
+    @contextmanager
+    def flushed(self):
+        yield
+
+
+class StoredCart:
+    """A cart held by ``CacheCartStore``, shaped like ``Cart`` for ``CartSerializer``."""
+    id = None
+
+    def __init__(self, customer_id, entry, items):
+        self.customer_id = customer_id
+        self.created_at = _parse(entry.get('created_at'))
+        self.updated_at = _parse(entry.get('updated_at'))
+        self.items = items
+        self.total_items = sum(item.quantity for item in items)
+        self.total_amount = sum((item.subtotal for item in items), Decimal('0'))
+
+
+def _parse(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _empty_entry():
+    return {'lines': {}, 'dirty': False}
+
+
+def _mark_dirty(cache, user_id):
+    with _locked(DIRTY_CARTS_KEY, cache):
+        user_ids = cache.get(DIRTY_CARTS_KEY) or set()
+        user_ids.add(user_id)
+        cache.set(DIRTY_CARTS_KEY, user_ids, None)
+
+
+def _write_lines(user_id, lines):
+    """Make the ``CartItem`` rows of ``user_id`` match ``lines``."""
+    products = set(Product.objects.filter(pk__in=lines).values_list('pk', flat=True))
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(customer_id=user_id)
+        CartItem.objects.filter(cart=cart).exclude(product_id__in=products).delete()
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                for product_id, (quantity, added_at) in lines.items() if product_id in products
+            ],
+            update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity'],
+        )
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+
+
+class CacheCartStore:
+    """Lines in one cache entry, ``{'lines': {product_id: [quantity, added_at]}, 'dirty': bool, ...}``.
+
+    Give ``user_id`` for a customer's cart, ``token`` (or nothing, to issue
+    one on the first write) for a guest cart.
+    """
+
+    def __init__(self, user_id=None, token=None):
+        self.user_id = user_id
+        self.token = token
+        self.cache = caches[CART_CACHE_ALIAS]
+
+    @property
+    def key(self):
+        return f'cart:user:{self.user_id}' if self.user_id is not None else f'cart:guest:{self.token}'
+
+    @property
+    def timeout(self):
+        return CART_CACHE_TIMEOUT if self.user_id is not None else GUEST_CART_TIMEOUT
+
+    def _load(self):
+        if self.user_id is None and self.token is None:
+            return _empty_entry()
+        entry = self.cache.get(self.key)
+        if entry is None:
+            entry = _empty_entry()
+            if self.user_id is not None:
+                rows = CartItem.objects.filter(cart__customer_id=self.user_id).order_by('added_at', 'pk')
+                for product_id, quantity, added_at in rows.values_list('product_id', 'quantity', 'added_at'):
+                    entry['lines'][product_id] = [quantity, added_at.isoformat()]
+                # add, not set: an editor may have stored the entry since the miss.
+                if not self.cache.add(self.key, entry, self.timeout):
+                    entry = self.cache.get(self.key) or entry
+        return entry
+
+    @contextmanager
+    def _editing(self):
+        """Yield the lines for changing, under the cart's lock, and store them."""
+        if self.user_id is None and self.token is None:
+            self.token = secrets.token_urlsafe(24)
+        with _locked(self.key, self.cache):
+            entry = self._load()
+            yield entry['lines']
+            now = timezone.now().isoformat()
+            entry.setdefault('created_at', now)
+            entry['updated_at'] = now
+            was_dirty, entry['dirty'] = entry['dirty'], self.user_id is not None
+            self.cache.set(self.key, entry, self.timeout)
+        if entry['dirty'] and not was_dirty:
+            _mark_dirty(self.cache, self.user_id)
+
+    def _items(self, lines, expand_products):
+        products = Product.objects.all()
+        if expand_products:
+            products = products.select_related(*PRODUCT_RELATED).prefetch_related(primary_images_prefetch())
+        products = products.in_bulk(list(lines))
+        return [
+            CartItem(id=product_id, product=products[product_id], quantity=quantity, added_at=_parse(added_at))
+            for product_id, (quantity, added_at) in lines.items() if product_id in products
+        ]
+
+    def get_cart(self, with_items=True, expand_products=False):
+        entry = self._load()
+        return StoredCart(self.user_id, entry, self._items(entry['lines'], expand_products))
+
+    def items(self, expand_products=False):
+        return self._items(self._load()['lines'], expand_products)
+
+    def get_item(self, line_id, expand_products=False):
+        lines = self._load()['lines']
+        items = self._items({line_id: lines[line_id]}, expand_products) if line_id in lines else []
+        if not items:
+            raise Http404
+        return items[0]
+
+    def add(self, product, quantity):
+        with self._editing() as lines:
+            current, added_at = lines.get(product.pk, (0, timezone.now().isoformat()))
+            lines[product.pk] = [current + quantity, added_at]
+        return CartItem(id=product.pk, product=product, quantity=current + quantity, added_at=_parse(added_at))
+
+    def apply(self, operations, skipped=()):
+        changes = fold_operations(operations)
+        available = _active_products(changes)
+        with self._editing() as lines:
+            plan = _plan(changes, set(lines), available)
+            for product_id in plan['remove']:
+                del lines[product_id]
+            for product_id, (absolute, quantity) in plan['update'].items():
+                lines[product_id][0] = quantity if absolute else lines[product_id][0] + quantity
+            now = timezone.now().isoformat()
+            for product_id, quantity in plan['create'].items():
+                lines[product_id] = [quantity, now]
+        return _result(plan, skipped)
+
+    def update(self, item, quantity):
+        with self._editing() as lines:
+            lines[item.product_id] = [quantity, item.added_at.isoformat()]
+        item.quantity = quantity
+        return item
+
+    def remove(self, item):
+        with self._editing() as lines:
+            lines.pop(item.product_id, None)
+
+    def clear(self):
+        if self.user_id is None and self.token is None:
+            return
+        with self._editing() as lines:
+            lines.clear()
+
+    def _flush(self):
+        entry = self.cache.get(self.key)
+        if entry is None or not entry['dirty']:
+            return False
+        _write_lines(self.user_id, entry['lines'])
+        entry['dirty'] = False
+        self.cache.set(self.key, entry, self.timeout)
+        return True
+
+    def flush(self):
+        """Write the cart to the database if it changed since the last flush."""
+        with _locked(self.key, self.cache):
+            return self._flush()
+
+    @contextmanager
+    def flushed(self):
+        """Flush and keep the cart locked while the caller works on its rows.
+
+        The entry is dropped afterwards, so the next read reloads whatever the
+        caller left in the database (an empty cart after checkout).
+        """
+        with _locked(self.key, self.cache):
+            self._flush()
+            try:
+                yield
+            finally:
+                self.cache.delete(self.key)
+
+
+def cart_store_for(user):
+    if CART_STORE == 'cache':
+        return CacheCartStore(user_id=user.pk)
+    return DatabaseCartStore(user)
+
+
+def get_cart_store(request):
+    if request.user.is_authenticated:
+        return cart_store_for(request.user)
+    token = request.headers.get(CART_TOKEN_HEADER, '')
+    return CacheCartStore(token=token if CART_TOKEN_PATTERN.match(token) else None)
+
+
+def merge_guest_cart(request, user):
+    """Move the lines of the request's guest cart into ``user``'s cart."""
+    token = request.headers.get(CART_TOKEN_HEADER, '')
+    if not CART_TOKEN_PATTERN.match(token):
+        return 0
+    guest = CacheCartStore(token=token)
+    with _locked(guest.key, guest.cache):
+        entry = guest.cache.get(guest.key)
+        guest.cache.delete(guest.key)
+    if not entry or not entry['lines']:
+        return 0
+    cart_store_for(user).apply([
+        {'op': 'add', 'product_id': product_id, 'quantity': quantity}
+        for product_id, (quantity, added_at) in entry['lines'].items()
+    ])
+    return len(entry['lines'])
+
+
+def reorder(store, order):
+    """Add the lines of ``order`` to the cart of ``store``.
+
+    Inactive products are skipped, and so are products with nothing
+    available; quantities are capped at the available stock. Products
+    without a stock row are not limited, as at checkout.
+    """
+    operations = []
+    skipped = []
+    rows = OrderItem.objects.filter(order=order).order_by('pk').values_list(
+        'product_id', 'quantity', 'product__is_active', 'product__stock__quantity',
+        'product__stock__reserved_quantity',
+    )
+    for product_id, quantity, is_active, in_stock, reserved in rows:
+        # ``in_stock`` is only null when the product has no stock row.
+        available = quantity if in_stock is None else in_stock - reserved
+        if not is_active:
+            skipped.append({'product_id': product_id, 'reason': 'unavailable'})
+        elif available < 1:
+            skipped.append({'product_id': product_id, 'reason': 'out_of_stock'})
+        else:
+            operations.append({'op': 'add', 'product_id': product_id, 'quantity': min(quantity, available)})
+    return store.apply(operations, skipped)
+
+
+def flush_dirty_carts():
+    """Write every cart changed since the last run to the database."""
+    cache = caches[CART_CACHE_ALIAS]
+    with _locked(DIRTY_CARTS_KEY, cache):
+        user_ids = sorted(cache.get(DIRTY_CARTS_KEY) or ())
+        cache.delete(DIRTY_CARTS_KEY)
+    flushed = 0
+    for position, user_id in enumerate(user_ids):
+        try:
+            flushed += CacheCartStore(user_id=user_id).flush()
+        except Exception:
+            # Still dirty: keep them for the next run.
+            for pending in user_ids[position:]:
+                _mark_dirty(cache, pending)
+            raise
+    return flushed
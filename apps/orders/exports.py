@@ -0,0 +1,125 @@
+"""
+Streaming order exports for accounting.
+
+One row per order line, with the order's columns repeated, read with
+``values_list().iterator(chunk_size=...)`` so at most one chunk of rows is in
+memory however long the date range is. Rows come in ``(order_id, item_id)``
+order, which makes an interrupted file export resumable: ``resume_position``
+reads the ids of the last complete row back from the end of the file.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OrderItem
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'ORDER_EXPORT_CHUNK_SIZE', 2000)
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+EXPORT_COLUMNS = (
+    ('order_id', 'order_id'),
+    ('order_number', 'order__order_number'),
+    ('created_at', 'order__created_at'),
+    ('status', 'order__status'),
+    ('payment_status', 'order__payment_status'),
+    ('customer_id', 'order__customer_id'),
+    ('customer_email', 'order__customer__email'),
+    ('coupon_code', 'order__coupon_code'),
+    ('order_subtotal', 'order__subtotal'),
+    ('order_discount', 'order__discount_amount'),
+    ('order_shipping', 'order__shipping_cost'),
+    ('order_tax', 'order__tax_amount'),
+    ('order_total', 'order__total_amount'),
+    ('item_id', 'id'),
+    ('product_id', 'product_id'),
+    ('product_sku', 'product_sku'),
+    ('product_name', 'product_name'),
+    ('quantity', 'quantity'),
+    ('unit_price', 'unit_price'),
+    ('line_total', 'total_price'),
+)
+HEADER = [name for name, lookup in EXPORT_COLUMNS]
+# Scanned from the end of a file for its last complete row.
+RESUME_TAIL_BYTES = 64 * 1024
+
+
+def export_rows(start, end, statuses=None, after=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Rows of the lines of orders created from ``start`` to ``end`` (inclusive dates).
+
+    ``after`` is an ``(order_id, item_id)`` pair to continue from.
+    """
+    lines = OrderItem.objects.filter(
+        order__created_at__gte=timezone.make_aware(datetime.combine(start, time.min)),
+        order__created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+    if statuses:
+        lines = lines.filter(order__status__in=statuses)
+    if after:
+        order_id, item_id = after
+        lines = lines.filter(Q(order_id__gt=order_id) | Q(order_id=order_id, id__gt=item_id))
+    rows = lines.order_by('order_id', 'id').values_list(*(lookup for name, lookup in EXPORT_COLUMNS))
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def _text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # One row per line, which ``resume_position`` relies on.
+    return '' if value is None else ' '.join(str(value).splitlines())
+
+
+def csv_lines(rows, header=True):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    if header:
+        writer.writerow(HEADER)
+        yield flush()
+    for row in rows:
+        writer.writerow([_text(value) for value in row])
+        yield flush()
+
+
+def jsonl_lines(rows, header=False):
+    for row in rows:
+        yield json.dumps(dict(zip(HEADER, (_text(value) for value in row)))) + '\n'
+
+
+FORMATTERS = {'csv': csv_lines, 'jsonl': jsonl_lines}
+
+
+def resume_position(path, output):
+    """``(order_id, item_id)`` of the last complete row of ``path``, or ``None``.
+
+    A partly written last row is cut off, so appending continues cleanly.
+    """
+    with open(path, 'rb+') as file:
+        size = file.seek(0, os.SEEK_END)
+        file.seek(max(0, size - RESUME_TAIL_BYTES))
+        tail = file.read()
+        end = tail.rfind(b'\n') + 1
+        file.truncate(size - len(tail) + end)
+    # Only the last complete row is decoded: the tail may start inside a
+    # multibyte character.
+    start = tail.rfind(b'\n', 0, end - 1) + 1
+    last = tail[start:end].decode().strip()
+    if not last:
+        return None
+    if output == 'jsonl':
+        record = json.loads(last)
+    else:
+        record = dict(zip(HEADER, next(csv.reader([last]))))
+        if record['order_id'] == 'order_id':
+            return None
+    return int(record['order_id']), int(record['item_id'])
@@ -0,0 +1,171 @@
+"""
+``Idempotency-Key`` support for mutating endpoints.
+
+The first request for a (user, key) pair claims an ``IdempotencyKey`` row,
+runs the view and stores the rendered response on it. A retry with the same
+key gets the stored response back with a single lookup; a retry that
+arrives while the first request is still running waits for it to finish
+rather than running the view again. Responses of 5xx or raised exceptions
+release the key so the client may retry for real.
+"""
+import hashlib
+import json
+import time
+import zlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http.request import RawPostDataException
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_TTL = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+IDEMPOTENCY_WAIT_TIMEOUT = getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 10)
+IDEMPOTENCY_POLL_INTERVAL = getattr(settings, 'IDEMPOTENCY_POLL_INTERVAL', 0.05)
+# An in-flight claim older than this is assumed to belong to a dead worker.
+IDEMPOTENCY_LOCK_TIMEOUT = getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60)
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode())
+    try:
+        digest.update(request.body)
+    except RawPostDataException:
+        # The body stream was already consumed; fall back to the parsed data.
+        digest.update(json.dumps(request.data, cls=JSONEncoder, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _is_stale(record, now):
+    # Expired but not purged yet, or claimed by a worker that died mid-request.
+    return record.expires_at <= now or (
+        record.status_code is None
+        and record.created_at <= now - timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT)
+    )
+
+
+def _claim(user, key, fingerprint):
+    """``(record, claimed)``; ``claimed`` is True when this request must run the view.
+
+    A replay costs the single lookup; only first requests insert.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is None:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user, key=key, fingerprint=fingerprint, expires_at=expires_at
+                )
+            return record, True
+        except IntegrityError:
+            # Lost the race to a concurrent duplicate.
+            return IdempotencyKey.objects.get(user=user, key=key), False
+
+    if not _is_stale(record, now):
+        return record, False
+    # Conditional on the stale row, so only one retry takes it over.
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, created_at=record.created_at, status_code=record.status_code
+    ).update(
+        fingerprint=fingerprint, status_code=None, response_body=None, created_at=now, expires_at=expires_at
+    )
+    if taken:
+        record.fingerprint = fingerprint
+        record.status_code = None
+        record.response_body = None
+        record.created_at = now
+        record.expires_at = expires_at
+        return record, True
+    return IdempotencyKey.objects.get(pk=record.pk), False
+
+
+def _wait_for(record):
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+    while record is not None and record.status_code is None and time.monotonic() < deadline:
+        time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+    return record
+
+
+def _replay(record):
+    data = json.loads(zlib.decompress(record.response_body)) if record.response_body else None
+    response = Response(data, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _store(record, response):
+    body = None
+    if response.data is not None:
+        body = zlib.compress(json.dumps(response.data, cls=JSONEncoder, separators=(',', ':')).encode())
+    IdempotencyKey.objects.filter(pk=record.pk).update(status_code=response.status_code, response_body=body)
+
+
+def idempotent(view):
+    """Make a DRF view function (or, via ``method_decorator``, method) replay-safe.
+
+    Requests without the header, or from anonymous users, run unchanged.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_fingerprint(request)
+        record, claimed = _claim(request.user, key, fingerprint)
+        if not claimed:
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            record = _wait_for(record)
+            if record is None or record.status_code is None:
+                return Response(
+                    {'error': f'A request with this {IDEMPOTENCY_HEADER} is still in progress'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            return _replay(record)
+
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+            raise
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+        else:
+            _store(record, response)
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(batch_size=1000, now=None):
+    """Delete expired keys in primary-key batches; returns the number removed."""
+    now = now or timezone.now()
+    removed = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=now).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return removed
+        removed += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,138 @@
+"""
+Invoice creation and background PDF rendering.
+
+Confirming an order queues its invoice: ``queue_invoices`` creates the
+``Invoice`` row without a file, and an invoice with an empty ``pdf_file`` is
+pending. ``render_invoices`` (run by the ``render_invoices`` command) picks up
+pending invoices in keyset batches, renders them in a process pool with the
+pure-Python writer in ``pdf.py`` and stores the files through the default
+media storage, so request workers never render and later downloads are
+served from the stored file.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from .models import Invoice, OrderItem
+from .numbering import next_number
+from .pdf import render_invoice
+
+INVOICE_DUE_DAYS = getattr(settings, 'INVOICE_DUE_DAYS', 14)
+INVOICE_SELLER_NAME = getattr(settings, 'INVOICE_SELLER_NAME', 'Organic Store')
+INVOICE_RENDER_WORKERS = getattr(settings, 'INVOICE_RENDER_WORKERS', os.cpu_count() or 1)
+INVOICE_RENDER_BATCH_SIZE = getattr(settings, 'INVOICE_RENDER_BATCH_SIZE', 100)
+
+
+def queue_invoices(order_ids):
+    """Create the invoices of ``order_ids`` that do not have one yet, unrendered."""
+    order_ids = set(order_ids) - set(
+        Invoice.objects.filter(order_id__in=order_ids).values_list('order_id', flat=True)
+    )
+    due_date = timezone.now() + timedelta(days=INVOICE_DUE_DAYS)
+    return Invoice.objects.bulk_create([
+        Invoice(order_id=order_id, invoice_number=next_number('invoice', 'INV', 6), due_date=due_date)
+        for order_id in sorted(order_ids)
+    ])
+
+
+def pending_invoices():
+    return Invoice.objects.filter(Q(pdf_file='') | Q(pdf_file__isnull=True))
+
+
+def _address(*parts):
+    return ', '.join(part for part in parts if part)
+
+
+def invoice_data(invoice):
+    """Plain, picklable description of ``invoice`` for ``pdf.render_invoice``."""
+    order = invoice.order
+    if order.billing_address:
+        bill_to = [
+            order.billing_name or order.shipping_name, order.billing_address,
+            _address(order.billing_city, order.billing_state, order.billing_postal_code),
+            order.billing_country,
+        ]
+    else:
+        bill_to = [
+            order.shipping_name, order.shipping_address,
+            _address(order.shipping_city, order.shipping_state, order.shipping_postal_code),
+            order.shipping_country,
+        ]
+    totals = [('Subtotal', order.subtotal)]
+    if order.discount_amount:
+        totals.append(('Discount', -order.discount_amount))
+    totals += [('Shipping', order.shipping_cost), ('Tax', order.tax_amount), ('Total', order.total_amount)]
+    return {
+        'seller': INVOICE_SELLER_NAME,
+        'invoice_number': invoice.invoice_number,
+        'invoice_date': invoice.invoice_date.date().isoformat(),
+        'order_number': order.order_number,
+        'bill_to': [line for line in bill_to if line],
+        'items': [
+            {
+                'name': item.product_name, 'sku': item.product_sku, 'quantity': item.quantity,
+                'unit_price': str(item.unit_price), 'total_price': str(item.total_price),
+            }
+            for item in order.items.all()
+        ],
+        'totals': [(label, str(value)) for label, value in totals],
+    }
+
+
+def _render_batch(invoices, pool, workers):
+    data = [invoice_data(invoice) for invoice in invoices]
+    if pool is None:
+        documents = [render_invoice(item) for item in data]
+    else:
+        documents = list(pool.map(render_invoice, data, chunksize=max(1, len(data) // (workers * 4))))
+    replaced = []
+    for invoice, (content, _) in zip(invoices, documents):
+        if invoice.pdf_file:
+            replaced.append(invoice.pdf_file.name)
+        invoice.pdf_file.save(f'{invoice.invoice_number}.pdf', ContentFile(content), save=False)
+    Invoice.objects.bulk_update(invoices, ['pdf_file'])
+    return sum(pages for _, pages in documents), replaced
+
+
+def render_invoices(invoices=None, workers=INVOICE_RENDER_WORKERS, batch_size=INVOICE_RENDER_BATCH_SIZE):
+    """Render and store the PDFs of ``invoices`` (default: the pending ones).
+
+    Invoices that already have a file are re-rendered and their old file is
+    deleted. Returns the numbers of invoices and pages and the seconds spent.
+    """
+    invoices = pending_invoices() if invoices is None else invoices
+    invoices = invoices.select_related('order').prefetch_related(
+        Prefetch('order__items', queryset=OrderItem.objects.order_by('pk'))
+    )
+    started = time.perf_counter()
+    result = {'invoices': 0, 'pages': 0}
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                # Skipping locked rows lets several renderers share the backlog.
+                batch = list(
+                    invoices.filter(pk__gt=last_id).order_by('pk')
+                    .select_for_update(skip_locked=True, of=('self',))[:batch_size]
+                )
+                if not batch:
+                    break
+                pages, replaced = _render_batch(batch, pool, workers)
+            for name in replaced:
+                Invoice.pdf_file.field.storage.delete(name)
+            last_id = batch[-1].pk
+            result['invoices'] += len(batch)
+            result['pages'] += pages
+    finally:
+        if pool:
+            pool.shutdown()
+    result['seconds'] = time.perf_counter() - started
+    return result
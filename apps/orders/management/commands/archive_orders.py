@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.archive import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive_orders, restore_orders
+from apps.orders.models import ArchivedOrder
+
+
+class Command(BaseCommand):
+    help = 'Move delivered/cancelled/refunded orders older than --days to the archive, or --restore them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--limit', type=int, help='Archive at most this many orders')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+        parser.add_argument('--restore', action='store_true', help='Move archived orders back')
+        parser.add_argument('--order-number', action='append', default=[], help='Restore only these orders')
+        parser.add_argument('--customer', type=int, help='Restore only the orders of this customer id')
+        parser.add_argument('--all', action='store_true', help='Restore every archived order')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['restore']:
+            if not (options['order_number'] or options['customer'] or options['all']):
+                raise CommandError('Pass --order-number, --customer or --all to choose the orders to restore')
+            archived = ArchivedOrder.objects.all()
+            if options['order_number']:
+                archived = archived.filter(order_number__in=options['order_number'])
+            if options['customer']:
+                archived = archived.filter(customer_id=options['customer'])
+            result = restore_orders(archived, batch_size=options['batch_size'], dry_run=options['dry_run'])
+            summary = f"{result['orders']} orders in {result['batches']} batches"
+            if result['skipped']:
+                self.stdout.write(self.style.WARNING(
+                    f"Not restored (product deleted): {', '.join(result['skipped'])}"
+                ))
+            verb = 'Would restore' if options['dry_run'] else 'Restored'
+        else:
+            result = archive_orders(
+                older_than_days=options['days'], batch_size=options['batch_size'],
+                dry_run=options['dry_run'], limit=options['limit'],
+            )
+            summary = (f"{result['orders']} orders ({result['items']} items, {result['tracking']} tracking "
+                       f"entries) in {result['batches']} batches")
+            verb = 'Would archive' if options['dry_run'] else 'Archived'
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'{verb} {summary} in {elapsed * 1000:.0f}ms'))
@@ -0,0 +1,80 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.orders.cart_store import CacheCartStore, DatabaseCartStore, flush_dirty_carts
+from apps.orders.models import Cart
+from apps.products.models import Category, Product
+
+USERNAME = 'cart-benchmark'
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Compare sustained add-to-cart throughput of the database and cache cart stores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=50)
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument('--adds', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        customers = User.objects.bulk_create([
+            User(username=f'{USERNAME}-{i}', email=f'{USERNAME}-{i}@example.com')
+            for i in range(options['customers'])
+        ])
+        category = Category.objects.create(name='Cart benchmark')
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Cart benchmark {i}', description='-', category=category,
+                sku=f'CART-BENCHMARK-{i}', price=Decimal('2.00'), cost_price=Decimal('1.00'),
+            )
+            for i in range(options['products'])
+        ])
+        rng = random.Random(42)
+        adds = [(rng.choice(customers), rng.choice(products)) for _ in range(options['adds'])]
+
+        try:
+            for label, store_for in (
+                ('db', DatabaseCartStore),
+                ('cache', lambda customer: CacheCartStore(user_id=customer.pk)),
+            ):
+                Cart.objects.filter(customer__in=customers).delete()
+                stores = {customer.pk: store_for(customer) for customer in customers}
+                queries = QueryCounter()
+                with connection.execute_wrapper(queries):
+                    started = time.perf_counter()
+                    for customer, product in adds:
+                        stores[customer.pk].add(product, 1)
+                    elapsed = time.perf_counter() - started
+                line = (
+                    f'{label:>5}: {len(adds) / elapsed:8.0f} adds/sec, '
+                    f'{queries.count / len(adds):.2f} queries per add'
+                )
+                if label == 'cache':
+                    queries = QueryCounter()
+                    with connection.execute_wrapper(queries):
+                        started = time.perf_counter()
+                        flushed = flush_dirty_carts()
+                        elapsed = time.perf_counter() - started
+                    line += f'; flushing {flushed} carts took {elapsed * 1000:.0f}ms and {queries.count} queries'
+                    for store in stores.values():
+                        store.cache.delete(store.key)
+                self.stdout.write(line)
+        finally:
+            User.objects.filter(pk__in=[customer.pk for customer in customers]).delete()
+            category.delete()
+        self.stdout.write(self.style.SUCCESS('Done'))
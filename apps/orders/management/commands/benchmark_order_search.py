@@ -0,0 +1,113 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from apps.orders.models import Order
+from apps.orders.search import normalize_email, normalize_phone, search_orders
+
+BATCH_SIZE = 5000
+FIRST_NAMES = ('amara', 'nimal', 'kasun', 'dilini', 'ruwan', 'sachini', 'tharaka', 'ishara', 'malith', 'hiruni')
+DOMAINS = ('example.com', 'mail.example.org', 'shop.example.net')
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_search(queryset, term):
+    """What the admin's ``search_fields`` searched before the lookup columns."""
+    return queryset.filter(
+        Q(order_number__icontains=term) | Q(customer__username__icontains=term)
+        | Q(customer__email__icontains=term) | Q(shipping_name__icontains=term)
+    )[:50]
+
+
+class Command(BaseCommand):
+    help = 'Compare staff order search latency with the old icontains search on synthetic orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1_000_000)
+        parser.add_argument('--customers', type=int, default=50_000)
+        parser.add_argument('--lookups', type=int, default=200, help='Lookups per query kind')
+        parser.add_argument('--legacy-lookups', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def create_orders(self, options, rng):
+        User = get_user_model()
+        customers = User.objects.bulk_create([
+            User(
+                username=f'search-benchmark-{i}',
+                email=f'{rng.choice(FIRST_NAMES)}.{i}@{rng.choice(DOMAINS)}',
+                phone_number=f'+94{rng.randint(700000000, 789999999)}',
+            )
+            for i in range(options['customers'])
+        ], batch_size=BATCH_SIZE)
+        day = date(2024, 1, 1)
+        for start in range(0, options['orders'], BATCH_SIZE):
+            orders = []
+            for number in range(start, min(start + BATCH_SIZE, options['orders'])):
+                customer = rng.choice(customers)
+                order = Order(
+                    order_number=f'ORG{day + timedelta(days=number // 3000):%Y%m%d}{number:08d}',
+                    customer=customer, subtotal=Decimal('10.00'), total_amount=Decimal('10.00'),
+                    shipping_name=customer.username, shipping_address='1 Main St', shipping_city='Colombo',
+                    shipping_state='Western', shipping_postal_code='00100', shipping_country='LK',
+                    shipping_phone=customer.phone_number if rng.random() < 0.5 else '',
+                )
+                # bulk_create skips save(), which fills these in.
+                order.search_email = normalize_email(customer.email)
+                order.search_phone = normalize_phone(order.shipping_phone or customer.phone_number)
+                orders.append(order)
+            Order.objects.bulk_create(orders)
+        return customers
+
+    def time_queries(self, search, terms):
+        timings = []
+        found = 0
+        for term in terms:
+            started = time.perf_counter()
+            found += len(list(search(term)))
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return statistics.median(timings) * 1000, timings[int(len(timings) * 0.99)] * 1000, found / len(terms)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            # Everything is written inside a transaction that is always
+            # rolled back, so the command is safe on a real database.
+            with transaction.atomic():
+                started = time.perf_counter()
+                customers = self.create_orders(options, rng)
+                self.stdout.write(f"{options['orders']} orders created in {time.perf_counter() - started:.0f}s")
+
+                orders = Order.objects.select_related('customer')
+                numbers = list(Order.objects.order_by('?').values_list('order_number', flat=True)[:options['lookups']])
+                sample = rng.sample(customers, min(options['lookups'], len(customers)))
+                kinds = {
+                    'order number (exact)': (numbers, True),
+                    'order number (prefix)': ([number[:-3] for number in numbers], False),
+                    'email (exact)': ([customer.email.upper() for customer in sample], True),
+                    'email (prefix)': ([customer.email.split('@')[0] for customer in sample], False),
+                    'phone (prefix)': ([customer.phone_number[:-2] for customer in sample], False),
+                }
+                for label, (terms, exact) in kinds.items():
+                    p50, p99, found = self.time_queries(
+                        lambda term: search_orders(orders, term, exact=exact), terms
+                    )
+                    self.stdout.write(f'  {label:<22} p50 {p50:7.2f}ms  p99 {p99:7.2f}ms  {found:.1f} hits')
+
+                terms = [customer.email.split('@')[0] for customer in sample[:options['legacy_lookups']]]
+                p50, p99, found = self.time_queries(lambda term: legacy_search(orders, term), terms)
+                self.stdout.write(f"  {'icontains (before)':<22} p50 {p50:7.2f}ms  p99 {p99:7.2f}ms  {found:.1f} hits")
+                raise Rollback
+        except Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS('Done (all benchmark rows rolled back)'))
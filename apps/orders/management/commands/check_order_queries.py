@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.orders.services import create_order
+from apps.products.models import Category, Product, Stock
+
+ORDER_FIELDS = {
+    'shipping_name': 'Query Check', 'shipping_address': '1 Main St', 'shipping_city': 'Colombo',
+    'shipping_state': 'Western', 'shipping_postal_code': '00100', 'shipping_country': 'LK',
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Check that placing an order costs the same number of queries for any number of lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,100', help='Comma separated line counts to compare')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        counts = {}
+        try:
+            # Fixtures and orders are written inside a transaction that is
+            # always rolled back, so the command is safe on a real database.
+            with transaction.atomic():
+                customer = get_user_model().objects.create_user('order-query-check', 'check@example.com')
+                category = Category.objects.create(name='Order query check')
+                products = Product.objects.bulk_create([
+                    Product(
+                        name=f'Query check {i}', description='-', category=category,
+                        sku=f'QUERY-CHECK-{i}', price=Decimal('1.00') + i, cost_price=Decimal('0.50'),
+                    )
+                    for i in range(max(sizes))
+                ])
+                Stock.objects.bulk_create([Stock(product=product, quantity=1000) for product in products])
+
+                for size in sizes:
+                    lines = [{'product_id': product.id, 'quantity': 2} for product in products[:size]]
+                    with CaptureQueriesContext(connection) as queries:
+                        create_order(customer, lines, **ORDER_FIELDS)
+                    counts[size] = len(queries)
+                    self.stdout.write(f'{size:>5} lines: {counts[size]} queries')
+                raise Rollback
+        except Rollback:
+            pass
+
+        if len(set(counts.values())) != 1:
+            raise CommandError(f'Query count grows with the number of lines: {counts}')
+        self.stdout.write(self.style.SUCCESS(f'Constant query count: {counts[sizes[0]]}'))
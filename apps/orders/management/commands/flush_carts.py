@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.orders.cart_store import flush_dirty_carts
+
+
+class Command(BaseCommand):
+    help = 'Write carts changed in the cache cart store to the database (run every few minutes)'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        flushed = flush_dirty_carts()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Flushed {flushed} carts in {elapsed * 1000:.0f}ms'))
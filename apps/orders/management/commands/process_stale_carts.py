@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.orders.abandoned_carts import (
+    CART_RETENTION_DAYS, CART_SCAN_BATCH_SIZE, CART_SCAN_SLEEP, purge_stale_carts, send_cart_reminders,
+)
+
+
+class Command(BaseCommand):
+    help = 'Remind customers of abandoned carts and delete carts idle past the retention horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=CART_SCAN_BATCH_SIZE)
+        parser.add_argument('--sleep', type=float, default=CART_SCAN_SLEEP, help='Seconds to pause between batches')
+        parser.add_argument('--retention-days', type=int, default=CART_RETENTION_DAYS)
+        parser.add_argument('--skip-reminders', action='store_true')
+        parser.add_argument('--skip-purge', action='store_true')
+
+    def handle(self, *args, **options):
+        batching = {'batch_size': options['batch_size'], 'sleep': options['sleep']}
+        if not options['skip_reminders']:
+            started = time.perf_counter()
+            result = send_cart_reminders(**batching)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"Reminded {result['carts']} abandoned carts in {result['batches']} batches in {elapsed * 1000:.0f}ms"
+            ))
+        if not options['skip_purge']:
+            started = time.perf_counter()
+            result = purge_stale_carts(retention_days=options['retention_days'], **batching)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"Purged {result['carts']} stale carts ({result['items']} items) in {result['batches']} batches "
+                f"in {elapsed * 1000:.0f}ms"
+            ))
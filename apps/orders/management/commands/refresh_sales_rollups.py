@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.orders.reports import refresh_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups of days with new or changed orders (run every few minutes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every day that still has orders')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = refresh_sales_rollups(full=options['full'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {result['days']} days into {result['rows']} rows in {elapsed * 1000:.0f}ms"
+        ))
@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.invoices import INVOICE_RENDER_BATCH_SIZE, INVOICE_RENDER_WORKERS, render_invoices
+from apps.orders.models import Invoice
+
+
+class Command(BaseCommand):
+    help = 'Render queued invoice PDFs in a process pool (run every minute)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Re-render every invoice dated in this month (YYYY-MM)')
+        parser.add_argument('--workers', type=int, default=INVOICE_RENDER_WORKERS)
+        parser.add_argument('--batch-size', type=int, default=INVOICE_RENDER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        invoices = None
+        if options['month']:
+            try:
+                year, month = (int(part) for part in options['month'].split('-'))
+                start = date(year, month, 1)
+            except ValueError:
+                raise CommandError('--month must be YYYY-MM')
+            end = date(year + month // 12, month % 12 + 1, 1)
+            invoices = Invoice.objects.filter(invoice_date__date__gte=start, invoice_date__date__lt=end)
+
+        result = render_invoices(invoices, workers=options['workers'], batch_size=options['batch_size'])
+        seconds = result['seconds']
+        rate = result['pages'] / seconds if seconds else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {result['invoices']} invoices ({result['pages']} pages) in {seconds:.2f}s "
+            f"with {options['workers']} workers: {rate:.0f} pages/sec"
+        ))
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_order_summaries(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    OrderTracking = apps.get_model('orders', 'OrderTracking')
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by('id')
+    tracking = OrderTracking.objects.filter(order=OuterRef('pk')).order_by('-timestamp', '-id')
+    Order.objects.update(
+        item_count=Coalesce(
+            Subquery(items.order_by().values('order').annotate(count=Count('id')).values('count')), 0
+        ),
+        first_item_name=Coalesce(Subquery(items.values('product_name')[:1]), Value('')),
+        latest_tracking_status=Coalesce(Subquery(tracking.values('status')[:1]), Value('')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_number_sequences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='first_item_name',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='latest_tracking_status',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.RunPython(backfill_order_summaries, migrations.RunPython.noop),
+    ]
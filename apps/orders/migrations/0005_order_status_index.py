@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_list_summaries'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'total_amount'], name='order_status_total_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def backfill_search_fields(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    last_id = 0
+    while True:
+        orders = list(
+            Order.objects.filter(pk__gt=last_id).order_by('pk')
+            .select_related('customer').only('shipping_phone', 'customer__email', 'customer__phone_number')
+            [:BATCH_SIZE]
+        )
+        if not orders:
+            break
+        for order in orders:
+            order.search_email = (order.customer.email or '').strip().lower()
+            phone = order.shipping_phone or order.customer.phone_number or ''
+            order.search_phone = ''.join(char for char in phone if char.isdigit())
+        Order.objects.bulk_update(orders, ['search_email', 'search_phone'])
+        last_id = orders[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_archived_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='search_email',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='search_phone',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_search_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_archived_order_day_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['status', 'total_amount'], name='archived_status_total_idx'),
+        ),
+    ]
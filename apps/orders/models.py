@@ -1,26 +1,54 @@
 from django.db import models
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from decimal import Decimal
-import uuid
 
 User = get_user_model()
 
 
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate item and amount totals, computed in SQL from current product prices."""
+        amount = DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            items_quantity=Coalesce(Sum('items__quantity'), 0),
+            items_amount=Coalesce(
+                Sum(F('items__quantity') * F('items__product__price'), output_field=amount),
+                Value(Decimal('0')), output_field=amount,
+            ),
+        )
+
+
 class Cart(models.Model):
     customer = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Scanned by abandoned_carts.py for reminders and the stale-cart purge.
+            models.Index(fields=['updated_at'], name='cart_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Cart for {self.customer.username}"
 
     @property
     def total_items(self):
+        if hasattr(self, 'items_quantity'):
+            return self.items_quantity
         return sum(item.quantity for item in self.items.all())
 
     @property
     def total_amount(self):
+        if hasattr(self, 'items_amount'):
+            return self.items_amount
         return sum(item.subtotal for item in self.items.all())
 
 
@@ -106,8 +134,23 @@ class Order(models.Model):
     customer_notes = models.TextField(blank=True)
     admin_notes = models.TextField(blank=True)
 
+    # List summaries, kept in sync by services.py and signals.py
+    item_count = models.PositiveIntegerField(default=0)
+    first_item_name = models.CharField(max_length=200, blank=True)
+    latest_tracking_status = models.CharField(max_length=20, blank=True)
+
+    # Normalized lookup keys for staff search, see search.py
+    search_email = models.CharField(max_length=254, blank=True, db_index=True, editable=False)
+    search_phone = models.CharField(max_length=20, blank=True, db_index=True, editable=False)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Covers the dashboard's per-status counts and delivered revenue.
+            models.Index(fields=['status', 'total_amount'], name='order_status_total_idx'),
+            models.Index(fields=['created_at'], name='order_created_idx'),
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number}"
@@ -115,12 +158,14 @@ class Order(models.Model):
     def save(self, *args, **kwargs):
         if not self.order_number:
             self.order_number = self.generate_order_number()
+        if kwargs.get('update_fields') is None:
+            from .search import fill_search_fields
+            fill_search_fields(self)
         super().save(*args, **kwargs)
 
     def generate_order_number(self):
-        import datetime
-        now = datetime.datetime.now()
-        return f"ORG{now.strftime('%Y%m%d')}{str(uuid.uuid4())[:8].upper()}"
+        from .numbering import next_number
+        return next_number('order', 'ORG', 8)
 
     @property
     def can_be_cancelled(self):
@@ -179,9 +224,8 @@ class Invoice(models.Model):
         super().save(*args, **kwargs)
 
     def generate_invoice_number(self):
-        import datetime
-        now = datetime.datetime.now()
-        return f"INV{now.strftime('%Y%m%d')}{str(uuid.uuid4())[:6].upper()}"
+        from .numbering import next_number
+        return next_number('invoice', 'INV', 6)
 
 
 class PreOrder(models.Model):
@@ -208,4 +252,97 @@ class RestockNotification(models.Model):
         unique_together = ('customer', 'product')
 
     def __str__(self):
-        return f"Restock notification: {self.customer.username} - {self.product.name}"
\ No newline at end of file
+        return f"Restock notification: {self.customer.username} - {self.product.name}"
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a mutating request sent with an ``Idempotency-Key`` header.
+
+    ``status_code`` is null while the first request is still running.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.BinaryField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"Idempotency key {self.key} for {self.user_id}"
+
+
+class NumberSequence(models.Model):
+    """Next unallocated value of a per-day number series (see ``numbering.py``)."""
+    name = models.CharField(max_length=50)
+    day = models.DateField()
+    next_value = models.PositiveBigIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('name', 'day')
+
+    def __str__(self):
+        return f"{self.name} {self.day}: {self.next_value}"
+
+
+class DailySalesRollup(models.Model):
+    """Sales of one day and order status (see ``reports.py``).
+
+    Rows without category and product hold the order-level totals, rows with
+    only a category the per-category totals and rows with a product the
+    per-product totals.
+    """
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    category = models.ForeignKey('products.Category', on_delete=models.CASCADE, null=True, blank=True)
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, null=True, blank=True)
+    order_count = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['day', 'status'], name='rollup_day_idx'),
+            models.Index(fields=['category', 'day'], name='rollup_category_day_idx'),
+            models.Index(fields=['product', 'day'], name='rollup_product_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"Sales {self.day} {self.status}"
+
+
+class ArchivedOrder(models.Model):
+    """A completed order moved out of the hot tables (see ``archive.py``).
+
+    Keeps the original id and the order list columns so history queries can
+    union it with ``Order``; ``payload`` holds the full order with its items,
+    tracking, invoice and the notification rows that referenced it.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    order_number = models.CharField(max_length=20, unique=True)
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    status = models.CharField(max_length=20)
+    payment_status = models.CharField(max_length=20)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    item_count = models.PositiveIntegerField(default=0)
+    first_item_name = models.CharField(max_length=200, blank=True)
+    latest_tracking_status = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', 'created_at'], name='archived_customer_idx'),
+            models.Index(fields=['created_at'], name='archived_created_idx'),
+            # Covers the dashboard's archived revenue sum.
+            models.Index(fields=['status', 'total_amount'], name='archived_status_total_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.order_number}"
+
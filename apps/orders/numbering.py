@@ -0,0 +1,141 @@
+"""
+Per-day human-readable numbers (orders, invoices, tickets) from hi/lo blocks.
+
+``NumberSequence`` holds the next unallocated value of each series per day.
+A worker reserves ``NUMBER_BLOCK_SIZE`` values with one committed UPDATE and
+then hands them out from memory, so most numbers cost no query at all and
+two workers can never receive the same value. Values increase within a
+worker; across workers they interleave by block, and values left in a block
+when a worker exits are skipped.
+
+A reservation must commit on its own: if it were rolled back with the
+caller's transaction, the next worker would be given the same block. Outside
+a transaction the request connection is used; inside one a dedicated
+connection is opened. SQLite cannot write from a second connection while the
+request's transaction holds its lock, so there a single value is allocated
+in the caller's transaction and nothing is cached.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+NUMBER_BLOCK_SIZE = getattr(settings, 'NUMBER_BLOCK_SIZE', 50)
+
+
+def _advance(db, name, day, size):
+    """Move the series forward by ``size`` and return the first value reserved."""
+    from .models import NumberSequence
+
+    meta = NumberSequence._meta
+    quote = db.ops.quote_name
+    table = quote(meta.db_table)
+    name_column, day_column, value_column = (
+        quote(meta.get_field(field).column) for field in ('name', 'day', 'next_value')
+    )
+    day = db.ops.adapt_datefield_value(day)
+    with db.cursor() as cursor:
+        cursor.execute(
+            f"{db.ops.insert_statement(on_conflict=OnConflict.IGNORE)} {table} "
+            f"({name_column}, {day_column}, {value_column}) VALUES (%s, %s, 1) "
+            f"{db.ops.on_conflict_suffix_sql([], OnConflict.IGNORE, [], [])}",
+            [name, day],
+        )
+        cursor.execute(
+            f"UPDATE {table} SET {value_column} = {value_column} + %s "
+            f"WHERE {name_column} = %s AND {day_column} = %s",
+            [size, name, day],
+        )
+        cursor.execute(
+            f"SELECT {value_column} FROM {table} WHERE {name_column} = %s AND {day_column} = %s",
+            [name, day],
+        )
+        return cursor.fetchone()[0] - size
+
+
+class NumberAllocator:
+    def __init__(self, name, block_size=NUMBER_BLOCK_SIZE):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._day = None
+        self._next = 0
+        self._limit = 0
+        self._connection = None
+
+    def allocate(self):
+        """``(day, value)`` of the next number of the series."""
+        day = timezone.localdate()
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker inherits the parent's block and connection;
+                # both belong to the parent. Drop (don't close) them.
+                self._pid = os.getpid()
+                self._connection = None
+                self._limit = 0
+            if self._day != day or self._next >= self._limit:
+                self._reserve(day)
+            value = self._next
+            self._next += 1
+            return self._day, value
+
+    def _reserve(self, day):
+        size = self.block_size
+        if not connection.in_atomic_block:
+            with transaction.atomic():
+                start = _advance(connection, self.name, day, size)
+        elif connection.vendor == 'sqlite':
+            size = 1
+            start = _advance(connection, self.name, day, size)
+        else:
+            start = self._reserve_independently(day, size)
+        self._day = day
+        self._next = start
+        self._limit = start + size
+
+    def _reserve_independently(self, day, size):
+        db = self._connection
+        if db is None:
+            db = self._connection = connections.create_connection(DEFAULT_DB_ALIAS)
+            # Guarded by ``_lock``, so any thread may use it.
+            db.inc_thread_sharing()
+        else:
+            # Drops the connection after errors or past CONN_MAX_AGE; the
+            # next query reconnects.
+            db.close_if_unusable_or_obsolete()
+        try:
+            db.set_autocommit(False)
+            start = _advance(db, self.name, day, size)
+            db.commit()
+            db.set_autocommit(True)
+        except Exception:
+            # The server rolls back what was left open; start afresh next time.
+            self._connection = None
+            try:
+                db.close()
+            except DatabaseError:
+                pass
+            raise
+        return start
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_allocator(name):
+    allocator = _allocators.get(name)
+    if allocator is None:
+        with _allocators_lock:
+            allocator = _allocators.setdefault(name, NumberAllocator(name))
+    return allocator
+
+
+def next_number(name, prefix, width):
+    """``<prefix><YYYYMMDD><value zero-padded to width>``, e.g. ``ORG2024060100000042``."""
+    day, value = get_allocator(name).allocate()
+    return f"{prefix}{day:%Y%m%d}{value:0{width}d}"
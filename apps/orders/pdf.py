@@ -0,0 +1,159 @@
+"""
+Minimal pure-Python PDF writer for invoices.
+
+Only what an invoice needs: A4 pages of Helvetica text and rules, with
+compressed content streams. The module does not import Django so that
+process-pool workers can render without setting it up; ``render_invoice``
+takes a plain dict (see ``invoices.invoice_data``) and returns the PDF bytes
+and the page count.
+"""
+import zlib
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+LINE_HEIGHT = 16
+ITEM_COLUMNS = ((MARGIN, 'Item'), (300, 'SKU'), (390, 'Qty'), (430, 'Unit price'), (505, 'Total'))
+ITEMS_FIRST_PAGE = 28
+ITEMS_PER_PAGE = 40
+HEADER_BOTTOM = PAGE_HEIGHT - MARGIN - 80
+
+
+def _escape(text):
+    text = str(text).encode('latin-1', 'replace').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+class Canvas:
+    """Drawing operations of one page, as PDF content stream commands."""
+
+    def __init__(self):
+        self.commands = []
+
+    def text(self, x, y, value, size=10, bold=False):
+        font = 'F2' if bold else 'F1'
+        self.commands.append(f'BT /{font} {size} Tf {x} {y} Td ({_escape(value)}) Tj ET')
+
+    def text_right(self, x, y, value, size=10, bold=False):
+        # Helvetica digits are 0.556 em wide; good enough to right-align amounts.
+        self.text(round(x - len(str(value)) * size * 0.556, 1), y, value, size, bold)
+
+    def rule(self, x1, y, x2, width=0.5):
+        self.commands.append(f'{width} w {x1} {y} m {x2} {y} l S')
+
+    def stream(self):
+        return zlib.compress('\n'.join(self.commands).encode('latin-1'))
+
+
+def write_pdf(pages):
+    """Serialize ``Canvas`` pages into a PDF document."""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # page tree, filled in once the page object numbers are known
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+    page_refs = []
+    for page in pages:
+        content = page.stream()
+        objects.append(
+            b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content) + content + b'\nendstream'
+        )
+        objects.append((
+            '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            '/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+            % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+        ).encode())
+        page_refs.append(f'{len(objects)} 0 R')
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _header(page, data, number, count):
+    top = PAGE_HEIGHT - MARGIN
+    page.text(MARGIN, top - 10, data['seller'], size=16, bold=True)
+    page.text_right(PAGE_WIDTH - MARGIN, top - 10, 'INVOICE', size=16, bold=True)
+    page.text_right(PAGE_WIDTH - MARGIN, top - 30, f"No. {data['invoice_number']}")
+    page.text_right(PAGE_WIDTH - MARGIN, top - 44, f"Date {data['invoice_date']}")
+    page.text_right(PAGE_WIDTH - MARGIN, top - 58, f"Order {data['order_number']}")
+    page.text_right(PAGE_WIDTH - MARGIN, MARGIN - 20, f'Page {number} of {count}', size=8)
+    return HEADER_BOTTOM
+
+
+def _bill_to(page, data, y):
+    page.text(MARGIN, y, 'Bill to', bold=True)
+    for line in data['bill_to']:
+        y -= LINE_HEIGHT - 2
+        page.text(MARGIN, y, line)
+    return y - 2 * LINE_HEIGHT
+
+
+def _bill_to_height(data):
+    return len(data['bill_to']) * (LINE_HEIGHT - 2) + 2 * LINE_HEIGHT
+
+
+def _item_rows(page, items, y):
+    if not items:
+        return y
+    for x, title in ITEM_COLUMNS:
+        if title in ('Item', 'SKU'):
+            page.text(x, y, title, bold=True)
+        else:
+            page.text_right(x + 40, y, title, bold=True)
+    page.rule(MARGIN, y - 6, PAGE_WIDTH - MARGIN)
+    for item in items:
+        y -= LINE_HEIGHT
+        page.text(ITEM_COLUMNS[0][0], y, item['name'][:45])
+        page.text(ITEM_COLUMNS[1][0], y, item['sku'][:14])
+        page.text_right(ITEM_COLUMNS[2][0] + 40, y, item['quantity'])
+        page.text_right(ITEM_COLUMNS[3][0] + 40, y, item['unit_price'])
+        page.text_right(ITEM_COLUMNS[4][0] + 40, y, item['total_price'])
+    return y - LINE_HEIGHT
+
+
+def _totals(page, data, y):
+    page.rule(380, y + 6, PAGE_WIDTH - MARGIN)
+    for label, value in data['totals']:
+        y -= LINE_HEIGHT
+        bold = label == 'Total'
+        page.text(380, y, label, bold=bold)
+        page.text_right(PAGE_WIDTH - MARGIN + 5, y, value, bold=bold)
+
+
+def _chunks(data):
+    """Items per page; a last page without room for the totals gets a totals-only page after it."""
+    items = data['items']
+    chunks = [items[:ITEMS_FIRST_PAGE]]
+    for start in range(ITEMS_FIRST_PAGE, len(items), ITEMS_PER_PAGE):
+        chunks.append(items[start:start + ITEMS_PER_PAGE])
+    top = HEADER_BOTTOM - (_bill_to_height(data) if len(chunks) == 1 else 0)
+    items_bottom = top - (len(chunks[-1]) + 1) * LINE_HEIGHT if chunks[-1] else top
+    if items_bottom - len(data['totals']) * LINE_HEIGHT < MARGIN:
+        chunks.append([])
+    return chunks
+
+
+def render_invoice(data):
+    """``(pdf_bytes, page_count)`` for the invoice described by ``data``."""
+    chunks = _chunks(data)
+    pages = []
+    for number, chunk in enumerate(chunks, start=1):
+        page = Canvas()
+        y = _header(page, data, number, len(chunks))
+        if number == 1:
+            y = _bill_to(page, data, y)
+        y = _item_rows(page, chunk, y)
+        if number == len(chunks):
+            _totals(page, data, y)
+        pages.append(page)
+    return write_pdf(pages), len(pages)
@@ -0,0 +1,237 @@
+"""
+Daily sales rollups and the reports served from them.
+
+``refresh_sales_rollups`` finds the days of orders created or changed since
+its last run (an ``updated_at`` watermark, so unchanged orders are never
+read) and recomputes only those days into ``DailySalesRollup``: order-level,
+per-category and per-product totals for each order status. Reports group
+the rollup rows by day, week or month in the database and never touch
+``Order`` or ``OrderItem``. Orders moved to ``ArchivedOrder`` keep counting:
+a day is always recomputed from its hot orders and the archived payloads.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from apps.products.models import JobWatermark, Product
+
+from .models import ArchivedOrder, DailySalesRollup, Order, OrderItem
+
+WATERMARK_NAME = 'reports.sales_rollups'
+# A transaction committing just after a run started can carry an older
+# updated_at; days are recomputed whole, so re-reading a window is harmless.
+ROLLUP_OVERLAP = timedelta(seconds=getattr(settings, 'SALES_ROLLUP_OVERLAP_SECONDS', 300))
+ROLLUP_DAYS_PER_BATCH = 31
+REPORT_MAX_DAYS = getattr(settings, 'SALES_REPORT_MAX_DAYS', 3 * 366)
+EXCLUDED_ORDER_STATUSES = ('cancelled', 'refunded')
+
+GRANULARITIES = {'day': None, 'week': TruncWeek, 'month': TruncMonth}
+GROUPINGS = {
+    None: ((), Q(category__isnull=True, product__isnull=True)),
+    'status': (('status',), Q(category__isnull=True, product__isnull=True)),
+    'category': (('category_id', 'category__name'), Q(category__isnull=False, product__isnull=True)),
+    'product': (('product_id', 'product__name'), Q(product__isnull=False)),
+}
+
+DB_BATCH_SIZE = 500
+CENT = Decimal('0.01')
+
+
+def _days_filter(days, prefix=''):
+    """``created_at`` ranges of ``days`` (index friendly, unlike ``__date__in``)."""
+    condition = Q()
+    for day in days:
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        condition |= Q(**{
+            f'{prefix}created_at__gte': start,
+            f'{prefix}created_at__lt': start + timedelta(days=1),
+        })
+    return condition
+
+
+def _archived_totals(days, order_totals, category_totals, product_totals):
+    """Add the orders of ``days`` that were moved to ``ArchivedOrder`` to the totals."""
+    archived = list(
+        ArchivedOrder.objects.filter(_days_filter(days)).values_list('created_at', 'status', 'total_amount', 'payload')
+    )
+    product_ids = {item['product_id'] for *_, payload in archived for item in payload['items']}
+    categories = dict(Product.objects.filter(pk__in=product_ids).values_list('id', 'category_id'))
+    for created_at, status, total_amount, payload in archived:
+        day = timezone.localdate(created_at)
+        order = order_totals[(day, status)]
+        order['orders'] += 1
+        order['revenue'] += total_amount
+        lines = defaultdict(lambda: {'units': 0, 'revenue': Decimal('0')})
+        for item in payload['items']:
+            # Lines of deleted products went with them, as they do for hot orders.
+            if item['product_id'] in categories:
+                line = lines[item['product_id']]
+                line['units'] += item['quantity']
+                line['revenue'] += Decimal(item['total_price'])
+        for category_id in {categories[product_id] for product_id in lines}:
+            category_totals[(day, status, category_id)]['orders'] += 1
+        for product_id, line in lines.items():
+            for totals in (
+                category_totals[(day, status, categories[product_id])],
+                product_totals[(day, status, categories[product_id], product_id)],
+            ):
+                totals['units'] += line['units']
+                totals['revenue'] += line['revenue']
+            product_totals[(day, status, categories[product_id], product_id)]['orders'] += 1
+
+
+def _day_rows(days):
+    """Rollup rows of ``days`` from hot and archived orders alike."""
+    def totals():
+        return defaultdict(lambda: {'orders': 0, 'units': 0, 'revenue': Decimal('0')})
+
+    order_totals, category_totals, product_totals = totals(), totals(), totals()
+    orders = (
+        Order.objects.filter(_days_filter(days))
+        .annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values('day', 'status')
+        .annotate(orders=Count('id'), revenue=Sum('total_amount'))
+    )
+    for row in orders:
+        order_totals[(row['day'], row['status'])].update(orders=row['orders'], revenue=row['revenue'])
+    lines = (
+        OrderItem.objects.filter(_days_filter(days, 'order__'))
+        .annotate(day=TruncDate('order__created_at'), status=F('order__status'))
+        .order_by()
+    )
+    grouped = (
+        (category_totals, ('day', 'status', 'product__category_id')),
+        (product_totals, ('day', 'status', 'product__category_id', 'product_id')),
+    )
+    for target, keys in grouped:
+        for row in lines.values(*keys).annotate(
+            orders=Count('order_id', distinct=True), units=Sum('quantity'), revenue=Sum('total_price'),
+        ):
+            target[tuple(row[key] for key in keys)].update(
+                orders=row['orders'], units=row['units'], revenue=row['revenue'],
+            )
+    _archived_totals(days, order_totals, category_totals, product_totals)
+
+    rows = []
+    units = defaultdict(int)
+    for (day, status, category_id), row in category_totals.items():
+        units[(day, status)] += row['units']
+        rows.append(DailySalesRollup(
+            day=day, status=status, category_id=category_id,
+            order_count=row['orders'], units=row['units'], revenue=row['revenue'],
+        ))
+    for (day, status, category_id, product_id), row in product_totals.items():
+        rows.append(DailySalesRollup(
+            day=day, status=status, category_id=category_id, product_id=product_id,
+            order_count=row['orders'], units=row['units'], revenue=row['revenue'],
+        ))
+    for (day, status), row in order_totals.items():
+        rows.append(DailySalesRollup(
+            day=day, status=status, order_count=row['orders'],
+            units=units[(day, status)], revenue=row['revenue'],
+        ))
+    return rows
+
+
+def _lock_watermark():
+    return JobWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)[0]
+
+
+def rollup_days(days):
+    """Recompute the rollups of ``days`` from the orders created on them.
+
+    Each batch of days commits on its own.
+    """
+    days = sorted(set(days))
+    rows = 0
+    for start in range(0, len(days), ROLLUP_DAYS_PER_BATCH):
+        batch = days[start:start + ROLLUP_DAYS_PER_BATCH]
+        with transaction.atomic():
+            # Held for one batch only; keeps concurrent runs from rewriting a day at once.
+            _lock_watermark()
+            DailySalesRollup.objects.filter(day__in=batch).delete()
+            rows += len(DailySalesRollup.objects.bulk_create(_day_rows(batch), batch_size=DB_BATCH_SIZE))
+    return rows
+
+
+def refresh_sales_rollups(full=False, now=None):
+    """Recompute the days of orders created or changed since the last run.
+
+    ``full=True`` recomputes every day that still has hot orders; days whose
+    orders were all archived are not revisited. Archived orders are counted
+    either way. The watermark moves only once every day is written, so a
+    failed run is repeated by the next one.
+    Returns the number of days and rows written.
+    """
+    now = now or timezone.now()
+    since = JobWatermark.objects.filter(name=WATERMARK_NAME).values_list('last_timestamp', flat=True).first()
+    orders = Order.objects.all()
+    if not full and since:
+        orders = orders.filter(updated_at__gt=since - ROLLUP_OVERLAP)
+    days = list(orders.dates('created_at', 'day'))
+    rows = rollup_days(days)
+    with transaction.atomic():
+        watermark = _lock_watermark()
+        # A run that started later may have finished first.
+        if watermark.last_timestamp is None or watermark.last_timestamp < now:
+            watermark.last_timestamp = now
+            watermark.save()
+    return {'days': len(days), 'rows': rows}
+
+
+def _summarize(row):
+    revenue = row['revenue'] or Decimal('0')
+    orders = row['order_count'] or 0
+    return {
+        'order_count': orders,
+        'units': row['units'] or 0,
+        'revenue': str(revenue.quantize(CENT)),
+        'average_order_value': str((revenue / orders).quantize(CENT)) if orders else None,
+    }
+
+
+def sales_report(start, end, granularity='day', group_by=None, statuses=None):
+    """Totals per ``granularity`` period between ``start`` and ``end`` (inclusive).
+
+    ``group_by`` splits each period by ``status``, ``category`` or
+    ``product``. Cancelled and refunded orders are left out unless
+    ``statuses`` names them.
+    """
+    keys, dimension = GROUPINGS[group_by]
+    rollups = DailySalesRollup.objects.filter(day__gte=start, day__lte=end)
+    if statuses:
+        rollups = rollups.filter(status__in=statuses)
+    else:
+        rollups = rollups.exclude(status__in=EXCLUDED_ORDER_STATUSES)
+
+    trunc = GRANULARITIES[granularity]
+    periods = rollups.filter(dimension).annotate(period=trunc('day') if trunc else F('day'))
+    rows = periods.order_by().values('period', *keys).annotate(
+        order_count=Sum('order_count'), units=Sum('units'), revenue=Sum('revenue'),
+    ).order_by('period', *keys)
+
+    results = []
+    for row in rows:
+        result = {'period': row['period'].isoformat()}
+        result.update({key.replace('__', '_'): row[key] for key in keys})
+        result.update(_summarize(row))
+        results.append(result)
+
+    totals = rollups.filter(GROUPINGS[None][1]).aggregate(
+        order_count=Sum('order_count'), units=Sum('units'), revenue=Sum('revenue'),
+    )
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'group_by': group_by,
+        'results': results,
+        'totals': _summarize(totals),
+    }
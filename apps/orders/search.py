@@ -0,0 +1,84 @@
+"""
+Staff order lookup by order number, customer email and phone.
+
+Matching ``icontains`` across ``Order`` and ``User`` scans both tables on
+every search. Instead each order carries normalized, indexed copies of its
+customer's email (lower case) and of its phone number (digits only, the
+shipping phone or else the customer's), filled in on save and kept in step
+with email changes by a signal. A query is classified by its shape and
+matched exactly or by prefix against those columns and the unique
+``order_number``. Prefixes are matched as a ``>= prefix`` / ``< prefix +
+U+FFFF`` range rather than ``LIKE``, which every backend answers from a
+plain B-tree index; the columns only hold normalized ASCII, so the range
+and the prefix select the same rows.
+"""
+import re
+
+from django.conf import settings
+from django.db.models import Q
+
+ORDER_NUMBER_PREFIX = 'ORG'
+ORDER_SEARCH_LIMIT = getattr(settings, 'ORDER_SEARCH_LIMIT', 50)
+# Shorter prefixes would match a large share of the table.
+ORDER_SEARCH_MIN_PREFIX = getattr(settings, 'ORDER_SEARCH_MIN_PREFIX', 3)
+PHONE_QUERY_PATTERN = re.compile(r'^\+?[\d\s().-]+$')
+PREFIX_END = '\uffff'
+
+
+def normalize_email(value):
+    return (value or '').strip().lower()
+
+
+def normalize_phone(value):
+    return ''.join(char for char in value or '' if char.isdigit())
+
+
+def fill_search_fields(order):
+    customer = order.customer
+    order.search_email = normalize_email(customer.email)
+    order.search_phone = normalize_phone(order.shipping_phone or customer.phone_number)
+
+
+def _match(field, value, exact):
+    if exact or len(value) < ORDER_SEARCH_MIN_PREFIX:
+        return Q(**{field: value})
+    return Q(**{f'{field}__gte': value, f'{field}__lt': value + PREFIX_END})
+
+
+def classify(query):
+    """Name of the kind of ``query``: ``email``, ``phone``, ``order_number`` or ``text``."""
+    if '@' in query:
+        return 'email'
+    if query.upper().startswith(ORDER_NUMBER_PREFIX):
+        return 'order_number'
+    if PHONE_QUERY_PATTERN.match(query):
+        return 'phone'
+    return 'text'
+
+
+def order_search_filter(query, exact=False):
+    """``Q`` matching the orders found by ``query``, or ``None`` for a blank query.
+
+    A run of digits is also tried as the date and sequence part of an order
+    number; other text as an email prefix or an order number.
+    """
+    query = query.strip()
+    if not query:
+        return None
+    kind = classify(query)
+    if kind == 'email':
+        return _match('search_email', normalize_email(query), exact)
+    if kind == 'order_number':
+        return _match('order_number', query.upper(), exact)
+    if kind == 'phone':
+        digits = normalize_phone(query)
+        return _match('search_phone', digits, exact) | _match('order_number', ORDER_NUMBER_PREFIX + digits, exact)
+    return _match('search_email', normalize_email(query), exact) | _match('order_number', query.upper(), exact)
+
+
+def search_orders(queryset, query, exact=False, limit=ORDER_SEARCH_LIMIT):
+    condition = order_search_filter(query, exact)
+    if condition is None:
+        return queryset.none()
+    orders = queryset.filter(condition)
+    return orders[:limit] if limit else orders
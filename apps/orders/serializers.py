@@ -1,10 +1,15 @@
 from rest_framework import serializers
 from .models import Cart, CartItem, Order, OrderItem, OrderTracking, Invoice, PreOrder, RestockNotification
+from apps.common.serializers import DynamicFieldsMixin
 from apps.products.serializers import ProductListSerializer
+from .cart_store import CART_BATCH_MAX_OPERATIONS, CART_OPERATIONS
+from .exports import EXPORT_FORMATS
+from .reports import GRANULARITIES, REPORT_MAX_DAYS
+from .services import OrderError, create_order
+from .transitions import TRANSITIONS
 
 
-class CartItemSerializer(serializers.ModelSerializer):
-    product = ProductListSerializer(read_only=True)
+class CartItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product_id = serializers.IntegerField(write_only=True)
     subtotal = serializers.ReadOnlyField()
 
@@ -12,9 +17,12 @@ class CartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = '__all__'
         read_only_fields = ('cart',)
+        expandable_fields = {'product': (ProductListSerializer, {})}
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Read from the attribute, so carts of the cache store serialize as well.
+    customer = serializers.IntegerField(source='customer_id', read_only=True)
     items = CartItemSerializer(many=True, read_only=True)
     total_items = serializers.ReadOnlyField()
     total_amount = serializers.ReadOnlyField()
@@ -25,13 +33,30 @@ class CartSerializer(serializers.ModelSerializer):
         read_only_fields = ('customer',)
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=CART_OPERATIONS)
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != 'remove' and 'quantity' not in attrs:
+            raise serializers.ValidationError({'quantity': 'This field is required.'})
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = serializers.ListField(
+        child=CartOperationSerializer(), allow_empty=False, max_length=CART_BATCH_MAX_OPERATIONS
+    )
+
+
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = '__all__'
 
 
-class OrderTrackingSerializer(serializers.ModelSerializer):
+class OrderTrackingSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     updated_by_name = serializers.CharField(source='updated_by.username', read_only=True)
 
     class Meta:
@@ -39,19 +64,67 @@ class OrderTrackingSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class OrderSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True, read_only=True)
-    tracking = OrderTrackingSerializer(many=True, read_only=True)
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     customer_name = serializers.CharField(source='customer.username', read_only=True)
 
     class Meta:
         model = Order
-        fields = '__all__'
-        read_only_fields = ('customer', 'order_number', 'created_at', 'updated_at')
+        # The normalized search columns are internal (see ``search.py``).
+        exclude = ('search_email', 'search_phone')
+        # Status changes go through ``transitions.transition_orders``.
+        read_only_fields = ('customer', 'order_number', 'status', 'payment_status', 'created_at', 'updated_at',
+                           'item_count', 'first_item_name', 'latest_tracking_status')
+        expandable_fields = {
+            'items': (OrderItemSerializer, {'many': True}),
+            'tracking': (OrderTrackingSerializer, {'many': True}),
+        }
+
+
+class CheckoutSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Order
+        fields = ('shipping_name', 'shipping_address', 'shipping_city', 'shipping_state',
+                 'shipping_postal_code', 'shipping_country', 'shipping_phone',
+                 'billing_name', 'billing_address', 'billing_city', 'billing_state',
+                 'billing_postal_code', 'billing_country', 'customer_notes', 'coupon_code')
+
+
+class OrderLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
 
 
-class OrderCreateSerializer(serializers.ModelSerializer):
-    items = serializers.ListField(write_only=True)
+class OrderSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Flat representation for order lists; details come from ``OrderSerializer``."""
+    customer_name = serializers.CharField(source='customer.username', read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ('id', 'order_number', 'customer', 'customer_name', 'status', 'payment_status',
+                 'total_amount', 'item_count', 'first_item_name', 'latest_tracking_status',
+                 'created_at', 'updated_at')
+        read_only_fields = fields
+
+
+class OrderHistorySerializer(serializers.Serializer):
+    """Row of the hot/archived order union served by ``OrderListView``."""
+    id = serializers.IntegerField()
+    order_number = serializers.CharField()
+    customer = serializers.IntegerField()
+    customer_name = serializers.CharField()
+    status = serializers.CharField()
+    payment_status = serializers.CharField()
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+    item_count = serializers.IntegerField()
+    first_item_name = serializers.CharField()
+    latest_tracking_status = serializers.CharField()
+    created_at = serializers.DateTimeField()
+    updated_at = serializers.DateTimeField()
+    is_archived = serializers.BooleanField()
+
+
+class OrderCreateSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    items = OrderLineSerializer(many=True, write_only=True, allow_empty=False)
 
     class Meta:
         model = Order
@@ -63,43 +136,20 @@ class OrderCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(customer=self.context['request'].user, **validated_data)
-        
-        # Create order items and calculate totals
-        subtotal = 0
-        for item_data in items_data:
-            product_id = item_data['product_id']
-            quantity = item_data['quantity']
-            
-            from apps.products.models import Product
-            product = Product.objects.get(id=product_id)
-            
-            order_item = OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                unit_price=product.price
-            )
-            subtotal += order_item.total_price
-        
-        # Calculate totals (simplified)
-        order.subtotal = subtotal
-        order.total_amount = subtotal  # Add shipping, tax calculation here
-        order.save()
-        
-        return order
-
-
-class InvoiceSerializer(serializers.ModelSerializer):
-    order = OrderSerializer(read_only=True)
+        try:
+            return create_order(self.context['request'].user, items_data, **validated_data)
+        except OrderError as exc:
+            raise serializers.ValidationError({'items': [str(exc)]})
 
+
+class InvoiceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Invoice
         fields = '__all__'
+        expandable_fields = {'order': (OrderSerializer, {})}
 
 
-class PreOrderSerializer(serializers.ModelSerializer):
-    product = ProductListSerializer(read_only=True)
+class PreOrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product_id = serializers.IntegerField(write_only=True)
     customer_name = serializers.CharField(source='customer.username', read_only=True)
 
@@ -107,14 +157,71 @@ class PreOrderSerializer(serializers.ModelSerializer):
         model = PreOrder
         fields = '__all__'
         read_only_fields = ('customer',)
+        expandable_fields = {'product': (ProductListSerializer, {})}
 
 
-class RestockNotificationSerializer(serializers.ModelSerializer):
-    product = ProductListSerializer(read_only=True)
+class RestockNotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product_id = serializers.IntegerField(write_only=True)
     customer_name = serializers.CharField(source='customer.username', read_only=True)
 
     class Meta:
         model = RestockNotification
         fields = '__all__'
-        read_only_fields = ('customer',)
\ No newline at end of file
+        read_only_fields = ('customer',)
+        expandable_fields = {'product': (ProductListSerializer, {})}
+
+
+def parse_statuses(value):
+    """Comma-separated order statuses as a list, rejecting unknown ones."""
+    statuses = [status for status in value.split(',') if status]
+    valid = dict(Order.STATUS_CHOICES)
+    unknown = [status for status in statuses if status not in valid]
+    if unknown:
+        raise serializers.ValidationError(f"Unknown status: {', '.join(unknown)}")
+    return statuses
+
+
+class SalesReportSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    granularity = serializers.ChoiceField(choices=list(GRANULARITIES), default='day')
+    group_by = serializers.ChoiceField(choices=['status', 'category', 'product'], required=False)
+    status = serializers.CharField(required=False, help_text='Comma-separated order statuses')
+
+    def validate_status(self, value):
+        return parse_statuses(value)
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('start must not be after end.')
+        if (attrs['end'] - attrs['start']).days >= REPORT_MAX_DAYS:
+            raise serializers.ValidationError(f'A report can span at most {REPORT_MAX_DAYS} days.')
+        return attrs
+
+
+class OrderExportSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    status = serializers.CharField(required=False, help_text='Comma-separated order statuses')
+    output = serializers.ChoiceField(choices=list(EXPORT_FORMATS), default='csv')
+
+    def validate_status(self, value):
+        return parse_statuses(value)
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('start must not be after end.')
+        return attrs
+
+
+class OrderSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=254, help_text='Order number, email or phone, or a prefix of one')
+    exact = serializers.BooleanField(default=False)
+
+
+class OrderTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=list(TRANSITIONS))
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    location = serializers.CharField(required=False, allow_blank=True, default='', max_length=200)
+
@@ -0,0 +1,179 @@
+"""
+Order placement.
+
+Every product of an order is loaded with one ``in_bulk`` (stock joined in and
+locked), lines are validated and priced in memory, stock is reserved with one
+UPDATE, and the order plus all its items are written with one INSERT each
+inside a single transaction, so the query count does not grow with the
+number of lines.
+"""
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from apps.products.models import Product, Stock
+
+from .models import ArchivedOrder, Cart, Order, OrderItem, OrderTracking
+
+
+class OrderError(Exception):
+    """A line of the order cannot be fulfilled; the message is user facing."""
+
+
+def merge_lines(lines):
+    """``{product_id: quantity}`` with repeated products summed, in first-seen order."""
+    merged = OrderedDict()
+    for line in lines:
+        product_id = line['product_id']
+        merged[product_id] = merged.get(product_id, 0) + line['quantity']
+    return merged
+
+
+def load_products(product_ids):
+    """Products by id with their stock rows, locked until the transaction ends."""
+    return Product.objects.select_related('stock').select_for_update().in_bulk(list(product_ids))
+
+
+def build_order_items(quantities, products):
+    """Validate ``{product_id: quantity}`` against loaded products and price each line.
+
+    Returns unsaved ``OrderItem`` rows with the name/SKU snapshot and totals
+    already filled in, as ``bulk_create`` skips ``OrderItem.save``.
+    """
+    items = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None or not product.is_active:
+            raise OrderError(f'Product {product_id} is not available')
+        if quantity < 1:
+            raise OrderError(f'Invalid quantity for {product.name}')
+        stock = getattr(product, 'stock', None)
+        if stock is not None and stock.available_quantity < quantity:
+            raise OrderError(f'Only {stock.available_quantity} of {product.name} left in stock')
+        items.append(OrderItem(
+            product=product,
+            product_name=product.name,
+            product_sku=product.sku,
+            quantity=quantity,
+            unit_price=product.price,
+            total_price=product.price * quantity,
+        ))
+    if not items:
+        raise OrderError('An order needs at least one item')
+    return items
+
+
+def adjust_reserved_stock(items, release=False):
+    """Reserve the items' quantities, or release them, with one UPDATE."""
+    stocks = {}
+    quantities = {}
+    for item in items:
+        stock = getattr(item.product, 'stock', None)
+        if stock is not None:
+            stocks[stock.id] = stock
+            quantities[stock.id] = quantities.get(stock.id, 0) + item.quantity
+    for stock_id, stock in stocks.items():
+        if release:
+            stock.reserved_quantity = Greatest(F('reserved_quantity') - quantities[stock_id], 0)
+        else:
+            stock.reserved_quantity = F('reserved_quantity') + quantities[stock_id]
+    if stocks:
+        Stock.objects.bulk_update(stocks.values(), ['reserved_quantity'])
+
+
+def deduct_shipped_stock(items):
+    """Take shipped quantities off both the stock and its reservation, with one UPDATE."""
+    stocks = {}
+    quantities = {}
+    for item in items:
+        stock = getattr(item.product, 'stock', None)
+        if stock is not None:
+            stocks[stock.id] = stock
+            quantities[stock.id] = quantities.get(stock.id, 0) + item.quantity
+    for stock_id, stock in stocks.items():
+        stock.quantity = Greatest(F('quantity') - quantities[stock_id], 0)
+        stock.reserved_quantity = Greatest(F('reserved_quantity') - quantities[stock_id], 0)
+    if stocks:
+        Stock.objects.bulk_update(stocks.values(), ['quantity', 'reserved_quantity'])
+
+
+def create_order(customer, lines, **order_fields):
+    """Place an order for ``lines`` (``product_id``/``quantity`` dicts).
+
+    Costs one locking product query, one stock UPDATE, one order INSERT and
+    one item INSERT.
+    """
+    quantities = merge_lines(lines)
+    with transaction.atomic():
+        items = build_order_items(quantities, load_products(quantities))
+        return save_order(customer, items, **order_fields)
+
+
+def checkout_cart(customer, **order_fields):
+    """Turn the customer's cart into an order and empty the cart.
+
+    The cart row is locked first, so a repeated submit waits for the first
+    one and then finds the cart empty instead of placing a second order.
+    """
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().filter(customer=customer).first()
+        cart_items = []
+        if cart is not None:
+            cart_items = list(
+                cart.items.select_related('product__stock').select_for_update().order_by('added_at', 'id')
+            )
+        if not cart_items:
+            raise OrderError('Your cart is empty')
+
+        products = {item.product_id: item.product for item in cart_items}
+        quantities = OrderedDict((item.product_id, item.quantity) for item in cart_items)
+        order = save_order(customer, build_order_items(quantities, products), **order_fields)
+        cart.items.all().delete()
+        return order
+
+
+def save_order(customer, items, **order_fields):
+    adjust_reserved_stock(items)
+    subtotal = sum(item.total_price for item in items)
+    order = Order(
+        customer=customer, subtotal=subtotal, total_amount=subtotal,
+        item_count=len(items), first_item_name=items[0].product_name, **order_fields
+    )
+    order.save()
+    for item in items:
+        item.order = order
+    OrderItem.objects.bulk_create(items)
+    return order
+
+
+def refresh_order_summaries(order_ids):
+    """Recompute the denormalized list columns of ``order_ids`` in one UPDATE."""
+    items = OrderItem.objects.filter(order=OuterRef('pk')).order_by('id')
+    tracking = OrderTracking.objects.filter(order=OuterRef('pk')).order_by('-timestamp', '-id')
+    Order.objects.filter(pk__in=order_ids).update(
+        item_count=Coalesce(
+            Subquery(items.order_by().values('order').annotate(count=Count('id')).values('count')), 0
+        ),
+        first_item_name=Coalesce(Subquery(items.values('product_name')[:1]), Value('')),
+        latest_tracking_status=Coalesce(Subquery(tracking.values('status')[:1]), Value('')),
+    )
+
+
+def order_dashboard_stats():
+    """Open order counts per status and delivered revenue, archived orders included."""
+    stats = Order.objects.filter(
+        status__in=('pending', 'confirmed', 'processing', 'shipped', 'delivered')
+    ).aggregate(
+        pending_orders=Count('id', filter=Q(status='pending')),
+        confirmed_orders=Count('id', filter=Q(status='confirmed')),
+        processing_orders=Count('id', filter=Q(status='processing')),
+        shipped_orders=Count('id', filter=Q(status='shipped')),
+        total_revenue=Sum('total_amount', filter=Q(status='delivered'), default=0),
+    )
+    # Delivered orders are archived after a while; their revenue still counts.
+    stats['total_revenue'] += ArchivedOrder.objects.filter(status='delivered').aggregate(
+        revenue=Sum('total_amount', default=0),
+    )['revenue']
+    return stats
@@ -0,0 +1,55 @@
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Order, OrderItem, OrderTracking
+from .search import normalize_email
+from .services import refresh_order_summaries
+
+_state = threading.local()
+
+
+@contextmanager
+def summaries_suspended():
+    """Skip the per-row summary refresh while whole orders are deleted."""
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = False
+
+
+def _suspended():
+    return getattr(_state, 'suspended', False)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_item_summary(sender, instance, **kwargs):
+    if not _suspended():
+        refresh_order_summaries([instance.order_id])
+
+
+@receiver(post_save, sender=OrderTracking)
+def record_tracking_status(sender, instance, created, **kwargs):
+    if created:
+        Order.objects.filter(pk=instance.order_id).update(latest_tracking_status=instance.status)
+    else:
+        refresh_order_summaries([instance.order_id])
+
+
+@receiver(post_delete, sender=OrderTracking)
+def refresh_tracking_summary(sender, instance, **kwargs):
+    if not _suspended():
+        refresh_order_summaries([instance.order_id])
+
+
+@receiver(post_save, sender=get_user_model())
+def refresh_order_search_email(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'email' not in update_fields):
+        return
+    email = normalize_email(instance.email)
+    Order.objects.filter(customer=instance).exclude(search_email=email).update(search_email=email)
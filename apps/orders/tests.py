@@ -0,0 +1,243 @@
+import multiprocessing
+import os
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.products.models import Category, Product, Stock
+
+from .archive import archive_orders
+from .models import ArchivedOrder, Cart, CartItem, Order
+from .numbering import NumberAllocator
+from .reports import refresh_sales_rollups, sales_report
+from .services import OrderError, checkout_cart, create_order
+from .transitions import transition_orders
+
+ORDER_FIELDS = {
+    'shipping_name': 'Test Customer', 'shipping_address': '1 Main St', 'shipping_city': 'Colombo',
+    'shipping_state': 'Western', 'shipping_postal_code': '00100', 'shipping_country': 'LK',
+}
+
+
+def create_products(count):
+    category = Category.objects.create(name='Test category')
+    products = Product.objects.bulk_create([
+        Product(
+            name=f'Test product {i}', description='-', category=category, sku=f'TEST-{i}',
+            price=Decimal('2.00'), cost_price=Decimal('1.00'),
+        )
+        for i in range(count)
+    ])
+    Stock.objects.bulk_create([Stock(product=product, quantity=1000) for product in products])
+    return products
+
+
+class CreateOrderQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = get_user_model().objects.create_user('customer', 'customer@example.com')
+        cls.products = create_products(50)
+
+    def lines(self, count):
+        return [{'product_id': product.id, 'quantity': 2} for product in self.products[:count]]
+
+    def test_query_count_does_not_grow_with_lines(self):
+        with CaptureQueriesContext(connection) as queries:
+            create_order(self.customer, self.lines(1), **ORDER_FIELDS)
+        for count in (1, 50):
+            with self.subTest(lines=count), self.assertNumQueries(len(queries)):
+                order = create_order(self.customer, self.lines(count), **ORDER_FIELDS)
+            self.assertEqual(order.items.count(), count)
+
+
+class SalesRollupArchiveTests(TestCase):
+    def test_archived_orders_stay_in_recomputed_days(self):
+        customer = get_user_model().objects.create_user('customer', 'customer@example.com')
+        products = create_products(2)
+        delivered, open_order = (
+            create_order(customer, [{'product_id': product.id, 'quantity': quantity}], **ORDER_FIELDS)
+            for product, quantity in zip(products, (1, 3))
+        )
+        created_at = timezone.now() - timedelta(days=800)
+        day = timezone.localdate(created_at)
+        Order.objects.filter(pk=delivered.pk).update(status='delivered', created_at=created_at)
+        Order.objects.filter(pk=open_order.pk).update(status='confirmed', created_at=created_at)
+        revenue = delivered.total_amount + open_order.total_amount
+
+        def day_totals():
+            totals = sales_report(day, day, group_by='product')
+            return totals['totals'], {row['product_id']: row['units'] for row in totals['results']}
+
+        refresh_sales_rollups(full=True)
+        expected = day_totals()
+        self.assertEqual(expected[0]['order_count'], 2)
+        self.assertEqual(expected[0]['revenue'], str(revenue))
+
+        archive_orders()
+        self.assertTrue(ArchivedOrder.objects.filter(pk=delivered.pk).exists())
+        transition_orders([open_order.pk], 'processing')
+        refresh_sales_rollups()
+        self.assertEqual(day_totals(), expected)
+        refresh_sales_rollups(full=True)
+        self.assertEqual(day_totals(), expected)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """The same cart submitted from several threads, each on its own connection."""
+    threads = 8
+    rounds = 3
+
+    def setUp(self):
+        self.customer = get_user_model().objects.create_user('customer', 'customer@example.com')
+        self.products = create_products(20)
+        self.cart = Cart.objects.create(customer=self.customer)
+
+    def submit_concurrently(self):
+        barrier = threading.Barrier(self.threads)
+        outcomes = {'placed': 0, 'empty': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def submit():
+            outcome = 'placed'
+            try:
+                barrier.wait()
+                checkout_cart(self.customer, **ORDER_FIELDS)
+            except OrderError:
+                outcome = 'empty'
+            except DatabaseError:
+                # SQLite reports lock contention instead of waiting.
+                outcome = 'errors'
+            finally:
+                connection.close()
+            with lock:
+                outcomes[outcome] += 1
+
+        workers = [threading.Thread(target=submit) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return outcomes
+
+    def test_one_order_per_cart(self):
+        for round_number in range(1, self.rounds + 1):
+            CartItem.objects.bulk_create([
+                CartItem(cart=self.cart, product=product, quantity=1) for product in self.products
+            ])
+            outcomes = self.submit_concurrently()
+            self.assertEqual(outcomes['placed'], 1, outcomes)
+            self.assertEqual(Order.objects.filter(customer=self.customer).count(), round_number)
+        reserved = Stock.objects.filter(product__in=self.products).values_list('reserved_quantity', flat=True)
+        self.assertEqual(set(reserved), {self.rounds})
+
+
+def allocate_from_threads(allocators, threads, count, in_transaction):
+    """Values each thread got, ``threads`` threads per allocator."""
+    sequences = []
+    lock = threading.Lock()
+
+    def allocate(allocator):
+        values = []
+        try:
+            for _ in range(count):
+                if in_transaction:
+                    with transaction.atomic():
+                        values.append(allocator.allocate()[1])
+                else:
+                    values.append(allocator.allocate()[1])
+        finally:
+            connection.close()
+        with lock:
+            sequences.append(values)
+
+    workers = [
+        threading.Thread(target=allocate, args=(allocator,))
+        for allocator in allocators
+        for _ in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sequences
+
+
+def allocate_in_process(allocator, threads, count, in_transaction, queue):
+    # A forked web worker: the allocator comes from the parent, connections are its own.
+    try:
+        queue.put(allocate_from_threads([allocator], threads, count, in_transaction))
+    finally:
+        connections.close_all()
+
+
+class NumberAllocatorTests(TransactionTestCase):
+    """Allocators stand for web workers, each shared by several threads."""
+    allocators = 2
+    processes = 3
+    threads = 4
+    count = 200
+
+    def assert_unique_and_increasing(self, sequences, expected):
+        allocated = [value for values in sequences for value in values]
+        self.assertEqual(len(allocated), expected)
+        self.assertEqual(len(set(allocated)), len(allocated))
+        for values in sequences:
+            self.assertEqual(values, sorted(values))
+
+    def test_unique_across_threads(self):
+        for in_transaction in (False, True):
+            with self.subTest(in_transaction=in_transaction):
+                allocators = [NumberAllocator(f'threads-{in_transaction}', block_size=10)
+                              for _ in range(self.allocators)]
+                sequences = allocate_from_threads(allocators, self.threads, self.count, in_transaction)
+                self.assert_unique_and_increasing(sequences, self.allocators * self.threads * self.count)
+
+    @skipUnless(hasattr(os, 'fork'), 'needs fork')
+    def test_unique_across_forked_processes(self):
+        context = multiprocessing.get_context('fork')
+        for in_transaction in (False, True):
+            with self.subTest(in_transaction=in_transaction):
+                # The parent holds a block when it forks; children must not reuse it.
+                allocator = NumberAllocator(f'processes-{in_transaction}', block_size=10)
+                parent_value = allocator.allocate()[1]
+                connections.close_all()
+                queue = context.Queue()
+                processes = [
+                    context.Process(
+                        target=allocate_in_process,
+                        args=(allocator, self.threads, self.count, in_transaction, queue),
+                    )
+                    for _ in range(self.processes)
+                ]
+                for process in processes:
+                    process.start()
+                sequences = [values for _ in processes for values in queue.get(timeout=120)]
+                for process in processes:
+                    process.join()
+                    self.assertEqual(process.exitcode, 0)
+                self.assert_unique_and_increasing(
+                    sequences + [[parent_value]], self.processes * self.threads * self.count + 1,
+                )
+
+    def test_dedicated_connection_is_replaced_after_failure(self):
+        # The path taken inside transactions on backends other than SQLite.
+        allocator = NumberAllocator('dedicated', block_size=10)
+        day = timezone.localdate()
+        self.assertEqual(allocator._reserve_independently(day, 10), 1)
+        first = allocator._connection
+        # A persistent connection (CONN_MAX_AGE) that the server has dropped.
+        first.close_at = None
+        first.connection.close()
+        with self.assertRaises(DatabaseError):
+            allocator._reserve_independently(day, 10)
+        self.assertIsNone(allocator._connection)
+        self.assertEqual(allocator._reserve_independently(day, 10), 11)
+        self.assertIsNot(allocator._connection, first)
+        allocator._connection.close()
@@ -0,0 +1,96 @@
+"""
+Order status state machine and bulk transitions.
+
+``TRANSITIONS`` lists the statuses each status may move to. ``transition_orders``
+moves any number of orders with one UPDATE filtered on the statuses allowed
+to reach the target (so an order changed meanwhile is skipped, not
+overwritten), stamps the target's timestamp column, writes the tracking rows
+with one ``bulk_create`` and applies the stock effect of the move. Confirmed
+orders get their invoice queued for rendering.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .invoices import queue_invoices
+from .models import Order, OrderItem, OrderTracking
+from .services import adjust_reserved_stock, deduct_shipped_stock
+
+TRANSITIONS = {
+    'pending': ('confirmed', 'cancelled'),
+    'confirmed': ('processing', 'shipped', 'cancelled'),
+    'processing': ('shipped',),
+    'shipped': ('delivered',),
+    'delivered': ('refunded',),
+    'cancelled': (),
+    'refunded': (),
+}
+TIMESTAMP_FIELDS = {'confirmed': 'confirmed_at', 'shipped': 'shipped_at', 'delivered': 'delivered_at'}
+DEFAULT_DESCRIPTIONS = {
+    'confirmed': 'Order confirmed',
+    'processing': 'Order is being prepared',
+    'shipped': 'Order shipped',
+    'delivered': 'Order delivered',
+    'cancelled': 'Order cancelled',
+    'refunded': 'Order refunded',
+}
+
+
+def sources_of(target):
+    """Statuses from which an order may move to ``target``."""
+    return [source for source, targets in TRANSITIONS.items() if target in targets]
+
+
+def can_transition(source, target):
+    return target in TRANSITIONS.get(source, ())
+
+
+def transition_orders(order_ids, target, user=None, description='', location=''):
+    """Move ``order_ids`` to ``target`` where their current status allows it.
+
+    Returns ``{'updated': [...], 'skipped': [{'id', 'status'}], 'missing': [...]}``;
+    skipped orders are in a status that cannot reach ``target``.
+    """
+    if target not in TRANSITIONS:
+        raise ValueError(f'Unknown order status: {target}')
+    order_ids = set(order_ids)
+    now = timezone.now()
+    with transaction.atomic():
+        current = dict(
+            Order.objects.select_for_update().filter(pk__in=order_ids).values_list('id', 'status')
+        )
+        movable = sorted(order_id for order_id, status in current.items() if can_transition(status, target))
+        fields = {'status': target, 'updated_at': now, 'latest_tracking_status': target}
+        if target in TIMESTAMP_FIELDS:
+            fields[TIMESTAMP_FIELDS[target]] = now
+        if target == 'confirmed' and user is not None:
+            fields['processed_by'] = user
+        # Filtered on the source statuses again, so the UPDATE itself never
+        # applies a transition the state machine does not allow.
+        Order.objects.filter(pk__in=movable, status__in=sources_of(target)).update(**fields)
+
+        if movable:
+            OrderTracking.objects.bulk_create([
+                OrderTracking(
+                    order_id=order_id, status=target, location=location, updated_by=user,
+                    description=description or DEFAULT_DESCRIPTIONS[target],
+                )
+                for order_id in movable
+            ])
+            if target in ('cancelled', 'shipped'):
+                items = list(OrderItem.objects.filter(order_id__in=movable).select_related('product__stock'))
+                if target == 'cancelled':
+                    adjust_reserved_stock(items, release=True)
+                else:
+                    deduct_shipped_stock(items)
+            elif target == 'confirmed':
+                queue_invoices(movable)
+
+    return {
+        'status': target,
+        'updated': movable,
+        'skipped': [
+            {'id': order_id, 'status': status}
+            for order_id, status in sorted(current.items()) if order_id not in movable
+        ],
+        'missing': sorted(order_ids - set(current)),
+    }
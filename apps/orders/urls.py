@@ -5,14 +5,23 @@ urlpatterns = [
     path('cart/', views.CartView.as_view(), name='cart'),
     path('cart/items/', views.CartItemListView.as_view(), name='cart-items'),
     path('cart/items/<int:pk>/', views.CartItemDetailView.as_view(), name='cart-item-detail'),
+    path('cart/batch/', views.batch_cart, name='cart-batch'),
     path('cart/clear/', views.clear_cart, name='clear-cart'),
+    path('checkout/', views.checkout, name='checkout'),
     path('', views.OrderListView.as_view(), name='order-list'),
+    path('search/', views.order_search, name='order-search'),
+    path('transition/', views.transition_order_status, name='order-transition'),
     path('<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
+    path('archived/<int:pk>/', views.archived_order_detail, name='archived-order-detail'),
     path('<int:pk>/cancel/', views.cancel_order, name='cancel-order'),
     path('<int:pk>/confirm/', views.confirm_order, name='confirm-order'),
+    path('<int:pk>/reorder/', views.reorder_order, name='reorder-order'),
     path('<int:order_id>/tracking/', views.OrderTrackingView.as_view(), name='order-tracking'),
     path('invoices/<int:pk>/', views.InvoiceView.as_view(), name='invoice-detail'),
+    path('invoices/<int:pk>/pdf/', views.invoice_pdf, name='invoice-pdf'),
     path('pre-orders/', views.PreOrderListView.as_view(), name='pre-order-list'),
     path('restock-notifications/', views.RestockNotificationListView.as_view(), name='restock-notifications'),
     path('dashboard/', views.order_dashboard, name='order-dashboard'),
+    path('reports/sales/', views.sales_report, name='sales-report'),
+    path('export/', views.export_orders, name='order-export'),
 ]
\ No newline at end of file
@@ -1,115 +1,240 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from django.db.models import F, Prefetch, Value
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Cart, CartItem, Order, OrderItem, OrderTracking, Invoice, PreOrder, RestockNotification
+from django.utils.decorators import method_decorator
+from .models import (
+    ArchivedOrder, Order, OrderItem, OrderTracking, Invoice, PreOrder, RestockNotification
+)
 from .serializers import (
     CartSerializer, CartItemSerializer, OrderSerializer, OrderCreateSerializer,
-    OrderTrackingSerializer, InvoiceSerializer, PreOrderSerializer, RestockNotificationSerializer
+    OrderTrackingSerializer, InvoiceSerializer, PreOrderSerializer, RestockNotificationSerializer,
+    CartBatchSerializer, CheckoutSerializer, OrderHistorySerializer, OrderSummarySerializer, OrderTransitionSerializer,
+    OrderExportSerializer, OrderSearchSerializer, SalesReportSerializer
+)
+from apps.common.cache import DASHBOARD_CACHE_TIMEOUT, cached_snapshot
+from apps.common.serializers import requested_shape
+from apps.common.views import ShapedQuerysetMixin
+from .cart_store import CART_TOKEN_HEADER, get_cart_store, reorder
+from .exports import EXPORT_FORMATS, FORMATTERS, export_rows
+from .idempotency import idempotent
+from .reports import sales_report as build_sales_report
+from .search import classify, search_orders
+from .services import OrderError, checkout_cart, order_dashboard_stats
+from .transitions import TRANSITIONS, transition_orders
+from apps.products.models import Product, primary_images_prefetch
+
+PRODUCT_SELECT_RELATED = ['product__category', 'product__stock', 'product__rating_summary']
+PRODUCT_PREFETCH_RELATED = [primary_images_prefetch('product__images')]
+WAREHOUSE_STATUSES = ('processing', 'shipped', 'delivered')
+INVOICE_RETRY_AFTER = 30
+INVOICE_CACHE_MAX_AGE = 3600
+HISTORY_FIELDS = (
+    'id', 'order_number', 'customer', 'status', 'payment_status', 'total_amount', 'item_count',
+    'first_item_name', 'latest_tracking_status', 'created_at', 'updated_at',
 )
-from apps.products.models import Product
 
 
-class CartView(generics.RetrieveAPIView):
+class CartStoreMixin:
+    """Cart views reading and writing through the request's cart store."""
+
+    def get_cart_store(self):
+        if not hasattr(self, 'cart_store'):
+            self.cart_store = get_cart_store(self.request)
+        return self.cart_store
+
+    def expands_product(self):
+        return 'product' in requested_shape(self.request)[1]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Guests keep their cart by sending the issued token back.
+        store = getattr(self, 'cart_store', None)
+        if store is not None and store.token:
+            response[CART_TOKEN_HEADER] = store.token
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CartView(CartStoreMixin, generics.RetrieveAPIView):
     serializer_class = CartSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.AllowAny]
 
     def get_object(self):
-        cart, created = Cart.objects.get_or_create(customer=self.request.user)
-        return cart
+        # Totals come from SQL (or the cached lines); items, products, stock
+        # and primary images take one query each, whatever the number of lines.
+        fields, expand = requested_shape(self.request)
+        return self.get_cart_store().get_cart(
+            with_items=fields is None or 'items' in fields,
+            expand_products='product' in expand.get('items', {}),
+        )
 
 
-class CartItemListView(generics.ListCreateAPIView):
+@method_decorator(idempotent, name='post')
+class CartItemListView(CartStoreMixin, generics.ListCreateAPIView):
     serializer_class = CartItemSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.AllowAny]
 
     def get_queryset(self):
-        cart, created = Cart.objects.get_or_create(customer=self.request.user)
-        return cart.items.all()
+        return self.get_cart_store().items(self.expands_product())
+
+    def filter_queryset(self, queryset):
+        return queryset
 
     def perform_create(self, serializer):
-        cart, created = Cart.objects.get_or_create(customer=self.request.user)
-        product_id = serializer.validated_data['product_id']
-        
-        # Check if item already exists in cart
-        existing_item = cart.items.filter(product_id=product_id).first()
-        if existing_item:
-            existing_item.quantity += serializer.validated_data['quantity']
-            existing_item.save()
-            return existing_item
-        else:
-            serializer.save(cart=cart)
+        product = Product.objects.filter(pk=serializer.validated_data['product_id'], is_active=True).first()
+        if product is None:
+            raise ValidationError({'product_id': ['Product not found.']})
+        serializer.instance = self.get_cart_store().add(product, serializer.validated_data['quantity'])
 
 
-class CartItemDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CartItemDetailView(CartStoreMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CartItemSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.AllowAny]
 
-    def get_queryset(self):
-        cart, created = Cart.objects.get_or_create(customer=self.request.user)
-        return cart.items.all()
+    def get_object(self):
+        return self.get_cart_store().get_item(self.kwargs['pk'], self.expands_product())
+
+    def perform_update(self, serializer):
+        quantity = serializer.validated_data.get('quantity', serializer.instance.quantity)
+        serializer.instance = self.get_cart_store().update(serializer.instance, quantity)
+
+    def perform_destroy(self, instance):
+        self.get_cart_store().remove(instance)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+@idempotent
+def batch_cart(request):
+    """Apply many add/set/remove operations to the cart at once"""
+    serializer = CartBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    store = get_cart_store(request)
+    response = Response(store.apply(serializer.validated_data['operations']))
+    if store.token:
+        response[CART_TOKEN_HEADER] = store.token
+    return response
 
 
 @api_view(['DELETE'])
-@permission_classes([permissions.IsAuthenticated])
+@permission_classes([permissions.AllowAny])
 def clear_cart(request):
-    cart, created = Cart.objects.get_or_create(customer=request.user)
-    cart.items.all().delete()
+    get_cart_store(request).clear()
     return Response({'message': 'Cart cleared successfully'})
 
 
-class OrderListView(generics.ListCreateAPIView):
-    serializer_class = OrderSerializer
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@idempotent
+def checkout(request):
+    serializer = CheckoutSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        with get_cart_store(request).flushed():
+            order = checkout_cart(request.user, **serializer.validated_data)
+    except OrderError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(OrderSerializer(order, expand={'items': {}}).data, status=status.HTTP_201_CREATED)
+
+
+@method_decorator(idempotent, name='post')
+class OrderListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
+    serializer_class = OrderSummarySerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'payment_status']
     ordering = ['-created_at']
 
     def get_queryset(self):
+        orders = Order.objects.select_related('customer')
         if self.request.user.is_admin or self.request.user.is_moderator:
-            return Order.objects.all()
+            return orders
         elif self.request.user.is_warehouse_manager:
-            return Order.objects.filter(status__in=['confirmed', 'processing'])
+            return orders.filter(status__in=['confirmed', 'processing'])
         else:
-            return Order.objects.filter(customer=self.request.user)
+            return orders.filter(customer=self.request.user)
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return OrderCreateSerializer
-        return OrderSerializer
+        return OrderSummarySerializer
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('include_archived') not in ('1', 'true'):
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(self.get_history_queryset())
+        return self.get_paginated_response(OrderHistorySerializer(page, many=True).data)
+
+    def get_archived_queryset(self):
+        if self.request.user.is_admin or self.request.user.is_moderator:
+            return ArchivedOrder.objects.all()
+        elif self.request.user.is_warehouse_manager:
+            return ArchivedOrder.objects.none()
+        else:
+            return ArchivedOrder.objects.filter(customer=self.request.user)
+
+    def get_history_queryset(self):
+        """Hot and archived orders as one UNION ALL, newest first."""
+        params = self.request.query_params
+        filters = {name: params[name] for name in self.filterset_fields if params.get(name)}
+        hot = self.get_queryset().filter(**filters).order_by().values(
+            *HISTORY_FIELDS, customer_name=F('customer__username'), is_archived=Value(False)
+        )
+        archived = self.get_archived_queryset().filter(**filters).order_by().values(
+            *HISTORY_FIELDS, customer_name=F('customer__username'), is_archived=Value(True)
+        )
+        return hot.union(archived, all=True).order_by('-created_at', '-id')
 
 
-class OrderDetailView(generics.RetrieveUpdateAPIView):
+class OrderDetailView(ShapedQuerysetMixin, generics.RetrieveUpdateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    expand_prefetch_related = {
+        'items': ['items'],
+        'tracking': [Prefetch('tracking', queryset=OrderTracking.objects.select_related('updated_by'))],
+    }
 
     def get_queryset(self):
+        orders = Order.objects.select_related('customer')
         if self.request.user.is_admin or self.request.user.is_moderator:
-            return Order.objects.all()
+            return orders
         elif self.request.user.is_warehouse_manager:
-            return Order.objects.filter(status__in=['confirmed', 'processing'])
+            return orders.filter(status__in=['confirmed', 'processing'])
         else:
-            return Order.objects.filter(customer=self.request.user)
+            return orders.filter(customer=self.request.user)
+
+    def perform_update(self, serializer):
+        # ``status`` is read-only on the serializer; a change goes through the
+        # state machine so tracking, stock and invoices follow it.
+        target = self.request.data.get('status')
+        with transaction.atomic():
+            order = serializer.save()
+            if target and target != order.status:
+                self.transition(order, target)
+
+    def transition(self, order, target):
+        user = self.request.user
+        if target not in TRANSITIONS:
+            raise ValidationError({'status': [f'"{target}" is not a valid choice.']})
+        if not (user.is_admin or user.is_moderator or (user.is_warehouse_manager and target in WAREHOUSE_STATUSES)):
+            raise PermissionDenied()
+        if not transition_orders([order.pk], target, user)['updated']:
+            raise ValidationError({'status': [f'Order cannot move from {order.status} to {target}.']})
+        order.refresh_from_db()
 
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def cancel_order(request, pk):
     order = get_object_or_404(Order, pk=pk, customer=request.user)
     
-    if order.can_be_cancelled:
-        order.status = 'cancelled'
-        order.save()
-        
-        # Create tracking entry
-        OrderTracking.objects.create(
-            order=order,
-            status='cancelled',
-            description='Order cancelled by customer',
-            updated_by=request.user
-        )
-        
+    result = transition_orders([order.pk], 'cancelled', request.user, description='Order cancelled by customer')
+    if result['updated']:
         return Response({'message': 'Order cancelled successfully'})
     else:
         return Response(
@@ -120,25 +245,15 @@ def cancel_order(request, pk):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def confirm_order(request, pk):
     if not (request.user.is_admin or request.user.is_moderator):
         return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
     
     order = get_object_or_404(Order, pk=pk)
     
-    if order.status == 'pending':
-        order.status = 'confirmed'
-        order.processed_by = request.user
-        order.save()
-        
-        # Create tracking entry
-        OrderTracking.objects.create(
-            order=order,
-            status='confirmed',
-            description='Order confirmed by admin',
-            updated_by=request.user
-        )
-        
+    result = transition_orders([order.pk], 'confirmed', request.user, description='Order confirmed by admin')
+    if result['updated']:
         return Response({'message': 'Order confirmed successfully'})
     else:
         return Response(
@@ -147,6 +262,47 @@ def confirm_order(request, pk):
         )
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@idempotent
+def reorder_order(request, pk):
+    """Copy the lines of a past order into the cart"""
+    order = get_object_or_404(Order.objects.only('pk'), pk=pk, customer=request.user)
+    return Response(reorder(get_cart_store(request), order))
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@idempotent
+def transition_order_status(request):
+    """Move many orders to one status; orders in a status that cannot reach it are skipped"""
+    user = request.user
+    if not (user.is_admin or user.is_moderator or user.is_warehouse_manager):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = OrderTransitionSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    if user.is_warehouse_manager and not user.is_admin and params['status'] not in WAREHOUSE_STATUSES:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    result = transition_orders(
+        params['ids'], params['status'], user,
+        description=params['description'], location=params['location'],
+    )
+    return Response(result)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def archived_order_detail(request, pk):
+    archived = ArchivedOrder.objects.all()
+    if not (request.user.is_admin or request.user.is_moderator):
+        archived = archived.filter(customer=request.user)
+    payload = get_object_or_404(archived, pk=pk).payload
+    return Response({**payload['order'], 'items': payload['items'], 'tracking': payload['tracking'], 'is_archived': True})
+
+
 class OrderTrackingView(generics.ListCreateAPIView):
     serializer_class = OrderTrackingSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -160,9 +316,14 @@ class OrderTrackingView(generics.ListCreateAPIView):
         serializer.save(order_id=order_id, updated_by=self.request.user)
 
 
-class InvoiceView(generics.RetrieveAPIView):
+class InvoiceView(ShapedQuerysetMixin, generics.RetrieveAPIView):
     serializer_class = InvoiceSerializer
     permission_classes = [permissions.IsAuthenticated]
+    expand_select_related = {'order': ['order__customer']}
+    expand_prefetch_related = {
+        'order.items': ['order__items'],
+        'order.tracking': [Prefetch('order__tracking', queryset=OrderTracking.objects.select_related('updated_by'))],
+    }
 
     def get_queryset(self):
         if self.request.user.is_admin or self.request.user.is_moderator:
@@ -171,23 +332,47 @@ class InvoiceView(generics.RetrieveAPIView):
             return Invoice.objects.filter(order__customer=self.request.user)
 
 
-class PreOrderListView(generics.ListCreateAPIView):
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def invoice_pdf(request, pk):
+    """The stored invoice PDF, or 202 while it is still queued for rendering"""
+    invoices = Invoice.objects.all()
+    if not (request.user.is_admin or request.user.is_moderator):
+        invoices = invoices.filter(order__customer=request.user)
+    invoice = get_object_or_404(invoices, pk=pk)
+    if not invoice.pdf_file:
+        response = Response({'status': 'queued'}, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = str(INVOICE_RETRY_AFTER)
+        return response
+
+    response = FileResponse(
+        invoice.pdf_file.open('rb'), content_type='application/pdf', filename=f'{invoice.invoice_number}.pdf'
+    )
+    response['Cache-Control'] = f'private, max-age={INVOICE_CACHE_MAX_AGE}'
+    return response
+
+
+class PreOrderListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = PreOrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    expand_select_related = {'product': PRODUCT_SELECT_RELATED}
+    expand_prefetch_related = {'product': PRODUCT_PREFETCH_RELATED}
 
     def get_queryset(self):
-        return PreOrder.objects.filter(customer=self.request.user)
+        return PreOrder.objects.filter(customer=self.request.user).select_related('customer')
 
     def perform_create(self, serializer):
         serializer.save(customer=self.request.user)
 
 
-class RestockNotificationListView(generics.ListCreateAPIView):
+class RestockNotificationListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = RestockNotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    expand_select_related = {'product': PRODUCT_SELECT_RELATED}
+    expand_prefetch_related = {'product': PRODUCT_PREFETCH_RELATED}
 
     def get_queryset(self):
-        return RestockNotification.objects.filter(customer=self.request.user)
+        return RestockNotification.objects.filter(customer=self.request.user).select_related('customer')
 
     def perform_create(self, serializer):
         serializer.save(customer=self.request.user)
@@ -199,18 +384,62 @@ def order_dashboard(request):
     """Dashboard view for warehouse managers and admins"""
     if not (request.user.is_admin or request.user.is_warehouse_manager):
         return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
-    
-    from django.db.models import Count, Sum
-    
-    # Order statistics
-    order_stats = {
-        'pending_orders': Order.objects.filter(status='pending').count(),
-        'confirmed_orders': Order.objects.filter(status='confirmed').count(),
-        'processing_orders': Order.objects.filter(status='processing').count(),
-        'shipped_orders': Order.objects.filter(status='shipped').count(),
-        'total_revenue': Order.objects.filter(status='delivered').aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0,
-    }
-    
-    return Response(order_stats)
\ No newline at end of file
+
+    return Response(cached_snapshot('dashboard:orders', order_dashboard_stats, DASHBOARD_CACHE_TIMEOUT))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sales_report(request):
+    """Sales per day, week or month from the daily rollups (admin only)"""
+    if not request.user.is_admin:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = SalesReportSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    return Response(build_sales_report(
+        params['start'], params['end'], granularity=params['granularity'],
+        group_by=params.get('group_by'), statuses=params.get('status'),
+    ))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def export_orders(request):
+    """Order lines of a date range as streamed CSV or JSON lines (staff only)"""
+    if not (request.user.is_admin or request.user.is_moderator):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = OrderExportSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    rows = export_rows(params['start'], params['end'], statuses=params.get('status'))
+    response = StreamingHttpResponse(
+        FORMATTERS[params['output']](rows), content_type=EXPORT_FORMATS[params['output']]
+    )
+    response['Content-Disposition'] = (
+        f"attachment; filename=\"orders-{params['start']}-{params['end']}.{params['output']}\""
+    )
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def order_search(request):
+    """Find orders by order number, customer email or phone (staff only)"""
+    user = request.user
+    if not (user.is_admin or user.is_moderator or user.is_warehouse_manager):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = OrderSearchSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+    orders = Order.objects.select_related('customer')
+    if not (user.is_admin or user.is_moderator):
+        orders = orders.filter(status__in=['confirmed', 'processing'])
+    results = search_orders(orders, params['q'], exact=params['exact'])
+    return Response({
+        'kind': classify(params['q'].strip()),
+        'results': OrderSummarySerializer(results, many=True).data,
+    })
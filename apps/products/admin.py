@@ -4,6 +4,7 @@ from .models import (
     Category, Product, ProductImage, Stock, ProductReview, 
     Wishlist, Coupon, PromotionalOffer
 )
+from .reviews import moderate_reviews
 
 
 class ProductImageInline(admin.TabularInline):
@@ -107,7 +108,9 @@ class ProductReviewAdmin(admin.ModelAdmin):
     list_filter = ('rating', 'is_verified_purchase', 'is_approved', 'created_at')
     search_fields = ('product__name', 'customer__username', 'title', 'comment')
     list_editable = ('is_approved',)
+    list_select_related = ('product', 'customer')
     readonly_fields = ('created_at', 'updated_at')
+    actions = ['approve_reviews', 'reject_reviews']
     
     fieldsets = (
         ('Review Details', {
@@ -122,6 +125,16 @@ class ProductReviewAdmin(admin.ModelAdmin):
         })
     )
 
+    def approve_reviews(self, request, queryset):
+        result = moderate_reviews(queryset, approve=True)
+        self.message_user(request, f"Approved {result['updated']} reviews across {result['products']} products.")
+    approve_reviews.short_description = 'Approve selected reviews'
+
+    def reject_reviews(self, request, queryset):
+        result = moderate_reviews(queryset, approve=False)
+        self.message_user(request, f"Rejected {result['updated']} reviews across {result['products']} products.")
+    reject_reviews.short_description = 'Reject selected reviews'
+
 
 @admin.register(Wishlist)
 class WishlistAdmin(admin.ModelAdmin):
@@ -0,0 +1,290 @@
+"""
+In-process prefix index backing search-as-you-type.
+
+Every searchable phrase (product name and each of its word suffixes, SKU,
+category name) is normalized and kept in one sorted list, with a parallel
+``array`` of packed object references. A prefix lookup is two bisections
+plus a scan of the matching slice; the best entries of very short prefixes,
+whose slices are large, are cached until the next mutation.
+
+Each worker builds its own index on start-up and keeps it current with the
+changes other workers commit (see ``index_sync.py``).
+"""
+import heapq
+import logging
+import sys
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Q
+
+from .index_sync import SyncedIndex
+
+logger = logging.getLogger(__name__)
+
+KIND_PRODUCT = 0
+KIND_CATEGORY = 1
+KIND_NAMES = {KIND_PRODUCT: 'product', KIND_CATEGORY: 'category'}
+
+AUTOCOMPLETE_LIMIT = getattr(settings, 'AUTOCOMPLETE_LIMIT', 10)
+AUTOCOMPLETE_MAX_SCAN = getattr(settings, 'AUTOCOMPLETE_MAX_SCAN', 5000)
+SHORT_PREFIX_LENGTH = 2
+SHORT_CACHE_SIZE = 20
+BUCKET_PREFIX_LENGTH = 3
+FEATURED_WEIGHT = 5.0
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())
+
+
+def phrase_terms(text):
+    """The normalized phrase and every suffix starting at a word boundary."""
+    words = normalize(text).split(' ')
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+def pack_ref(kind, object_id):
+    return object_id << 1 | kind
+
+
+def unpack_ref(ref):
+    return ref & 1, ref >> 1
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._terms = []
+        self._refs = array('q')
+        self._entries = {}
+        # 3-character prefix -> (negated weights, refs), ordered best first, so
+        # dense prefixes can stop scanning after the first ``limit`` matches.
+        self._buckets = {}
+        self._short_cache = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def build(self, entries):
+        """Replace the contents with ``(kind, object_id, label, terms, weight)`` tuples."""
+        pairs = []
+        stored = {}
+        bucketed = {}
+        for kind, object_id, label, terms, weight in entries:
+            ref = pack_ref(kind, object_id)
+            terms = tuple(dict.fromkeys(terms))
+            stored[ref] = (label, weight, terms)
+            pairs.extend((term, ref) for term in terms)
+            for bucket_key in {term[:BUCKET_PREFIX_LENGTH] for term in terms}:
+                bucketed.setdefault(bucket_key, []).append((-weight, ref))
+        pairs.sort()
+        buckets = {}
+        for bucket_key, members in bucketed.items():
+            members.sort()
+            buckets[bucket_key] = (
+                array('d', (weight for weight, _ in members)),
+                array('q', (ref for _, ref in members)),
+            )
+        with self._lock:
+            self._terms = [term for term, _ in pairs]
+            self._refs = array('q', (ref for _, ref in pairs))
+            self._entries = stored
+            self._buckets = buckets
+            self._short_cache = {}
+
+    def add(self, kind, object_id, label, terms, weight):
+        ref = pack_ref(kind, object_id)
+        terms = tuple(dict.fromkeys(terms))
+        with self._lock:
+            self._remove(ref)
+            for term in terms:
+                position = bisect_left(self._terms, term)
+                self._terms.insert(position, term)
+                self._refs.insert(position, ref)
+            for bucket_key in {term[:BUCKET_PREFIX_LENGTH] for term in terms}:
+                weights, refs = self._buckets.setdefault(bucket_key, (array('d'), array('q')))
+                position = bisect_left(weights, -weight)
+                weights.insert(position, -weight)
+                refs.insert(position, ref)
+                self._invalidate(bucket_key)
+            self._entries[ref] = (label, weight, terms)
+
+    def remove(self, kind, object_id):
+        with self._lock:
+            self._remove(pack_ref(kind, object_id))
+
+    def _remove(self, ref):
+        entry = self._entries.pop(ref, None)
+        if entry is None:
+            return
+        label, weight, terms = entry
+        for term in terms:
+            position = bisect_left(self._terms, term)
+            while position < len(self._terms) and self._terms[position] == term:
+                if self._refs[position] == ref:
+                    del self._terms[position]
+                    del self._refs[position]
+                    break
+                position += 1
+        for bucket_key in {term[:BUCKET_PREFIX_LENGTH] for term in terms}:
+            weights, refs = self._buckets[bucket_key]
+            position = bisect_left(weights, -weight)
+            while refs[position] != ref:
+                position += 1
+            del weights[position]
+            del refs[position]
+            if not refs:
+                del self._buckets[bucket_key]
+            self._invalidate(bucket_key)
+
+    def _invalidate(self, bucket_key):
+        for length in range(1, SHORT_PREFIX_LENGTH + 1):
+            self._short_cache.pop(bucket_key[:length], None)
+
+    def search(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        """Best ``limit`` entries whose terms start with ``prefix``, by weight."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        with self._lock:
+            if len(key) <= SHORT_PREFIX_LENGTH:
+                refs = self._short_cache.get(key)
+                if refs is None:
+                    refs = self._short_cache[key] = self._best_of_buckets(key, SHORT_CACHE_SIZE)
+            else:
+                refs = self._lookup(key, limit)
+            return [
+                {'type': KIND_NAMES[unpack_ref(ref)[0]], 'id': unpack_ref(ref)[1], 'label': self._entries[ref][0]}
+                for ref in refs[:limit]
+            ]
+
+    def _lookup(self, key, limit):
+        start = bisect_left(self._terms, key)
+        stop = bisect_left(self._terms, key + '\uffff', start)
+        bucket = self._buckets.get(key[:BUCKET_PREFIX_LENGTH])
+        matched = stop - start
+        # Scanning the matched slice costs ~matched, walking the bucket
+        # best-first until ``limit`` hits costs ~limit * bucket / matched.
+        if not matched or matched * matched <= limit * len(bucket[1]):
+            matches = set(self._refs[start:stop])
+            return heapq.nlargest(limit, matches, key=lambda ref: self._entries[ref][1])
+        found = []
+        for ref in bucket[1]:
+            if ref not in found and any(term.startswith(key) for term in self._entries[ref][2]):
+                found.append(ref)
+                if len(found) == limit:
+                    break
+        return found
+
+    def _best_of_buckets(self, key, limit):
+        buckets = [
+            zip(weights, refs)
+            for bucket_key, (weights, refs) in self._buckets.items()
+            if bucket_key.startswith(key)
+        ]
+        found = []
+        for _, ref in heapq.merge(*buckets):
+            if ref not in found:
+                found.append(ref)
+                if len(found) == limit:
+                    break
+        return found
+
+    def memory_usage(self):
+        """Approximate bytes held by the index structures."""
+        with self._lock:
+            size = sys.getsizeof(self._terms) + sys.getsizeof(self._entries) + sys.getsizeof(self._buckets)
+            size += self._refs.buffer_info()[1] * self._refs.itemsize
+            for weights, refs in self._buckets.values():
+                size += len(weights) * weights.itemsize + len(refs) * refs.itemsize
+            seen = set()
+            for label, weight, terms in self._entries.values():
+                size += sys.getsizeof(label) + sys.getsizeof(terms) + sys.getsizeof(weight)
+                for term in terms:
+                    if id(term) not in seen:
+                        seen.add(id(term))
+                        size += sys.getsizeof(term)
+            return size
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'terms': len(self._terms),
+            'memory_bytes': self.memory_usage(),
+        }
+
+
+def product_entry(product_id, name, sku, is_featured, popularity):
+    weight = 1.0 + (popularity or 0) + (FEATURED_WEIGHT if is_featured else 0)
+    return KIND_PRODUCT, product_id, name, phrase_terms(name) + [normalize(sku)], weight
+
+
+def category_entry(category_id, name, product_count):
+    return KIND_CATEGORY, category_id, name, phrase_terms(name), 1.0 + product_count
+
+
+def load_entries(product_ids=None, category_ids=None):
+    """Entries of active products and categories, or of just the given ids."""
+    from .models import Category, Product
+
+    products = Product.objects.filter(is_active=True)
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    products = products.values_list(
+        'id', 'name', 'sku', 'is_featured', 'ranking__bestseller_score', 'ranking__wishlist_30d'
+    )
+    if product_ids is None or product_ids:
+        for product_id, name, sku, is_featured, sales, wishlists in products.iterator(chunk_size=5000):
+            yield product_entry(product_id, name, sku, is_featured, (sales or 0) + (wishlists or 0))
+
+    categories = Category.objects.filter(is_active=True)
+    if category_ids is not None:
+        categories = categories.filter(id__in=category_ids)
+    categories = categories.annotate(
+        product_count=Count('products', filter=Q(products__is_active=True))
+    ).values_list('id', 'name', 'product_count')
+    if category_ids is None or category_ids:
+        for category_id, name, product_count in categories:
+            yield category_entry(category_id, name, product_count)
+
+
+def build_autocomplete_index():
+    index = PrefixIndex()
+    index.build(load_entries())
+    logger.info('Autocomplete index built: %(entries)d entries, %(terms)d terms, '
+                '%(memory_bytes)d bytes', index.stats())
+    return index
+
+
+def apply_autocomplete_changes(index, product_ids, category_ids):
+    """Reload the given products and categories; those no longer active are dropped."""
+    stale = {(KIND_PRODUCT, product_id) for product_id in product_ids}
+    stale.update((KIND_CATEGORY, category_id) for category_id in category_ids)
+    for entry in load_entries(product_ids, category_ids):
+        index.add(*entry)
+        stale.discard(entry[:2])
+    for kind, object_id in stale:
+        index.remove(kind, object_id)
+
+
+_synced = SyncedIndex(build_autocomplete_index, apply_autocomplete_changes)
+
+
+def get_autocomplete_index():
+    """The worker's index, built from the database on first use and synced before each use."""
+    return _synced.get()
+
+
+def warm_autocomplete_index():
+    """Build the index at worker start; a missing schema just defers it."""
+    try:
+        get_autocomplete_index()
+    except DatabaseError:
+        logger.warning('Autocomplete index not built at start-up', exc_info=True)
@@ -0,0 +1,123 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Prefetch
+from django.utils import timezone
+
+from .models import Product, PromotionalOffer
+
+COMPARISON_MAX_ITEMS = getattr(settings, 'PRODUCT_COMPARISON_MAX_ITEMS', 4)
+COMPARISON_CACHE_TIMEOUT = getattr(settings, 'PRODUCT_COMPARISON_CACHE_TIMEOUT', 15 * 60)
+
+COMPARISON_ATTRIBUTES = (
+    'price', 'weight', 'dimensions', 'average_rating', 'review_count',
+    'availability', 'stock', 'active_offers',
+)
+
+
+def comparison_cache_key(product_ids, now=None):
+    """Cache key and timeout for the matrix of the given products at their current version.
+
+    The version is the newest ``updated_at`` of the products (and of their
+    stock and rating summary rows) plus the id and ``updated_at`` of every
+    offer linked to them, so any edit produces a new key and stale matrices
+    simply expire. The timeout is cut to the next time one of those offers
+    starts or ends. Costs two queries.
+    """
+    now = now or timezone.now()
+    ids = tuple(sorted(set(product_ids)))
+    version = Product.objects.filter(id__in=ids).aggregate(
+        product_updated=Max('updated_at'),
+        stock_updated=Max('stock__last_updated'),
+        ratings_updated=Max('rating_summary__updated_at'),
+    )
+    offers = sorted(set(
+        PromotionalOffer.objects.filter(applicable_products__in=ids).values_list(
+            'applicable_products', 'id', 'updated_at', 'is_active', 'valid_from', 'valid_to',
+        )
+    ))
+    digest = hashlib.md5(','.join(str(pk) for pk in ids).encode()).hexdigest()
+    offers_digest = hashlib.md5(','.join(
+        f'{product_id}/{offer_id}/{updated_at.isoformat()}' for product_id, offer_id, updated_at, *_ in offers
+    ).encode()).hexdigest()
+    stamps = [
+        value.isoformat() if value else '-'
+        for value in (version['product_updated'], version['stock_updated'], version['ratings_updated'])
+    ]
+
+    timeout = COMPARISON_CACHE_TIMEOUT
+    boundaries = [
+        boundary
+        for *_, is_active, valid_from, valid_to in offers if is_active
+        for boundary in (valid_from, valid_to) if boundary >= now
+    ]
+    if boundaries:
+        # An offer is shown up to and including ``valid_to``.
+        timeout = min(timeout, int((min(boundaries) - now).total_seconds()) + 1)
+    return f"product-comparison:{digest}:{':'.join(stamps)}:{offers_digest}", timeout
+
+
+def build_comparison_matrix(product_ids):
+    """Column-oriented attribute matrix for the given products.
+
+    All products are loaded with two queries regardless of how many are
+    compared: one for products with category, stock and rating summary and
+    one prefetch for currently active promotional offers.
+    """
+    now = timezone.now()
+    active_offers = PromotionalOffer.objects.filter(
+        is_active=True, valid_from__lte=now, valid_to__gte=now
+    ).only('id', 'title', 'offer_type', 'discount_percentage')
+
+    products = (
+        Product.objects.filter(id__in=product_ids, is_active=True)
+        .select_related('category', 'stock', 'rating_summary')
+        .prefetch_related(Prefetch('promotional_offers', queryset=active_offers, to_attr='active_offers'))
+        .order_by('id')
+    )
+
+    columns = []
+    attributes = {name: [] for name in COMPARISON_ATTRIBUTES}
+    for product in products:
+        stock = getattr(product, 'stock', None)
+        columns.append({
+            'id': product.id,
+            'name': product.name,
+            'sku': product.sku,
+            'category_name': product.category.name,
+        })
+        attributes['price'].append(str(product.price))
+        attributes['weight'].append(str(product.weight) if product.weight is not None else None)
+        attributes['dimensions'].append(product.dimensions)
+        attributes['average_rating'].append(product.average_rating)
+        attributes['review_count'].append(product.review_count)
+        attributes['availability'].append(product.availability)
+        attributes['stock'].append(stock.available_quantity if stock else None)
+        attributes['active_offers'].append([
+            {
+                'id': offer.id,
+                'title': offer.title,
+                'offer_type': offer.offer_type,
+                'discount_percentage': (
+                    str(offer.discount_percentage) if offer.discount_percentage is not None else None
+                ),
+            }
+            for offer in product.active_offers
+        ])
+
+    return {
+        'products': columns,
+        'attributes': attributes,
+        'generated_at': now.isoformat(),
+    }
+
+
+def get_comparison_matrix(product_ids):
+    """Cached comparison matrix, keyed by sorted ids plus the newest update."""
+    key, timeout = comparison_cache_key(product_ids)
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = build_comparison_matrix(product_ids)
+        cache.set(key, matrix, timeout)
+    return matrix
@@ -0,0 +1,29 @@
+from django.db.models import F
+from rest_framework import filters
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter that also accepts the materialized ranking sorts.
+
+    ``?ordering=bestseller`` and ``?ordering=trending`` read the indexed
+    score columns of ``ProductRanking`` instead of aggregating orders, best
+    first; ``-bestseller`` reverses that. They mix with the regular fields,
+    e.g. ``?ordering=trending,-price``.
+    """
+    ordering_aliases = {
+        'bestseller': 'ranking__bestseller_score',
+        'trending': 'ranking__trending_score',
+    }
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        ordering = []
+        for term in fields:
+            column = self.ordering_aliases.get(term.lstrip('-'))
+            if column is None:
+                ordering.extend(super().remove_invalid_fields(queryset, [term], view, request))
+            elif term.startswith('-'):
+                # Products without a ranking row have sold nothing.
+                ordering.append(F(column).asc(nulls_first=True))
+            else:
+                ordering.append(F(column).desc(nulls_last=True))
+        return ordering
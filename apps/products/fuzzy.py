@@ -0,0 +1,208 @@
+"""
+Typo-tolerant product matching with an in-process trigram index.
+
+The index is word level: every distinct word of ``Product.name`` and
+``short_description`` is split into padded trigrams (as pg_trgm does) and an
+inverted index maps each trigram to the vocabulary words containing it.
+A misspelt query word is resolved to its most similar vocabulary words
+first; those words' posting lists then give the candidate products. The
+vocabulary is far smaller than the catalogue, which keeps lookups cheap.
+
+``product_search`` only consults it when exact matching comes back short.
+Each worker keeps its copy current like the autocomplete index (see
+``index_sync.py``).
+"""
+import heapq
+import logging
+import sys
+import threading
+from array import array
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .autocomplete import normalize
+from .index_sync import SyncedIndex
+
+logger = logging.getLogger(__name__)
+
+FUZZY_SIMILARITY_THRESHOLD = getattr(settings, 'SEARCH_FUZZY_SIMILARITY_THRESHOLD', 0.25)
+FUZZY_MIN_RESULTS = getattr(settings, 'SEARCH_FUZZY_MIN_RESULTS', 5)
+FUZZY_LIMIT = getattr(settings, 'SEARCH_FUZZY_LIMIT', 20)
+MIN_WORD_LENGTH = 3
+WORDS_PER_QUERY_WORD = 5
+FUZZY_MAX_CANDIDATES = 2000
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def words_of(*texts):
+    words = set()
+    for text in texts:
+        for word in normalize(text or '').split(' '):
+            word = ''.join(char for char in word if char.isalnum())
+            if len(word) >= MIN_WORD_LENGTH:
+                words.add(word)
+    return words
+
+
+class TrigramIndex:
+    def __init__(self):
+        self._words = []
+        self._word_ids = {}
+        self._trigram_counts = array('H')
+        self._trigrams = defaultdict(lambda: array('l'))
+        self._postings = []
+        self._product_words = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._product_words)
+
+    def _word_id(self, word):
+        word_id = self._word_ids.get(word)
+        if word_id is None:
+            word_id = self._word_ids[word] = len(self._words)
+            self._words.append(word)
+            grams = trigrams(word)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._trigrams[gram].append(word_id)
+            self._postings.append(set())
+        return word_id
+
+    def add(self, product_id, *texts):
+        with self._lock:
+            self._remove(product_id)
+            word_ids = tuple(self._word_id(word) for word in words_of(*texts))
+            for word_id in word_ids:
+                self._postings[word_id].add(product_id)
+            self._product_words[product_id] = word_ids
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        for word_id in self._product_words.pop(product_id, ()):
+            self._postings[word_id].discard(product_id)
+
+    def similar_words(self, word, limit=WORDS_PER_QUERY_WORD, threshold=FUZZY_SIMILARITY_THRESHOLD):
+        """``(word_id, similarity)`` of the closest vocabulary words (Jaccard on trigrams)."""
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            posting = self._trigrams.get(gram)
+            if posting:
+                shared.update(posting)
+        scored = (
+            (word_id, count / (len(grams) + self._trigram_counts[word_id] - count))
+            for word_id, count in shared.items()
+        )
+        return heapq.nlargest(
+            limit,
+            ((word_id, similarity) for word_id, similarity in scored
+             if similarity >= threshold and self._postings[word_id]),
+            key=lambda pair: pair[1],
+        )
+
+    def search(self, query, limit=FUZZY_LIMIT):
+        """Product ids ranked by summed best-word similarity to the query words.
+
+        Query words are resolved rarest first. Once there are candidates, a
+        word whose postings are larger than the candidate set only re-scores
+        the existing candidates instead of walking its postings.
+        """
+        with self._lock:
+            resolved = [similar for similar in map(self.similar_words, words_of(query)) if similar]
+            sized = sorted(
+                (sum(len(self._postings[word_id]) for word_id, _ in similar), similar)
+                for similar in resolved
+            )
+            scores = {}
+            for size, similar in sized:
+                if scores and size > len(scores):
+                    similarity_of = dict(similar)
+                    for product_id in scores:
+                        scores[product_id] += max(
+                            (similarity_of.get(word_id, 0) for word_id in self._product_words[product_id]),
+                            default=0,
+                        )
+                    continue
+                best = {}
+                # ``similar`` is ordered best first, so the first hit wins.
+                for word_id, similarity in similar:
+                    for product_id in islice(self._postings[word_id], FUZZY_MAX_CANDIDATES):
+                        best.setdefault(product_id, similarity)
+                for product_id, similarity in best.items():
+                    scores[product_id] = scores.get(product_id, 0) + similarity
+            return heapq.nlargest(limit, scores.items(), key=lambda pair: pair[1])
+
+    def memory_usage(self):
+        """Approximate bytes held by the postings, trigram and vocabulary structures."""
+        with self._lock:
+            size = sys.getsizeof(self._words) + sys.getsizeof(self._word_ids)
+            size += sum(sys.getsizeof(word) for word in self._words)
+            size += sys.getsizeof(self._trigrams) + sys.getsizeof(self._product_words)
+            for gram, posting in self._trigrams.items():
+                size += sys.getsizeof(gram) + posting.buffer_info()[1] * posting.itemsize + 64
+            size += sum(sys.getsizeof(posting) for posting in self._postings)
+            size += sum(sys.getsizeof(word_ids) for word_ids in self._product_words.values())
+            return size
+
+    def stats(self):
+        return {
+            'products': len(self._product_words),
+            'words': len(self._words),
+            'trigrams': len(self._trigrams),
+            'memory_bytes': self.memory_usage(),
+        }
+
+
+def build_trigram_index():
+    from .models import Product
+
+    index = TrigramIndex()
+    products = Product.objects.filter(is_active=True).values_list('id', 'name', 'short_description')
+    for product_id, name, short_description in products.iterator(chunk_size=5000):
+        index.add(product_id, name, short_description)
+    logger.info('Trigram index built: %(products)d products, %(words)d words, '
+                '%(memory_bytes)d bytes', index.stats())
+    return index
+
+
+def apply_trigram_changes(index, product_ids, category_ids):
+    """Reload the given products; those no longer active are dropped."""
+    from .models import Product
+
+    stale = set(product_ids)
+    if stale:
+        products = Product.objects.filter(id__in=stale, is_active=True).values_list(
+            'id', 'name', 'short_description'
+        )
+        for product_id, name, short_description in products:
+            index.add(product_id, name, short_description)
+            stale.discard(product_id)
+    for product_id in stale:
+        index.remove(product_id)
+
+
+_synced = SyncedIndex(build_trigram_index, apply_trigram_changes)
+
+
+def get_trigram_index():
+    """The worker's index, built from the database on first use and synced before each use."""
+    return _synced.get()
+
+
+def warm_trigram_index():
+    """Build the index at worker start; a missing schema just defers it."""
+    try:
+        get_trigram_index()
+    except DatabaseError:
+        logger.warning('Trigram index not built at start-up', exc_info=True)
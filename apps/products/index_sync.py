@@ -0,0 +1,137 @@
+"""
+Keeping every worker's in-process search indexes current.
+
+Each worker builds its own autocomplete and trigram index, so a change has
+to reach all of them, and only once it is committed. Model signals (and
+writers that bypass them) call ``publish_index_changes`` from
+``transaction.on_commit``: it claims the next free generation number in the
+``SEARCH_INDEX_CACHE_ALIAS`` cache, which every worker shares, by adding the
+changed product and category ids under it. Before serving, a
+``SyncedIndex`` reads the change sets after the generation it is at (at
+most every ``SEARCH_INDEX_CHECK_INTERVAL`` seconds) and reloads just the
+changed ids, or rebuilds when it has fallen too far behind or a full
+refresh was published with ``invalidate_search_indexes``.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+SEARCH_INDEX_CACHE_ALIAS = getattr(settings, 'SEARCH_INDEX_CACHE_ALIAS', 'default')
+SEARCH_INDEX_CHECK_INTERVAL = getattr(settings, 'SEARCH_INDEX_CHECK_INTERVAL', 1.0)
+# Workers further behind than either of these rebuild instead of replaying.
+CHANGE_SET_TIMEOUT = 3600
+MAX_CHANGE_SETS = 500
+# Change sets read past the published generation, which can lag behind.
+LOOKAHEAD = 20
+GENERATION_KEY = 'search_indexes:generation'
+FULL_REFRESH = 'full'
+
+_synced_indexes = []
+
+
+def _cache():
+    return caches[SEARCH_INDEX_CACHE_ALIAS]
+
+
+def current_generation():
+    """The highest generation known to be published (it can briefly lag behind)."""
+    return _cache().get(GENERATION_KEY, 0)
+
+
+def _change_set_key(generation):
+    return f'{GENERATION_KEY}:{generation}'
+
+
+def _publish(change_set):
+    cache = _cache()
+    # ``add`` is atomic on every backend (``incr`` is not on the database
+    # cache), so concurrent publishers each claim a different generation.
+    generation = current_generation() + 1
+    while not cache.add(_change_set_key(generation), change_set, CHANGE_SET_TIMEOUT):
+        generation += 1
+    # Only a hint: a slower publisher may set it back a step, and readers
+    # look past it for change sets already added.
+    cache.set(GENERATION_KEY, generation, None)
+    # The publishing worker sees its own change on its next request.
+    for synced in _synced_indexes:
+        synced.checked_at = 0.0
+
+
+def publish_index_changes(product_ids=(), category_ids=()):
+    """Tell every worker to reload ``product_ids`` and ``category_ids``."""
+    _publish({'products': sorted(set(product_ids)), 'categories': sorted(set(category_ids))})
+
+
+def invalidate_search_indexes():
+    """Tell every worker to rebuild its indexes."""
+    _publish(FULL_REFRESH)
+
+
+class SyncedIndex:
+    """One worker's copy of an index, brought up to the shared generation before use.
+
+    ``build()`` returns a new index; ``apply(index, product_ids, category_ids)``
+    reloads the given ids into it from the database.
+    """
+
+    def __init__(self, build, apply):
+        self.build = build
+        self.apply = apply
+        self.index = None
+        self.generation = 0
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+        _synced_indexes.append(self)
+
+    def get(self):
+        if self.index is None:
+            with self._lock:
+                if self.index is None:
+                    self._rebuild()
+        elif time.monotonic() - self.checked_at >= SEARCH_INDEX_CHECK_INTERVAL:
+            # One thread syncs; the others keep serving the current copy.
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._sync()
+                finally:
+                    self._lock.release()
+        return self.index
+
+    def _rebuild(self):
+        # Read first, so changes committed during the build are replayed after it.
+        generation = current_generation()
+        self.index = self.build()
+        self.generation = generation
+        self.checked_at = time.monotonic()
+
+    def _sync(self):
+        self.checked_at = time.monotonic()
+        latest = current_generation()
+        if latest - self.generation > MAX_CHANGE_SETS:
+            self._rebuild()
+            return
+        generations = range(self.generation, max(latest, self.generation) + LOOKAHEAD + 1)
+        change_sets = _cache().get_many([_change_set_key(generation) for generation in generations])
+        if latest < self.generation and self.generation and _change_set_key(self.generation) not in change_sets:
+            # The cache was cleared.
+            self._rebuild()
+            return
+        product_ids, category_ids = set(), set()
+        generation = self.generation
+        while _change_set_key(generation + 1) in change_sets:
+            generation += 1
+            change_set = change_sets[_change_set_key(generation)]
+            if change_set == FULL_REFRESH:
+                self._rebuild()
+                return
+            product_ids.update(change_set['products'])
+            category_ids.update(change_set['categories'])
+        if generation < latest:
+            # Published but gone: expired before this worker caught up.
+            self._rebuild()
+            return
+        if generation > self.generation:
+            self.apply(self.index, product_ids, category_ids)
+            self.generation = generation
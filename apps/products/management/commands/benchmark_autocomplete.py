@@ -0,0 +1,70 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.products.autocomplete import PrefixIndex, category_entry, product_entry
+
+WORDS = (
+    'organic', 'raw', 'wild', 'fresh', 'dried', 'roasted', 'sprouted', 'cold', 'pressed',
+    'quinoa', 'kombucha', 'almond', 'cashew', 'oat', 'rice', 'lentil', 'chia', 'flax',
+    'honey', 'ghee', 'tea', 'coffee', 'spinach', 'kale', 'apple', 'mango', 'banana',
+    'coconut', 'turmeric', 'ginger', 'cinnamon', 'milk', 'butter', 'flour', 'granola',
+)
+
+
+class Command(BaseCommand):
+    help = 'Measure autocomplete lookup latency and memory on a synthetic catalogue (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--categories', type=int, default=200)
+        parser.add_argument('--lookups', type=int, default=20_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        entries = [
+            product_entry(
+                product_id, ' '.join(rng.choices(WORDS, k=rng.randint(2, 5))),
+                f'SKU-{product_id:07d}', rng.random() < 0.02, rng.expovariate(0.1),
+            )
+            for product_id in range(1, options['products'] + 1)
+        ]
+        entries += [
+            category_entry(category_id, ' '.join(rng.choices(WORDS, k=2)), rng.randint(0, 500))
+            for category_id in range(1, options['categories'] + 1)
+        ]
+
+        index = PrefixIndex()
+        started = time.perf_counter()
+        index.build(entries)
+        build_time = time.perf_counter() - started
+
+        prefixes = []
+        for _ in range(options['lookups']):
+            word = rng.choice(WORDS) if rng.random() < 0.9 else f'sku-{rng.randint(1, options["products"]):07d}'
+            prefixes.append(word[:rng.randint(1, len(word))])
+
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            index.search(prefix)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+
+        # Incremental maintenance, as driven by the model signals.
+        started = time.perf_counter()
+        for product_id in range(1, 1001):
+            index.add(*product_entry(product_id, 'organic kombucha ginger', f'SKU-{product_id:07d}', False, 1))
+        update_time = (time.perf_counter() - started) / 1000
+
+        stats = index.stats()
+        self.stdout.write(
+            f"{stats['entries']} entries, {stats['terms']} terms, built in {build_time:.2f}s\n"
+            f"  memory:  {stats['memory_bytes'] / 2 ** 20:.1f} MiB\n"
+            f"  lookup:  p50 {statistics.median(timings) * 1e6:.0f}us, "
+            f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f}us, max {timings[-1] * 1e6:.0f}us\n"
+            f"  update:  {update_time * 1e6:.0f}us per product"
+        )
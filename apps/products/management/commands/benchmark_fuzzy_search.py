@@ -0,0 +1,73 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.products.fuzzy import TrigramIndex
+
+CATALOGUE_WORDS = (
+    'organic', 'raw', 'wild', 'fresh', 'dried', 'roasted', 'sprouted', 'pressed', 'quinoa',
+    'kombucha', 'almond', 'cashew', 'oats', 'basmati', 'lentils', 'chia', 'flaxseed', 'honey',
+    'ghee', 'matcha', 'coffee', 'spinach', 'kale', 'apple', 'mango', 'banana', 'coconut',
+    'turmeric', 'ginger', 'cinnamon', 'milk', 'butter', 'flour', 'granola', 'avocado',
+    'blueberry', 'cacao', 'hummus', 'tahini', 'sourdough', 'yogurt', 'vinegar', 'jaggery',
+)
+
+# (misspelling, intended word)
+MISSPELLINGS = (
+    ('quiona', 'quinoa'), ('qinoa', 'quinoa'), ('keenwa', 'quinoa'), ('quinao', 'quinoa'),
+    ('kombusha', 'kombucha'), ('kambucha', 'kombucha'), ('komboocha', 'kombucha'),
+    ('almnd', 'almond'), ('cashu', 'cashew'), ('tumeric', 'turmeric'), ('termeric', 'turmeric'),
+    ('ginjer', 'ginger'), ('cinamon', 'cinnamon'), ('cinnammon', 'cinnamon'), ('granolla', 'granola'),
+    ('spinnach', 'spinach'), ('coconot', 'coconut'), ('avacado', 'avocado'), ('bluberry', 'blueberry'),
+    ('humus', 'hummus'), ('tahinni', 'tahini'), ('sourdoe', 'sourdough'), ('yoghurt', 'yogurt'),
+    ('vinager', 'vinegar'), ('flaxseeds', 'flaxseed'), ('lentills', 'lentils'), ('basmatti', 'basmati'),
+    ('macha', 'matcha'), ('cacoa', 'cacao'), ('jagery', 'jaggery'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Measure fuzzy search latency and recall on a synthetic catalogue with a misspelling corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--vocabulary', type=int, default=20_000, help='Extra brand/descriptor words')
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        syllables = ['ka', 'lo', 'mi', 'ra', 'ven', 'to', 'sha', 'dri', 'nu', 'pel', 'qua', 'zor']
+        extra = [''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(options['vocabulary'])]
+
+        index = TrigramIndex()
+        names = {}
+        started = time.perf_counter()
+        for product_id in range(1, options['products'] + 1):
+            name = ' '.join(rng.choices(CATALOGUE_WORDS, k=2) + [rng.choice(extra)])
+            description = ' '.join(rng.choices(CATALOGUE_WORDS + tuple(extra[:2000]), k=8))
+            names[product_id] = (name, description)
+            index.add(product_id, name, description)
+        build_time = time.perf_counter() - started
+
+        timings = []
+        hits = 0
+        for _ in range(options['rounds']):
+            for misspelt, intended in MISSPELLINGS:
+                query = f'{misspelt} {rng.choice(CATALOGUE_WORDS)}' if rng.random() < 0.3 else misspelt
+                started = time.perf_counter()
+                ranked = index.search(query)
+                timings.append(time.perf_counter() - started)
+                if ranked and intended in ' '.join(names[ranked[0][0]]):
+                    hits += 1
+        timings.sort()
+
+        stats = index.stats()
+        self.stdout.write(
+            f"{stats['products']} products, {stats['words']} words, {stats['trigrams']} trigrams, "
+            f"built in {build_time:.1f}s, {stats['memory_bytes'] / 2 ** 20:.1f} MiB\n"
+            f"  {len(timings)} misspelt queries: p50 {statistics.median(timings) * 1000:.2f}ms, "
+            f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f}ms, max {timings[-1] * 1000:.2f}ms\n"
+            f"  top hit contains the intended word: {hits / len(timings):.1%}"
+        )
@@ -0,0 +1,58 @@
+import random
+import resource
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+
+from apps.products.recommendations import count_co_occurrences, freeze_pairs, score_pairs
+
+
+class Command(BaseCommand):
+    help = 'Time the co-occurrence build and scoring on a synthetic order stream (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--order-items', type=int, default=1_000_000)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--basket-size', type=int, default=4, help='Average lines per order')
+        parser.add_argument('--metric', choices=['lift', 'cosine'], default='lift')
+        parser.add_argument('--top-k', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def synthetic_rows(self, order_items, products, basket_size, rng):
+        # Skewed popularity so that the matrix looks like a real catalogue.
+        cum_weights = list(accumulate(1 / (rank + 1) for rank in range(products)))
+        catalogue = list(range(1, products + 1))
+        order_id = 0
+        emitted = 0
+        while emitted < order_items:
+            order_id += 1
+            size = min(max(1, int(rng.expovariate(1 / basket_size))), order_items - emitted)
+            for product_id in rng.choices(catalogue, cum_weights=cum_weights, k=size):
+                yield order_id, product_id
+            emitted += size
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows = list(self.synthetic_rows(
+            options['order_items'], options['products'], options['basket_size'], rng
+        ))
+
+        started = time.perf_counter()
+        order_count, _, pairs = count_co_occurrences(iter(rows))
+        counted = time.perf_counter()
+        keys, counts = freeze_pairs(pairs)
+        del pairs
+        neighbours = score_pairs(
+            keys, counts, order_count, metric=options['metric'], top_k=options['top_k'], min_orders=1
+        )
+        finished = time.perf_counter()
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        self.stdout.write(
+            f"{len(rows)} order items in {order_count} orders, {len(keys)} non-zero cells\n"
+            f"  count:  {counted - started:.2f}s ({len(rows) / (counted - started):,.0f} items/s)\n"
+            f"  score:  {finished - counted:.2f}s for {len(neighbours)} products\n"
+            f"  matrix: {(keys.itemsize + counts.itemsize) * len(keys) / 2 ** 20:.1f} MiB frozen, "
+            f"peak RSS {peak_rss / 1024:.0f} MiB"
+        )
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.products.rankings import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = 'Roll new order items and wishlist adds into the bestseller/trending rankings (run every minute)'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = refresh_rankings()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {result['rows']} new rows, ranked {result['products']} products in {elapsed * 1000:.0f}ms"
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.products.recommendations import (
+    RECOMMENDATION_METRIC, RECOMMENDATION_TOP_K, update_recommendations
+)
+
+
+class Command(BaseCommand):
+    help = 'Fold new orders into the co-occurrence matrix and refresh "frequently bought together" lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild from all orders instead of new ones')
+        parser.add_argument('--metric', choices=['lift', 'cosine'], default=RECOMMENDATION_METRIC)
+        parser.add_argument('--top-k', type=int, default=RECOMMENDATION_TOP_K)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = update_recommendations(
+            full=options['full'], metric=options['metric'],
+            top_k=options['top_k'], chunk_size=options['chunk_size'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {result['orders']} orders, {result['pairs']} pairs, "
+            f"refreshed {result['products']} products in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_24h', models.PositiveIntegerField(default=0)),
+                ('sales_7d', models.PositiveIntegerField(default=0)),
+                ('sales_30d', models.PositiveIntegerField(default=0)),
+                ('wishlist_7d', models.PositiveIntegerField(default=0)),
+                ('wishlist_30d', models.PositiveIntegerField(default=0)),
+                ('bestseller_score', models.FloatField(default=0)),
+                ('trending_score', models.FloatField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ranking', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-bestseller_score'], name='ranking_bestseller_idx'), models.Index(fields=['-trending_score'], name='ranking_trending_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductActivityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+                ('wishlist_adds', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_buckets', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='products_pr_hour_0344b8_idx')],
+                'unique_together': {('product', 'hour')},
+            },
+        ),
+    ]
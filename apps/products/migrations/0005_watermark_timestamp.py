@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_rating_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobwatermark',
+            name='last_timestamp',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
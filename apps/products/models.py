@@ -53,14 +53,13 @@ class Product(models.Model):
 
     @property
     def average_rating(self):
-        reviews = self.reviews.all()
-        if reviews:
-            return sum([review.rating for review in reviews]) / len(reviews)
-        return 0
+        summary = getattr(self, 'rating_summary', None)
+        return summary.average_rating if summary else 0
 
     @property
     def review_count(self):
-        return self.reviews.count()
+        summary = getattr(self, 'rating_summary', None)
+        return summary.review_count if summary else 0
 
     @property
     def is_in_stock(self):
@@ -81,6 +80,11 @@ class ProductImage(models.Model):
         return f"Image for {self.product.name}"
 
 
+def primary_images_prefetch(lookup='images'):
+    """Prefetch of the primary images along ``lookup`` into ``Product.primary_images``."""
+    return models.Prefetch(lookup, queryset=ProductImage.objects.filter(is_primary=True), to_attr='primary_images')
+
+
 class Stock(models.Model):
     product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='stock')
     quantity = models.PositiveIntegerField(default=0)
@@ -115,11 +119,47 @@ class ProductReview(models.Model):
 
     class Meta:
         unique_together = ('product', 'customer')
+        indexes = [
+            models.Index(fields=['product', 'is_approved', '-created_at', '-id'], name='review_newest_idx'),
+            models.Index(fields=['product', 'is_approved', '-rating', '-created_at', '-id'],
+                         name='review_highest_idx'),
+            models.Index(fields=['product', 'is_approved', '-is_verified_purchase', '-created_at', '-id'],
+                         name='review_verified_idx'),
+        ]
 
     def __str__(self):
         return f"Review by {self.customer.username} for {self.product.name}"
 
 
+class ProductRatingSummary(models.Model):
+    """Approved review count and star histogram of a product, kept by ``reviews.py``."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='rating_summary')
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Product rating summaries"
+
+    def __str__(self):
+        return f"Ratings for {self.product_id}: {self.average_rating} ({self.review_count})"
+
+    @property
+    def average_rating(self):
+        if self.review_count:
+            return round(self.rating_sum / self.review_count, 2)
+        return 0
+
+    @property
+    def histogram(self):
+        return {str(stars): getattr(self, f'rating_{stars}') for stars in range(1, 6)}
+
+
 class Wishlist(models.Model):
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='wishlist_items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='wishlisted_by')
@@ -193,6 +233,87 @@ class PromotionalOffer(models.Model):
     is_active = models.BooleanField(default=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
+
+class JobWatermark(models.Model):
+    """Position reached by an incremental batch job (last processed row id or change time)."""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+
+class ProductCoOccurrence(models.Model):
+    """Number of orders containing both products (product_a <= product_b).
+
+    The diagonal (product_a == product_b) holds the number of orders that
+    contain the product at all, which is what lift/cosine are normalised by.
+    """
+    product_a = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    product_b = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('product_a', 'product_b')
+
+    def __str__(self):
+        return f"{self.product_a_id} x {self.product_b_id}: {self.order_count}"
+
+
+class ProductRecommendation(models.Model):
+    """Top-K "frequently bought together" neighbours of a product."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    order_count = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        unique_together = ('product', 'rank')
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_product_id} ({self.score:.3f})"
+
+
+class ProductActivityBucket(models.Model):
+    """Units sold and wishlist adds of a product within one hour."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='activity_buckets')
+    hour = models.DateTimeField()
+    units_sold = models.PositiveIntegerField(default=0)
+    wishlist_adds = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('product', 'hour')
+        indexes = [models.Index(fields=['hour'])]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.hour:%Y-%m-%d %H:00}"
+
+
+class ProductRanking(models.Model):
+    """Rolling sales/wishlist counters backing the bestseller and trending sorts."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='ranking')
+    sales_24h = models.PositiveIntegerField(default=0)
+    sales_7d = models.PositiveIntegerField(default=0)
+    sales_30d = models.PositiveIntegerField(default=0)
+    wishlist_7d = models.PositiveIntegerField(default=0)
+    wishlist_30d = models.PositiveIntegerField(default=0)
+    bestseller_score = models.FloatField(default=0)
+    trending_score = models.FloatField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-bestseller_score'], name='ranking_bestseller_idx'),
+            models.Index(fields=['-trending_score'], name='ranking_trending_idx'),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f"Ranking for {self.product_id}"
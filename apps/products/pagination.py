@@ -0,0 +1,116 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework import exceptions
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over a fixed set of named sort orders.
+
+    The cursor carries the sort key of the last row served, so every page is
+    an index range scan (``WHERE key < last``) rather than an ``OFFSET`` that
+    grows with the page number. Each ordering must end in a unique field.
+    """
+    orderings = {}
+    default_ordering = None
+    page_size = 20
+    max_page_size = 100
+    sort_query_param = 'sort'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.sort = request.query_params.get(self.sort_query_param, self.default_ordering)
+        if self.sort not in self.orderings:
+            raise exceptions.ValidationError(
+                {self.sort_query_param: f"Choose from: {', '.join(self.orderings)}"}
+            )
+        ordering = self.orderings[self.sort]
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*ordering)
+        position = self.decode_cursor(request, queryset.model, ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = (
+            [getattr(rows[-1], field.lstrip('-')) for field in ordering] if self.has_next else None
+        )
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    @staticmethod
+    def seek_filter(ordering, position):
+        """Rows strictly after ``position`` in ``ordering`` (a row-value comparison)."""
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[i]})
+            for previous, value in zip(ordering[:i], position[:i]):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        return condition
+
+    def encode_cursor(self, position):
+        # DjangoJSONEncoder would cut datetimes to milliseconds, and the seek
+        # filter would then skip rows later in the same millisecond.
+        position = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in position]
+        payload = json.dumps(position, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request, model, ordering):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if len(position) != len(ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, position)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise exceptions.NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.sort_query_param, self.sort)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'sort': self.sort,
+            'results': data,
+        })
+
+
+class ReviewPagination(KeysetPagination):
+    orderings = {
+        'newest': ('-created_at', '-id'),
+        'highest': ('-rating', '-created_at', '-id'),
+        'verified': ('-is_verified_purchase', '-created_at', '-id'),
+    }
+    default_ordering = 'newest'
@@ -0,0 +1,162 @@
+"""
+Materialized bestseller and trending rankings.
+
+New ``OrderItem`` and ``Wishlist`` rows (found via per-source watermarks) are
+folded into hourly ``ProductActivityBucket`` rows. Rolling 24h/7d/30d
+counters are then re-summed from the buckets of the last 30 days only and
+written to ``ProductRanking``, whose score columns are indexed so the
+``bestseller``/``trending`` sorts never aggregate orders per request.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum, Value
+from django.utils import timezone
+
+from .index_sync import publish_index_changes
+from .models import JobWatermark, ProductActivityBucket, ProductRanking, Wishlist
+
+ORDER_ITEMS_WATERMARK = 'rankings.order_items'
+WISHLIST_WATERMARK = 'rankings.wishlist'
+
+# trending = sales in the last day weighted above the weekly baseline, with
+# wishlist adds as a weaker signal of intent.
+TRENDING_SALES_24H_WEIGHT = getattr(settings, 'TRENDING_SALES_24H_WEIGHT', 3.0)
+TRENDING_SALES_7D_WEIGHT = getattr(settings, 'TRENDING_SALES_7D_WEIGHT', 1.0)
+TRENDING_WISHLIST_7D_WEIGHT = getattr(settings, 'TRENDING_WISHLIST_7D_WEIGHT', 0.5)
+EXCLUDED_ORDER_STATUSES = ('cancelled', 'refunded')
+
+DB_BATCH_SIZE = 500
+
+
+def truncate_to_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _collect_activity(deltas, watermark, rows, field):
+    count = 0
+    for row_id, product_id, amount, created_at in rows:
+        deltas[(product_id, truncate_to_hour(created_at))][field] += amount
+        watermark.last_id = row_id
+        count += 1
+    return count
+
+
+def _merge_buckets(deltas):
+    hours = {hour for _, hour in deltas}
+    existing = {
+        (product_id, hour): bucket_id
+        for bucket_id, product_id, hour in ProductActivityBucket.objects.filter(hour__in=hours)
+        .values_list('id', 'product_id', 'hour')
+        if (product_id, hour) in deltas
+    }
+    to_update = []
+    to_create = []
+    for (product_id, hour), delta in deltas.items():
+        if (product_id, hour) in existing:
+            to_update.append(ProductActivityBucket(
+                id=existing[(product_id, hour)],
+                units_sold=F('units_sold') + delta['units_sold'],
+                wishlist_adds=F('wishlist_adds') + delta['wishlist_adds'],
+            ))
+        else:
+            to_create.append(ProductActivityBucket(
+                product_id=product_id, hour=hour,
+                units_sold=delta['units_sold'], wishlist_adds=delta['wishlist_adds'],
+            ))
+    ProductActivityBucket.objects.bulk_update(
+        to_update, ['units_sold', 'wishlist_adds'], batch_size=DB_BATCH_SIZE
+    )
+    ProductActivityBucket.objects.bulk_create(to_create, batch_size=DB_BATCH_SIZE)
+
+
+def refresh_rankings(now=None):
+    """Roll new activity into the buckets and rewrite the ranking counters.
+
+    Returns the number of new source rows and of products ranked.
+    """
+    from apps.orders.models import OrderItem
+
+    now = now or timezone.now()
+    current_hour = truncate_to_hour(now)
+    since_24h = current_hour - timedelta(hours=23)
+    since_7d = current_hour - timedelta(days=7) + timedelta(hours=1)
+    since_30d = current_hour - timedelta(days=30) + timedelta(hours=1)
+
+    with transaction.atomic():
+        sales_mark, _ = JobWatermark.objects.select_for_update().get_or_create(name=ORDER_ITEMS_WATERMARK)
+        wishlist_mark, _ = JobWatermark.objects.select_for_update().get_or_create(name=WISHLIST_WATERMARK)
+
+        deltas = defaultdict(lambda: {'units_sold': 0, 'wishlist_adds': 0})
+        new_rows = _collect_activity(
+            deltas, sales_mark,
+            OrderItem.objects.filter(id__gt=sales_mark.last_id)
+            .exclude(order__status__in=EXCLUDED_ORDER_STATUSES)
+            .order_by('id')
+            .values_list('id', 'product_id', 'quantity', 'order__created_at')
+            .iterator(),
+            'units_sold',
+        )
+        new_rows += _collect_activity(
+            deltas, wishlist_mark,
+            Wishlist.objects.filter(id__gt=wishlist_mark.last_id)
+            .order_by('id')
+            .values_list('id', 'product_id', Value(1), 'created_at')
+            .iterator(),
+            'wishlist_adds',
+        )
+        _merge_buckets({key: delta for key, delta in deltas.items() if key[1] >= since_30d})
+        sales_mark.save()
+        wishlist_mark.save()
+
+        expired = ProductActivityBucket.objects.filter(hour__lt=since_30d)
+        # Autocomplete weighs products by their 30-day counters, which only
+        # move with new activity and with buckets ageing out.
+        changed = {product_id for product_id, _ in deltas}
+        changed.update(expired.values_list('product_id', flat=True))
+        expired.delete()
+
+        windows = ProductActivityBucket.objects.values('product_id').annotate(
+            sales_24h=Sum('units_sold', filter=Q(hour__gte=since_24h), default=0),
+            sales_7d=Sum('units_sold', filter=Q(hour__gte=since_7d), default=0),
+            sales_30d=Sum('units_sold', default=0),
+            wishlist_7d=Sum('wishlist_adds', filter=Q(hour__gte=since_7d), default=0),
+            wishlist_30d=Sum('wishlist_adds', default=0),
+        )
+        rankings = [
+            ProductRanking(
+                product_id=row['product_id'],
+                sales_24h=row['sales_24h'],
+                sales_7d=row['sales_7d'],
+                sales_30d=row['sales_30d'],
+                wishlist_7d=row['wishlist_7d'],
+                wishlist_30d=row['wishlist_30d'],
+                bestseller_score=row['sales_30d'],
+                trending_score=(
+                    TRENDING_SALES_24H_WEIGHT * row['sales_24h']
+                    + TRENDING_SALES_7D_WEIGHT * row['sales_7d']
+                    + TRENDING_WISHLIST_7D_WEIGHT * row['wishlist_7d']
+                ),
+                refreshed_at=now,
+            )
+            for row in windows
+        ]
+        ProductRanking.objects.bulk_create(
+            rankings, batch_size=DB_BATCH_SIZE, update_conflicts=True, unique_fields=['product'],
+            update_fields=[
+                'sales_24h', 'sales_7d', 'sales_30d', 'wishlist_7d', 'wishlist_30d',
+                'bestseller_score', 'trending_score', 'refreshed_at',
+            ],
+        )
+        # Products whose activity aged out of every window.
+        ProductRanking.objects.filter(refreshed_at__lt=now).exclude(sales_30d=0, wishlist_30d=0).update(
+            sales_24h=0, sales_7d=0, sales_30d=0, wishlist_7d=0, wishlist_30d=0,
+            bestseller_score=0, trending_score=0, refreshed_at=now,
+        )
+        if changed:
+            transaction.on_commit(partial(publish_index_changes, product_ids=changed))
+
+    return {'rows': new_rows, 'products': len(rankings)}
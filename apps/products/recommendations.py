@@ -0,0 +1,242 @@
+"""
+"Frequently bought together" recommendations from order co-occurrence.
+
+Order lines are streamed grouped by order and folded into a sparse product x
+product co-occurrence matrix. Pairs are keyed by a single packed integer
+(``a << 32 | b`` with ``a <= b``) so the matrix is a flat counter rather than
+a dict of dicts, and is frozen into ``array`` columns before scoring.
+"""
+import heapq
+import math
+from array import array
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import JobWatermark, ProductCoOccurrence, ProductRecommendation
+
+WATERMARK_NAME = 'recommendations'
+PAIR_SHIFT = 32
+PAIR_MASK = (1 << PAIR_SHIFT) - 1
+
+RECOMMENDATION_TOP_K = getattr(settings, 'RECOMMENDATION_TOP_K', 10)
+RECOMMENDATION_METRIC = getattr(settings, 'RECOMMENDATION_METRIC', 'lift')
+RECOMMENDATION_MIN_ORDERS = getattr(settings, 'RECOMMENDATION_MIN_ORDERS', 2)
+# Very large baskets add quadratically many weak pairs; only the first
+# products of such orders are counted.
+RECOMMENDATION_MAX_BASKET = getattr(settings, 'RECOMMENDATION_MAX_BASKET', 50)
+EXCLUDED_ORDER_STATUSES = ('cancelled', 'refunded')
+
+DB_BATCH_SIZE = 500
+
+
+def pack_pair(a, b):
+    return a << PAIR_SHIFT | b
+
+
+def unpack_pair(key):
+    return key >> PAIR_SHIFT, key & PAIR_MASK
+
+
+def count_co_occurrences(rows, max_basket=RECOMMENDATION_MAX_BASKET):
+    """Fold ``(order_id, product_id)`` rows, sorted by order, into pair counts.
+
+    Returns ``(order_count, last_order_id, pairs)`` where ``pairs`` maps a
+    packed pair to the number of orders containing both products. The
+    diagonal holds per-product order counts.
+    """
+    pairs = Counter()
+    order_count = 0
+    last_order_id = None
+    for order_id, lines in groupby(rows, key=itemgetter(0)):
+        basket = sorted({product_id for _, product_id in lines})[:max_basket]
+        order_count += 1
+        last_order_id = order_id
+        pairs.update([a << PAIR_SHIFT | a for a in basket])
+        pairs.update([a << PAIR_SHIFT | b for a, b in combinations(basket, 2)])
+    return order_count, last_order_id, pairs
+
+
+def freeze_pairs(pairs):
+    """Sorted ``array`` columns (keys, counts) of a pair counter."""
+    keys = array('Q', sorted(pairs))
+    counts = array('L', (pairs[key] for key in keys))
+    return keys, counts
+
+
+def score_pairs(keys, counts, total_orders, metric=RECOMMENDATION_METRIC,
+                top_k=RECOMMENDATION_TOP_K, min_orders=RECOMMENDATION_MIN_ORDERS, products=None):
+    """Top-K neighbours per product as ``{product_id: [(neighbour, score, count)]}``.
+
+    ``keys``/``counts`` must contain the diagonal of every product that
+    appears in an off-diagonal pair. When ``products`` is given only their
+    neighbour lists are built.
+    """
+    support = {}
+    for key, count in zip(keys, counts):
+        a, b = unpack_pair(key)
+        if a == b:
+            support[a] = count
+
+    neighbours = defaultdict(list)
+    for key, count in zip(keys, counts):
+        a, b = unpack_pair(key)
+        if a == b or count < min_orders:
+            continue
+        denominator = support[a] * support[b]
+        if metric == 'cosine':
+            score = count / math.sqrt(denominator)
+        else:
+            score = count * total_orders / denominator
+        if products is None or a in products:
+            neighbours[a].append((b, score, count))
+        if products is None or b in products:
+            neighbours[b].append((a, score, count))
+
+    return {
+        product_id: heapq.nlargest(top_k, candidates, key=itemgetter(1))
+        for product_id, candidates in neighbours.items()
+    }
+
+
+def _chunks(values, size=DB_BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _merge_pairs(pairs):
+    """Add batch pair counts onto the stored co-occurrence matrix."""
+    existing = {}
+    products_a = {unpack_pair(key)[0] for key in pairs}
+    for chunk in _chunks(products_a):
+        rows = ProductCoOccurrence.objects.filter(product_a_id__in=chunk).values_list(
+            'id', 'product_a_id', 'product_b_id'
+        )
+        for row_id, a, b in rows.iterator():
+            key = pack_pair(a, b)
+            if key in pairs:
+                existing[key] = row_id
+
+    to_update = []
+    to_create = []
+    for key, count in pairs.items():
+        a, b = unpack_pair(key)
+        if key in existing:
+            to_update.append(ProductCoOccurrence(id=existing[key], order_count=F('order_count') + count))
+        else:
+            to_create.append(ProductCoOccurrence(product_a_id=a, product_b_id=b, order_count=count))
+    ProductCoOccurrence.objects.bulk_update(to_update, ['order_count'], batch_size=DB_BATCH_SIZE)
+    ProductCoOccurrence.objects.bulk_create(to_create, batch_size=DB_BATCH_SIZE)
+
+
+def _load_pairs(product_ids):
+    """Stored pairs touching ``product_ids`` plus every diagonal entry."""
+    pairs = Counter()
+    diagonal = ProductCoOccurrence.objects.filter(product_a=F('product_b')).values_list(
+        'product_a_id', 'order_count'
+    )
+    for product_id, count in diagonal.iterator():
+        pairs[pack_pair(product_id, product_id)] = count
+    for chunk in _chunks(product_ids):
+        for field in ('product_a_id__in', 'product_b_id__in'):
+            rows = ProductCoOccurrence.objects.filter(**{field: chunk}).values_list(
+                'product_a_id', 'product_b_id', 'order_count'
+            )
+            for a, b, count in rows.iterator():
+                pairs[pack_pair(a, b)] = count
+    return pairs
+
+
+def _order_item_rows(after_order_id, chunk_size):
+    from apps.orders.models import OrderItem
+
+    return (
+        OrderItem.objects.filter(order_id__gt=after_order_id)
+        .exclude(order__status__in=EXCLUDED_ORDER_STATUSES)
+        .order_by('order_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _total_orders(up_to_order_id):
+    from apps.orders.models import Order
+
+    return Order.objects.filter(id__lte=up_to_order_id).exclude(
+        status__in=EXCLUDED_ORDER_STATUSES
+    ).count()
+
+
+def update_recommendations(full=False, metric=RECOMMENDATION_METRIC, top_k=RECOMMENDATION_TOP_K,
+                           chunk_size=2000):
+    """Fold orders placed since the last run into the matrix and refresh top-K.
+
+    Only products that appear in the new orders get their neighbour lists
+    rebuilt; ``full=True`` rebuilds the matrix and every list from scratch.
+    Returns a dict of counters describing the run.
+    """
+    with transaction.atomic():
+        watermark, _ = JobWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        if full:
+            ProductCoOccurrence.objects.all().delete()
+            ProductRecommendation.objects.all().delete()
+            watermark.last_id = 0
+
+        order_count, last_order_id, batch = count_co_occurrences(
+            _order_item_rows(watermark.last_id, chunk_size)
+        )
+        if not order_count:
+            return {'orders': 0, 'pairs': 0, 'products': 0}
+
+        _merge_pairs(batch)
+        touched = set()
+        for key in batch:
+            a, b = unpack_pair(key)
+            if a == b:
+                touched.add(a)
+        keys, counts = freeze_pairs(_load_pairs(touched))
+        neighbours = score_pairs(
+            keys, counts, _total_orders(last_order_id), metric=metric, top_k=top_k, products=touched
+        )
+
+        for chunk in _chunks(touched):
+            ProductRecommendation.objects.filter(product_id__in=chunk).delete()
+        ProductRecommendation.objects.bulk_create(
+            [
+                ProductRecommendation(
+                    product_id=product_id, recommended_product_id=neighbour,
+                    rank=rank, score=score, order_count=count,
+                )
+                for product_id, candidates in neighbours.items()
+                for rank, (neighbour, score, count) in enumerate(candidates, start=1)
+            ],
+            batch_size=DB_BATCH_SIZE,
+        )
+
+        watermark.last_id = last_order_id
+        watermark.save()
+
+    return {'orders': order_count, 'pairs': len(batch), 'products': len(touched)}
+
+
+def recommendations_for(product_ids, limit=RECOMMENDATION_TOP_K):
+    """Merged recommendations for a product or a cart, in one indexed lookup."""
+    product_ids = set(product_ids)
+    rows = ProductRecommendation.objects.filter(
+        product_id__in=product_ids, recommended_product__is_active=True
+    ).values_list(
+        'recommended_product_id', 'recommended_product__name',
+        'recommended_product__price', 'score',
+    )
+    merged = {}
+    for product_id, name, price, score in rows:
+        if product_id in product_ids:
+            continue
+        entry = merged.setdefault(product_id, {'id': product_id, 'name': name, 'price': str(price), 'score': 0})
+        entry['score'] += score
+    return heapq.nlargest(limit, merged.values(), key=itemgetter('score'))
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import ProductRatingSummary, ProductReview
+
+SUMMARY_BATCH_SIZE = 500
+MODERATION_BATCH_SIZE = 500
+SUMMARY_FIELDS = ['review_count', 'rating_sum'] + [f'rating_{stars}' for stars in range(1, 6)]
+
+
+def refresh_rating_summaries(product_ids):
+    """Recompute the rating summaries of ``product_ids`` from approved reviews.
+
+    One grouped aggregate and one upsert per batch of products, however many
+    reviews changed.
+    """
+    product_ids = sorted(set(product_ids))
+    for start in range(0, len(product_ids), SUMMARY_BATCH_SIZE):
+        batch = product_ids[start:start + SUMMARY_BATCH_SIZE]
+        summaries = {product_id: ProductRatingSummary(product_id=product_id) for product_id in batch}
+        rows = ProductReview.objects.filter(product_id__in=batch, is_approved=True).values(
+            'product_id'
+        ).annotate(
+            review_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'rating_{stars}': Count('id', filter=Q(rating=stars)) for stars in range(1, 6)}
+        )
+        for row in rows:
+            summary = summaries[row.pop('product_id')]
+            for field, value in row.items():
+                setattr(summary, field, value)
+        ProductRatingSummary.objects.bulk_create(
+            summaries.values(), update_conflicts=True, unique_fields=['product'],
+            update_fields=SUMMARY_FIELDS + ['updated_at'],
+        )
+
+
+def moderate_reviews(reviews, approve, review_ids=None):
+    """Approve or reject every review in ``reviews`` (optionally narrowed to ids).
+
+    Rows already in the requested state are left alone; the rest change in a
+    single UPDATE per id batch, and each affected product's summary is then
+    recomputed once. Returns the counts of reviews and products touched.
+    """
+    reviews = reviews.exclude(is_approved=approve)
+    if review_ids is None:
+        batches = [reviews]
+    else:
+        review_ids = sorted(set(review_ids))
+        batches = [
+            reviews.filter(id__in=review_ids[start:start + MODERATION_BATCH_SIZE])
+            for start in range(0, len(review_ids), MODERATION_BATCH_SIZE)
+        ]
+
+    updated = 0
+    product_ids = set()
+    with transaction.atomic():
+        now = timezone.now()
+        for batch in batches:
+            product_ids.update(batch.order_by().values_list('product_id', flat=True).distinct())
+            updated += batch.update(is_approved=approve, updated_at=now)
+        refresh_rating_summaries(product_ids)
+    return {'updated': updated, 'products': len(product_ids)}
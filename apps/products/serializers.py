@@ -1,11 +1,16 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import (
     Category, Product, ProductImage, Stock, ProductReview, 
-    Wishlist, Coupon, PromotionalOffer
+    Wishlist, ProductComparison, Coupon, PromotionalOffer
 )
+from .comparison import COMPARISON_MAX_ITEMS
+from apps.common.serializers import DynamicFieldsMixin
 
+TOP_REVIEWS_LIMIT = getattr(settings, 'PRODUCT_TOP_REVIEWS_LIMIT', 3)
 
-class CategorySerializer(serializers.ModelSerializer):
+
+class CategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     subcategories = serializers.SerializerMethodField()
 
     class Meta:
@@ -18,19 +23,19 @@ class CategorySerializer(serializers.ModelSerializer):
         return []
 
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ProductImage
         fields = '__all__'
 
 
-class StockSerializer(serializers.ModelSerializer):
+class StockSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Stock
         fields = '__all__'
 
 
-class ProductReviewSerializer(serializers.ModelSerializer):
+class ProductReviewSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     customer_name = serializers.CharField(source='customer.username', read_only=True)
 
     class Meta:
@@ -39,12 +44,41 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ('customer', 'is_verified_purchase')
 
 
-class ProductSerializer(serializers.ModelSerializer):
-    images = ProductImageSerializer(many=True, read_only=True)
-    stock = StockSerializer(read_only=True)
-    reviews = ProductReviewSerializer(many=True, read_only=True)
+class ReviewModerationSerializer(serializers.Serializer):
+    """Selects reviews by ``ids`` or by filter; one of the two is required."""
+    ACTIONS = (('approve', 'Approve'), ('reject', 'Reject'))
+
+    action = serializers.ChoiceField(choices=ACTIONS)
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    product = serializers.IntegerField(required=False)
+    rating = serializers.IntegerField(required=False, min_value=1, max_value=5)
+    is_approved = serializers.BooleanField(required=False, allow_null=True, default=None)
+    is_verified_purchase = serializers.BooleanField(required=False, allow_null=True, default=None)
+    created_before = serializers.DateTimeField(required=False)
+
+    FILTER_FIELDS = ('product', 'rating', 'is_approved', 'is_verified_purchase', 'created_before')
+
+    def validate(self, attrs):
+        filters = {name: attrs[name] for name in self.FILTER_FIELDS if attrs.get(name) is not None}
+        if not attrs.get('ids') and not filters:
+            raise serializers.ValidationError('Provide review ids or at least one filter.')
+        attrs['filters'] = filters
+        return attrs
+
+    def get_queryset(self):
+        lookups = {
+            'product': 'product_id', 'rating': 'rating', 'is_approved': 'is_approved',
+            'is_verified_purchase': 'is_verified_purchase', 'created_before': 'created_at__lt',
+        }
+        filters = self.validated_data['filters']
+        return ProductReview.objects.filter(**{lookups[name]: value for name, value in filters.items()})
+
+
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    top_reviews = serializers.SerializerMethodField()
     average_rating = serializers.ReadOnlyField()
     review_count = serializers.ReadOnlyField()
+    rating_histogram = serializers.SerializerMethodField()
     is_in_stock = serializers.ReadOnlyField()
     category_name = serializers.CharField(source='category.name', read_only=True)
 
@@ -52,9 +86,26 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = '__all__'
         read_only_fields = ('created_by', 'created_at', 'updated_at')
-
-
-class ProductListSerializer(serializers.ModelSerializer):
+        expandable_fields = {
+            'images': (ProductImageSerializer, {'many': True}),
+            'stock': (StockSerializer, {}),
+        }
+
+    def get_top_reviews(self, obj):
+        """A few reviews to show inline; the full list is paginated under ``reviews/``."""
+        reviews = obj.reviews.filter(is_approved=True).select_related('customer').order_by(
+            '-is_verified_purchase', '-created_at', '-id'
+        )[:TOP_REVIEWS_LIMIT]
+        return ProductReviewSerializer(reviews, many=True).data
+
+    def get_rating_histogram(self, obj):
+        summary = getattr(obj, 'rating_summary', None)
+        if summary:
+            return summary.histogram
+        return {str(stars): 0 for stars in range(1, 6)}
+
+
+class ProductListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Simplified serializer for product lists"""
     primary_image = serializers.SerializerMethodField()
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -67,30 +118,59 @@ class ProductListSerializer(serializers.ModelSerializer):
                  'category_name', 'average_rating', 'is_in_stock', 'is_featured')
 
     def get_primary_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        if hasattr(obj, 'primary_images'):
+            primary_image = obj.primary_images[0] if obj.primary_images else None
+        else:
+            primary_image = obj.images.filter(is_primary=True).first()
         if primary_image:
             return ProductImageSerializer(primary_image).data
         return None
 
 
-class WishlistSerializer(serializers.ModelSerializer):
-    product = ProductListSerializer(read_only=True)
+class WishlistSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product_id = serializers.IntegerField(write_only=True)
 
     class Meta:
         model = Wishlist
         fields = '__all__'
         read_only_fields = ('customer',)
+        expandable_fields = {'product': (ProductListSerializer, {})}
 
 
-class CouponSerializer(serializers.ModelSerializer):
+class ProductComparisonSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    product_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True)
+
+    class Meta:
+        model = ProductComparison
+        fields = '__all__'
+        read_only_fields = ('customer', 'products')
+
+    def validate_product_ids(self, value):
+        ids = list(dict.fromkeys(value))
+        if not 2 <= len(ids) <= COMPARISON_MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"Select between 2 and {COMPARISON_MAX_ITEMS} products to compare"
+            )
+        found = Product.objects.filter(id__in=ids, is_active=True).count()
+        if found != len(ids):
+            raise serializers.ValidationError("One or more products do not exist")
+        return ids
+
+    def create(self, validated_data):
+        product_ids = validated_data.pop('product_ids')
+        comparison = ProductComparison.objects.create(**validated_data)
+        comparison.products.set(product_ids)
+        return comparison
+
+
+class CouponSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Coupon
         fields = '__all__'
         read_only_fields = ('created_by', 'used_count')
 
 
-class PromotionalOfferSerializer(serializers.ModelSerializer):
+class PromotionalOfferSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     applicable_products = ProductListSerializer(many=True, read_only=True)
 
     class Meta:
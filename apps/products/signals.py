@@ -0,0 +1,30 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .index_sync import publish_index_changes
+from .models import Category, Product, ProductReview
+from .reviews import refresh_rating_summaries
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def reindex_product(sender, instance, **kwargs):
+    # The product count of its category feeds the category's autocomplete weight.
+    transaction.on_commit(partial(
+        publish_index_changes, product_ids=[instance.id], category_ids=[instance.category_id],
+    ))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def reindex_category(sender, instance, **kwargs):
+    transaction.on_commit(partial(publish_index_changes, category_ids=[instance.id]))
+
+
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def refresh_review_summary(sender, instance, **kwargs):
+    refresh_rating_summaries([instance.product_id])
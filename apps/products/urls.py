@@ -7,9 +7,16 @@ urlpatterns = [
     path('', views.ProductListView.as_view(), name='product-list'),
     path('<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
     path('search/', views.product_search, name='product-search'),
+    path('autocomplete/', views.product_autocomplete, name='product-autocomplete'),
     path('<int:product_id>/reviews/', views.ProductReviewListView.as_view(), name='product-reviews'),
+    path('reviews/moderate/', views.moderate_product_reviews, name='moderate-reviews'),
     path('wishlist/', views.WishlistView.as_view(), name='wishlist'),
     path('wishlist/<int:pk>/', views.WishlistItemView.as_view(), name='wishlist-item'),
+    path('compare/', views.product_comparison, name='product-compare'),
+    path('compare/<int:pk>/', views.product_comparison, name='product-compare-saved'),
+    path('comparisons/', views.ProductComparisonListView.as_view(), name='product-comparisons'),
+    path('<int:pk>/recommendations/', views.product_recommendations, name='product-recommendations'),
+    path('recommendations/', views.product_recommendations, name='cart-recommendations'),
     path('stock/', views.StockListView.as_view(), name='stock-list'),
     path('stock/<int:pk>/', views.StockDetailView.as_view(), name='stock-detail'),
     path('coupons/', views.CouponListView.as_view(), name='coupon-list'),
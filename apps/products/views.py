@@ -2,16 +2,26 @@ from rest_framework import generics, permissions, status, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import Prefetch, Q, prefetch_related_objects
+from django.shortcuts import get_object_or_404
 from .models import (
     Category, Product, ProductImage, Stock, ProductReview, 
-    Wishlist, Coupon, PromotionalOffer
+    Wishlist, ProductComparison, Coupon, PromotionalOffer, primary_images_prefetch
 )
 from .serializers import (
     CategorySerializer, ProductSerializer, ProductListSerializer,
     ProductImageSerializer, StockSerializer, ProductReviewSerializer,
-    WishlistSerializer, CouponSerializer, PromotionalOfferSerializer
+    WishlistSerializer, ProductComparisonSerializer, CouponSerializer,
+    PromotionalOfferSerializer, ReviewModerationSerializer
 )
+from apps.common.views import ShapedQuerysetMixin
+from .autocomplete import AUTOCOMPLETE_LIMIT, get_autocomplete_index
+from .comparison import COMPARISON_MAX_ITEMS, get_comparison_matrix
+from .filters import ProductOrderingFilter
+from .fuzzy import FUZZY_MIN_RESULTS, get_trigram_index
+from .pagination import ReviewPagination
+from .recommendations import RECOMMENDATION_TOP_K, recommendations_for
+from .reviews import moderate_reviews
 
 
 class CategoryListView(generics.ListCreateAPIView):
@@ -31,11 +41,15 @@ class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
 
-class ProductListView(generics.ListCreateAPIView):
-    queryset = Product.objects.filter(is_active=True)
+class ProductListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
+    queryset = (
+        Product.objects.filter(is_active=True)
+        .select_related('category', 'stock', 'rating_summary')
+        .prefetch_related(primary_images_prefetch())
+    )
     serializer_class = ProductListSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, ProductOrderingFilter]
     filterset_fields = ['category', 'availability', 'is_featured', 'is_organic']
     search_fields = ['name', 'description', 'short_description']
     ordering_fields = ['price', 'created_at', 'name']
@@ -55,10 +69,11 @@ class ProductListView(generics.ListCreateAPIView):
         serializer.save(created_by=self.request.user)
 
 
-class ProductDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Product.objects.filter(is_active=True)
+class ProductDetailView(ShapedQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Product.objects.filter(is_active=True).select_related('category', 'stock', 'rating_summary')
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    expand_prefetch_related = {'images': ['images']}
 
 
 @api_view(['GET'])
@@ -68,15 +83,9 @@ def product_search(request):
     category_id = request.GET.get('category', '')
     min_price = request.GET.get('min_price', '')
     max_price = request.GET.get('max_price', '')
+    fuzzy = request.GET.get('fuzzy', 'auto')
     
-    products = Product.objects.filter(is_active=True)
-    
-    if query:
-        products = products.filter(
-            Q(name__icontains=query) | 
-            Q(description__icontains=query) |
-            Q(short_description__icontains=query)
-        )
+    products = Product.objects.filter(is_active=True).select_related('category', 'stock', 'rating_summary')
     
     if category_id:
         products = products.filter(category_id=category_id)
@@ -87,25 +96,78 @@ def product_search(request):
     if max_price:
         products = products.filter(price__lte=max_price)
     
-    serializer = ProductListSerializer(products, many=True)
+    candidates = products
+    if query:
+        products = products.filter(
+            Q(name__icontains=query) | 
+            Q(description__icontains=query) |
+            Q(short_description__icontains=query)
+        )
+    
+    results = list(products)
+    
+    # Typo tolerance: only when exact matching comes back short
+    if query and fuzzy != 'off' and len(results) < FUZZY_MIN_RESULTS:
+        found = {product.id for product in results}
+        ranked = [
+            product_id for product_id, _ in get_trigram_index().search(query)
+            if product_id not in found
+        ]
+        if ranked:
+            fuzzy_matches = candidates.in_bulk(ranked)
+            results += [fuzzy_matches[product_id] for product_id in ranked if product_id in fuzzy_matches]
+    
+    prefetch_related_objects(results, primary_images_prefetch())
+    serializer = ProductListSerializer(results, many=True)
     return Response(serializer.data)
 
 
-class ProductReviewListView(generics.ListCreateAPIView):
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_autocomplete(request):
+    """Search-as-you-type suggestions from the in-process prefix index"""
+    try:
+        limit = min(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), 20)
+    except ValueError:
+        limit = AUTOCOMPLETE_LIMIT
+    results = get_autocomplete_index().search(request.GET.get('q', ''), limit=limit)
+    return Response({'results': results})
+
+
+class ProductReviewListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = ProductReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ReviewPagination
 
     def get_queryset(self):
         product_id = self.kwargs['product_id']
-        return ProductReview.objects.filter(product_id=product_id, is_approved=True)
+        return ProductReview.objects.filter(product_id=product_id, is_approved=True).select_related('customer')
 
     def perform_create(self, serializer):
         product_id = self.kwargs['product_id']
         serializer.save(customer=self.request.user, product_id=product_id)
 
 
-class WishlistView(generics.ListCreateAPIView):
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def moderate_product_reviews(request):
+    if not (request.user.is_admin or request.user.is_moderator):
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    serializer = ReviewModerationSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    result = moderate_reviews(
+        serializer.get_queryset(),
+        approve=serializer.validated_data['action'] == 'approve',
+        review_ids=serializer.validated_data.get('ids'),
+    )
+    return Response(result)
+
+
+class WishlistView(ShapedQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = WishlistSerializer
+    expand_select_related = {'product': ['product__category', 'product__stock', 'product__rating_summary']}
+    expand_prefetch_related = {'product': [primary_images_prefetch('product__images')]}
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -123,7 +185,69 @@ class WishlistItemView(generics.DestroyAPIView):
         return Wishlist.objects.filter(customer=self.request.user)
 
 
-class StockListView(generics.ListAPIView):
+class ProductComparisonListView(generics.ListCreateAPIView):
+    serializer_class = ProductComparisonSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ProductComparison.objects.filter(customer=self.request.user).prefetch_related('products')
+
+    def perform_create(self, serializer):
+        serializer.save(customer=self.request.user)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_comparison(request, pk=None):
+    """Attribute matrix for ?ids=1,2,3 or for a saved comparison (shareable link)"""
+    if pk is not None:
+        comparison = get_object_or_404(ProductComparison, pk=pk)
+        product_ids = list(
+            ProductComparison.products.through.objects.filter(
+                productcomparison_id=comparison.pk
+            ).values_list('product_id', flat=True)
+        )
+    else:
+        try:
+            product_ids = [int(value) for value in request.GET.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            return Response({'error': 'ids must be a comma separated list of product ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    product_ids = sorted(set(product_ids))
+    if not 2 <= len(product_ids) <= COMPARISON_MAX_ITEMS:
+        return Response(
+            {'error': f'Select between 2 and {COMPARISON_MAX_ITEMS} products to compare'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response(get_comparison_matrix(product_ids))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_recommendations(request, pk=None):
+    """Frequently bought together for a product, or for ?products=1,2,3 (a cart)"""
+    if pk is not None:
+        product_ids = [pk]
+    else:
+        try:
+            product_ids = [int(value) for value in request.GET.get('products', '').split(',') if value.strip()]
+        except ValueError:
+            return Response({'error': 'products must be a comma separated list of product ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not product_ids:
+            return Response({'error': 'products is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(int(request.GET.get('limit', RECOMMENDATION_TOP_K)), 50)
+    except ValueError:
+        limit = RECOMMENDATION_TOP_K
+
+    return Response(recommendations_for(product_ids, limit=limit))
+
+
+class StockListView(ShapedQuerysetMixin, generics.ListAPIView):
     queryset = Stock.objects.all()
     serializer_class = StockSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -150,7 +274,7 @@ class StockDetailView(generics.RetrieveUpdateAPIView):
         serializer.save(updated_by=self.request.user)
 
 
-class CouponListView(generics.ListCreateAPIView):
+class CouponListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
     queryset = Coupon.objects.filter(is_active=True)
     serializer_class = CouponSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -190,8 +314,14 @@ def validate_coupon(request):
         }, status=status.HTTP_404_NOT_FOUND)
 
 
-class PromotionalOfferListView(generics.ListCreateAPIView):
-    queryset = PromotionalOffer.objects.filter(is_active=True)
+class PromotionalOfferListView(ShapedQuerysetMixin, generics.ListCreateAPIView):
+    queryset = PromotionalOffer.objects.filter(is_active=True).prefetch_related(
+        Prefetch(
+            'applicable_products',
+            queryset=Product.objects.select_related('category', 'stock', 'rating_summary')
+            .prefetch_related(primary_images_prefetch()),
+        )
+    )
     serializer_class = PromotionalOfferSerializer
     permission_classes = [permissions.AllowAny]
 
@@ -5,6 +5,8 @@ Django settings for organic_store project.
 from pathlib import Path
 import os
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -71,6 +73,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than the in-memory default, so the concurrency tests'
+        # threads wait for locks instead of failing at once.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -157,6 +162,24 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'x-cart-token')
+CORS_EXPOSE_HEADERS = ['x-cart-token']
+
+# Caches. Carts (apps/orders/cart_store.py) and the search index change log
+# (apps/products/index_sync.py) must be seen by every web worker, so they use
+# the database cache (run ``createcachetable``); point 'shared' at Redis or
+# Memcached in production.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'shared_cache',
+    },
+}
+CART_CACHE_ALIAS = 'shared'
+SEARCH_INDEX_CACHE_ALIAS = 'shared'
 
 # Email settings (for notifications)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
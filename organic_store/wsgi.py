@@ -8,4 +8,11 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'organic_store.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Build the in-process search indexes before the worker serves requests.
+from apps.products.autocomplete import warm_autocomplete_index  # noqa: E402
+from apps.products.fuzzy import warm_trigram_index  # noqa: E402
+
+warm_autocomplete_index()
+warm_trigram_index()